@@ -0,0 +1,6 @@
+"""
+Code shared by the Anitya scripts.
+
+Scripts are run directly from their own directory, so they add the
+repository root to `sys.path` before importing from this package.
+"""
@@ -0,0 +1,329 @@
+"""
+Single `anitya-scripts` command running any of the scripts in this repository.
+
+Every subcommand imports its script only when it runs, so dependencies
+needed by one script only (`bs4` for del-last-version, `click` for
+updated-versions) are not loaded by the other subcommands. Constants of
+the scripts, which are otherwise changed by editing the script, are set
+from the command line. Exit code is 1 when some items failed: packages not
+set by set-monitoring, projects without deleted version by del-last-version
+or packages not resolved by projects-by-packages.
+
+**Example**:
+    anitya-scripts --server https://release-monitoring.org/ partial-name -- -delete
+    anitya-scripts --workers 16 --output-format json ecosystem crates.io pypi
+    anitya-scripts --no-cache updated-versions -d 14
+    anitya-scripts --output-format csv --output-file packages.csv partial-name -- -delete
+"""
+import argparse
+import contextlib
+import dataclasses
+import importlib.util
+import json
+import os
+import sys
+from datetime import datetime
+
+from anitya_common import output
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Directory and file name of the script run by every subcommand
+SCRIPTS = {
+    "partial-name": ("anitya_get_packages_by_partial_name", "anitya_get_packages_by_partial_name.py"),
+    "ecosystem": ("anitya_get_projects_by_ecosystem", "anitya_get_projects_by_ecosystem.py"),
+    "projects-by-packages": ("anitya_get_projects_by_packages", "anitya_get_projects_by_packages.py"),
+    "del-last-version": ("anitya_del_last_version", "anitya_del_last_version.py"),
+    "set-monitoring": ("set_monitoring_on_distgit", "set_monitoring_on_distgit.py"),
+    "updated-versions": ("anitya_get_new_releases_for_infra_apps", "updated-versions.py"),
+}
+OUTPUT_FORMATS = ("text", "json") + output.FORMATS
+# Subcommands writing rows in output.FORMATS
+ROW_COMMANDS = ("partial-name", "ecosystem", "projects-by-packages")
+# Exit code when some items of the subcommand failed
+EXIT_FAILED = 1
+
+
+def load_script(command):
+    """
+    Import script of the subcommand.
+
+    Params:
+        command (str): Name of the subcommand
+
+    Returns:
+        (module): Imported script
+    """
+    directory, filename = SCRIPTS[command]
+    spec = importlib.util.spec_from_file_location(
+        directory, os.path.join(REPO_DIR, directory, filename)
+    )
+    script = importlib.util.module_from_spec(spec)
+    sys.modules[directory] = script
+    spec.loader.exec_module(script)
+    return script
+
+
+def configure(script, args):
+    """
+    Apply shared options to constants of the script.
+
+    Params:
+        script (module): Imported script
+        args (`argparse.Namespace`): Parsed arguments
+    """
+    if args.server:
+        for name in ("SERVER_URL", "DISTGIT_URL"):
+            if hasattr(script, name):
+                setattr(script, name, args.server)
+    if args.workers:
+        for name in ("MAX_WORKERS", "WORKERS"):
+            if hasattr(script, name):
+                setattr(script, name, args.workers)
+        if hasattr(script, "CLIENT"):
+            # Pool of the shared client must fit all the workers
+            script.CLIENT.close()
+            script.CLIENT = script.Client(pool_size=args.workers)
+    if args.output_format in output.FORMATS and hasattr(script, "VERBOSE"):
+        # Rows are the result, don't print every item on the way
+        script.VERBOSE = False
+    if args.cache is False and hasattr(script, "PROJECT_ID_CACHE"):
+        script.PROJECT_ID_CACHE = False
+    if args.cache is not None and hasattr(script, "USE_SNAPSHOT"):
+        script.USE_SNAPSHOT = args.cache
+        if args.cache_path:
+            from anitya_common import snapshot
+            snapshot.SNAPSHOT_PATH = args.cache_path
+
+
+def run_partial_name(script, args):
+    if args.names:
+        script.PARTIAL_NAMES = args.names
+    if args.match_mode:
+        script.MATCH_MODE = args.match_mode
+    if args.delete_urls is not None:
+        script.GENERATE_DELTE_URL = args.delete_urls
+    return script.main(args.output_format, args.output_file)
+
+
+def run_ecosystem(script, args):
+    if args.ecosystems:
+        script.ECOSYSTEMS = args.ecosystems
+    return script.main(args.output_format, args.output_file)
+
+
+def run_projects_by_packages(script, args):
+    if args.packages_file:
+        script.PACKAGES_FILE = args.packages_file
+        script.JOURNAL_FILE = args.packages_file + ".journal"
+    if args.mapping_file is not None:
+        script.MAPPING_FILE = args.mapping_file or None
+    return script.main(args.output_format, args.output_file)
+
+
+def run_del_last_version(script, args):
+    if args.projects_file:
+        script.PROJECTS_FILE = args.projects_file
+        script.JOURNAL_FILE = args.projects_file + ".journal"
+    if args.dry_run:
+        script.DRY_RUN = True
+    if args.use_api:
+        script.USE_API = True
+    if args.resume:
+        script.RESUME = True
+    return script.main(args.output_format)
+
+
+def run_set_monitoring(script, args):
+    if args.packages_file:
+        script.PACKAGES_FILE = args.packages_file
+        script.JOURNAL_FILE = args.packages_file + ".monitoring.journal"
+    if args.monitoring:
+        script.MONITORING_OPTION = args.monitoring
+    if args.api_key:
+        script.DISTGIT_API_KEY = args.api_key
+    if args.skip_unchanged is not None:
+        script.SKIP_UNCHANGED = args.skip_unchanged
+    return script.main(args.output_format)
+
+
+def run_updated_versions(script, args):
+    from anitya_common import decode
+    decode.STREAM = args.stream_json
+    base_url = args.server or (script.DATAGREPPER_STG if args.staging else script.DATAGREPPER)
+    if args.cache is False:
+        cache_file = None
+    else:
+        cache_file = args.cache_path or script.CACHE_FILE
+    if cache_file is None and (args.offline or args.consume or args.replay):
+        raise SystemExit("--offline, --consume and --replay need the message cache")
+    registry = script.load_registry(args.registry, args.anitya_ecosystem, args.team)
+    if args.consume:
+        return script.consume(
+            base_url, args.duration, cache_file, registry=registry, server_filter=args.server_filter,
+            workers=args.workers or script.WORKERS, queue=args.queue,
+        )
+    if args.replay:
+        return script.replay_messages(
+            base_url, args.replay, cache_file, registry=registry, server_filter=args.server_filter
+        )
+    return script.report(
+        base_url, args.duration, workers=args.workers or script.WORKERS,
+        server_filter=args.server_filter, cache_file=cache_file, output_format=args.output_format,
+        registry=registry, offline=args.offline,
+    )
+
+
+def failed(command, script, result):
+    """
+    Check if some items of the subcommand failed.
+
+    Params:
+        command (str): Name of the subcommand
+        script (module): Imported script
+        result: Result returned by the subcommand
+
+    Returns:
+        (bool): True if the subcommand reported failures
+    """
+    if command == "set-monitoring":
+        return script.FAILED in result.values()
+    if command == "del-last-version":
+        # Dry run returns versions, not errors
+        return not script.DRY_RUN and bool(result)
+    if command == "projects-by-packages":
+        # Journal is removed only when all the packages were resolved
+        return not script.USE_SNAPSHOT and os.path.exists(script.JOURNAL_FILE)
+    return False
+
+
+def create_parser():
+    """
+    Create parser of the command line.
+
+    Returns:
+        (`argparse.ArgumentParser`): Parser
+    """
+    parser = argparse.ArgumentParser(
+        prog="anitya-scripts", description="Various useful scripts for Anitya."
+    )
+    parser.add_argument(
+        "--server", help="URL of Anitya, dist-git for set-monitoring or datagrepper for updated-versions"
+    )
+    parser.add_argument("--workers", type=int, help="Number of concurrent requests")
+    parser.add_argument(
+        "--cache", action=argparse.BooleanOptionalAction,
+        help="Use local snapshot of Anitya catalogue or cache of datagrepper messages",
+    )
+    parser.add_argument("--cache-path", help="Path to the local cache, implies --cache")
+    parser.add_argument(
+        "--output-format", choices=OUTPUT_FORMATS, default="text",
+        help="Format of the result printed to stdout, progress goes to stderr with other than text; "
+             "{} are only supported by {}".format(", ".join(output.FORMATS), ", ".join(ROW_COMMANDS)),
+    )
+    parser.add_argument("--output-file", help="File to write the result to instead of stdout")
+    subparsers = parser.add_subparsers(dest="command", metavar="command", required=True)
+
+    command = subparsers.add_parser("partial-name", help="Find packages by partial name")
+    command.add_argument("names", nargs="*", help="Partial names, put them after -- when they start with -")
+    command.add_argument("--match-mode", choices=("substring", "prefix", "suffix", "glob", "regex"))
+    command.add_argument(
+        "--delete-urls", action=argparse.BooleanOptionalAction, help="Print URLs deleting the packages"
+    )
+
+    command = subparsers.add_parser("ecosystem", help="Get project ids of ecosystems")
+    command.add_argument("ecosystems", nargs="*")
+
+    command = subparsers.add_parser("projects-by-packages", help="Get project ids of Fedora packages")
+    command.add_argument("packages_file", nargs="?", help="File with one package per line")
+    command.add_argument("--mapping-file", help="File to write package;project;project_id to, empty to skip")
+
+    command = subparsers.add_parser("del-last-version", help="Remove latest version from projects")
+    command.add_argument("projects_file", nargs="?", help="File with one project id per line")
+    command.add_argument("--dry-run", action="store_true", help="Only report versions which would be deleted")
+    command.add_argument("--use-api", action="store_true", help="Read latest versions from JSON API")
+    command.add_argument(
+        "--resume", action="store_true", help="Skip projects done by unfinished run on the same projects"
+    )
+
+    command = subparsers.add_parser("set-monitoring", help="Set monitoring of packages on dist-git")
+    command.add_argument("packages_file", nargs="?", help="File with one package per line")
+    command.add_argument("--monitoring", help="Monitoring status to set")
+    command.add_argument("--api-key", default=os.environ.get("DISTGIT_API_KEY"), help="dist-git API key")
+    command.add_argument(
+        "--skip-unchanged", action=argparse.BooleanOptionalAction,
+        help="Don't update packages already set to the status",
+    )
+
+    command = subparsers.add_parser("updated-versions", help="Report updates of infra apps")
+    command.add_argument("-d", "--duration", type=int, default=7, help="Number of days to report")
+    command.add_argument("--staging", action="store_true")
+    command.add_argument(
+        "--server-filter", action=argparse.BooleanOptionalAction, default=True,
+        help="Ask datagrepper only for messages mentioning our apps",
+    )
+    command.add_argument("--stream-json", action="store_true", help="Parse pages incrementally (needs ijson)")
+    command.add_argument("--registry", help="TOML file with apps to report")
+    command.add_argument(
+        "--anitya-ecosystem", action="append", default=[], help="Report also all Anitya projects in the ecosystem"
+    )
+    command.add_argument("--team", action="append", default=[], help="Report only apps of the team")
+    command.add_argument("--offline", action="store_true", help="Report only messages already in cache")
+    command.add_argument(
+        "--consume", action="store_true", help="Store new messages to cache as they are published"
+    )
+    command.add_argument(
+        "--replay", action="append", default=[], help="Store messages dumped from datagrepper"
+    )
+    command.add_argument("--queue", help="Durable queue of the consumer, temporary one by default")
+
+    return parser
+
+
+def main(argv=None):
+    """
+    Run the subcommand.
+
+    Params:
+        argv (:obj:`list` of :obj:`str`): Arguments, defaults to sys.argv
+
+    Returns:
+        (int): Exit code
+    """
+    parser = create_parser()
+    args = parser.parse_args(argv)
+    if args.output_format in output.FORMATS and args.command not in ROW_COMMANDS:
+        parser.error("--output-format {} is not supported by {}".format(args.output_format, args.command))
+    if args.output_file and args.output_format in ("text", "json"):
+        parser.error("--output-file needs --output-format {}".format(" or ".join(output.FORMATS)))
+    if args.cache_path and args.cache is None:
+        args.cache = True
+    sys.path.insert(0, REPO_DIR)
+    run = globals()["run_" + args.command.replace("-", "_")]
+
+    if args.output_format == "text":
+        script = load_script(args.command)
+        configure(script, args)
+        result = run(script, args)
+        return EXIT_FAILED if failed(args.command, script, result) else 0
+
+    # Keep stdout clean for the result, the scripts report progress by print
+    args.output_file = args.output_file or sys.stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        script = load_script(args.command)
+        configure(script, args)
+        result = run(script, args)
+    if args.output_format not in output.FORMATS:
+        json.dump(result, sys.stdout, indent=2, default=_json_default)
+        sys.stdout.write("\n")
+    return EXIT_FAILED if failed(args.command, script, result) else 0
+
+
+def _json_default(value):
+    if dataclasses.is_dataclass(value):
+        return dataclasses.asdict(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError("Object of type {} is not JSON serializable".format(type(value).__name__))
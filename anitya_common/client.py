@@ -0,0 +1,300 @@
+"""
+HTTP client shared by the scripts.
+
+Wraps `requests.Session`, so connections are kept alive and pooled between
+requests and threads. Requests failing on connection error, timeout or
+retryable HTTP status (429, 5xx) are retried with exponential backoff with
+jitter, honoring Retry-After header sent by the server. Requests which
+aren't idempotent (POST) are only retried when they surely didn't reach
+the server: connection couldn't be opened, or 429 or 503 with Retry-After.
+Resending them after a read timeout or another 5xx could repeat the
+change done by the first request. Optional token
+bucket rate limiter keeps the request rate under the server limit, all the
+clients with the same limit share one limiter, so the limit holds for the
+whole process.
+Every request and retry is recorded in `anitya_common.metrics.METRICS`.
+
+**Example**:
+    with Client(pool_size=8, rate_limit=20) as client:
+        resp = client.get("https://release-monitoring.org/api/v2/projects", params={"name": "anitya"})
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+import urllib3
+
+from requests.adapters import HTTPAdapter
+
+from anitya_common.metrics import METRICS
+
+
+# Number of connections kept alive per host
+POOL_SIZE = 10
+# Number of retries before giving up, the request is sent MAX_RETRIES + 1 times
+MAX_RETRIES = 8
+# First retry waits up to BACKOFF_FACTOR seconds, doubling with every retry
+BACKOFF_FACTOR = 0.5
+# Maximum wait time between retries in seconds
+BACKOFF_MAX = 60
+# Longest Retry-After in seconds the client waits for, with longer one
+# the response is returned without retrying
+RETRY_AFTER_MAX = 600
+# HTTP status codes which are worth retrying
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# HTTP status codes which are worth retrying with requests which aren't
+# idempotent, only when sent with Retry-After, the request was refused
+RETRY_STATUSES_NOT_IDEMPOTENT = (429, 503)
+# Methods safe to send again, other methods are retried only when the
+# request surely wasn't processed
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE")
+# Timeout of request in seconds
+TIMEOUT = 60
+# Default maximum requests per second, None for no limit
+RATE_LIMIT = None
+
+# Rate limiters shared by the clients, keyed by the rate
+_RATE_LIMITERS = {}
+_RATE_LIMITERS_LOCK = threading.Lock()
+
+
+class RateLimiter:
+    """
+    Token bucket rate limiter, safe to share between threads.
+
+    Attributes:
+        rate (float): Number of tokens added per second
+        burst (int): Maximum number of tokens in bucket
+    """
+
+    def __init__(self, rate, burst=None):
+        """
+        Params:
+            rate (float): Allowed requests per second
+            burst (int): Requests allowed at once, defaults to rate
+        """
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take one token from the bucket, wait until it's available.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class Client:
+    """
+    Pooled HTTP client with retries and rate limiting.
+
+    Attributes:
+        session (`requests.Session`): Underlying session, use it to set
+                                      headers or cookies
+        max_retries (int): Number of retries before giving up
+        rate_limiter (`RateLimiter`): Rate limiter shared with other clients
+                                      with the same limit, None if not limited
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, max_retries=MAX_RETRIES, rate_limit=None, session=None):
+        """
+        Params:
+            pool_size (int): Number of connections kept alive per host,
+                             should be at least the number of threads
+                             using the client
+            max_retries (int): Number of retries before giving up
+            rate_limit (float): Maximum requests per second of all the clients
+                                with this limit together, defaults to RATE_LIMIT
+            session (`requests.Session`): Session to use, new one is created
+                                          if not provided
+        """
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.max_retries = max_retries
+        rate_limit = rate_limit or RATE_LIMIT
+        self.rate_limiter = shared_rate_limiter(rate_limit) if rate_limit else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Close all pooled connections.
+        """
+        self.session.close()
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method, url, idempotent=None, **kwargs):
+        """
+        Send the request, retrying it when it fails.
+
+        Params:
+            method (str): HTTP method
+            url (str): URL to send the request to
+            idempotent (bool): Request could be sent again without repeating
+                               its effect, defaults to True for methods in
+                               IDEMPOTENT_METHODS
+            kwargs: Passed to `requests.Session.request`
+
+        Returns:
+            (`requests.Response`): Response, it could still have retryable
+                                   status if all retries failed or the server
+                                   asked to wait longer than RETRY_AFTER_MAX
+
+        Raises:
+            requests.ConnectionError: When connection still fails after all retries
+            requests.Timeout: When request still times out after all retries
+        """
+        kwargs.setdefault("timeout", TIMEOUT)
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            start = time.perf_counter()
+            try:
+                resp = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                METRICS.request(method, url, None, time.perf_counter() - start)
+                if attempt >= self.max_retries or not (idempotent or connect_failed(exc)):
+                    raise
+                METRICS.retry(method, url)
+                wait = backoff(attempt)
+                print("Connection error occurred, waiting for '{:.2f}' second before retry: {}".format(
+                    wait, exc
+                ))
+            else:
+                METRICS.request(
+                    method, url, resp.status_code, time.perf_counter() - start,
+                    bytes_in=response_size(resp, kwargs.get("stream")),
+                    bytes_out=len(resp.request.body or b""),
+                )
+                if resp.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return resp
+                wait = retry_after(resp)
+                if not idempotent and (resp.status_code not in RETRY_STATUSES_NOT_IDEMPOTENT or wait is None):
+                    return resp
+                if wait is not None and wait > RETRY_AFTER_MAX:
+                    print("Request '{}' failed with '{}', server asks to wait '{:.0f}' seconds, giving up".format(
+                        resp.url, resp.status_code, wait
+                    ))
+                    return resp
+                METRICS.retry(method, url)
+                if wait is None:
+                    wait = backoff(attempt)
+                print("Request '{}' failed with '{}', waiting for '{:.2f}' second before retry".format(
+                    resp.url, resp.status_code, wait
+                ))
+            time.sleep(wait)
+            attempt += 1
+
+
+def shared_rate_limiter(rate):
+    """
+    Get rate limiter shared by all the clients with the rate.
+
+    Params:
+        rate (float): Allowed requests per second
+
+    Returns:
+        (`RateLimiter`): Rate limiter
+    """
+    with _RATE_LIMITERS_LOCK:
+        if rate not in _RATE_LIMITERS:
+            _RATE_LIMITERS[rate] = RateLimiter(rate)
+        return _RATE_LIMITERS[rate]
+
+
+def connect_failed(exc):
+    """
+    Check if the request failed before connection was opened,
+    so nothing was sent to the server.
+
+    Params:
+        exc (`requests.RequestException`): Exception raised by the request
+
+    Returns:
+        (bool): True if the connection couldn't be opened
+    """
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    return isinstance(reason, (urllib3.exceptions.NewConnectionError, urllib3.exceptions.ConnectTimeoutError))
+
+
+def backoff(attempt):
+    """
+    Get wait time before next retry using exponential backoff with full jitter.
+
+    Params:
+        attempt (int): Number of retries done so far
+
+    Returns:
+        (float): Wait time in seconds
+    """
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_FACTOR * 2 ** attempt))
+
+
+def response_size(resp, stream=False):
+    """
+    Get size of the response body without reading streamed body.
+
+    Params:
+        resp (`requests.Response`): Response
+        stream (bool): The body is streamed
+
+    Returns:
+        (int): Size of the body, 0 for streamed body of unknown size
+    """
+    try:
+        return int(resp.headers["Content-Length"])
+    except (KeyError, ValueError):
+        return 0 if stream else len(resp.content)
+
+
+def retry_after(resp):
+    """
+    Read wait time from Retry-After header.
+
+    Params:
+        resp (`requests.Response`): Response to read the header from
+
+    Returns:
+        (float): Wait time in seconds, None if the header is missing
+                 or not valid
+    """
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        wait = float(value)
+    except ValueError:
+        try:
+            wait = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return max(0, wait)
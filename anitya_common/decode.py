@@ -0,0 +1,183 @@
+"""
+Decoding of paged JSON responses, keeping only the needed fields of items.
+
+Pages from Anitya (`items`) and datagrepper (`raw_messages`) are large, but
+the scripts only read a few fields of every item. `decode_page` returns
+top level scalar values of the page (`total_items`, `pages`, ...) and the
+items reduced to the requested fields, given as dotted paths like
+"body.project.name".
+
+By default the whole page is decoded by `orjson`, when installed, or by
+`json` from standard library, and the items are reduced afterwards. With
+STREAM enabled and `ijson` installed, the page is parsed incrementally from
+the response stream and the fields not requested are skipped by the parser,
+so neither the whole body nor the unneeded fields are kept in memory.
+Request the page with `stream=STREAM` for this.
+
+**Example**:
+    resp = client.get(url, params=params, stream=decode.STREAM)
+    page = decode.decode_page(resp, "items", fields=("id", "name"))
+    print(page.meta["total_items"], page.items)
+"""
+import io
+import json
+from collections import namedtuple
+
+from anitya_common.metrics import METRICS
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import ijson
+    from ijson.common import ObjectBuilder
+except ImportError:  # pragma: no cover
+    ijson = None
+
+
+# Parse the pages incrementally, only used if ijson is installed
+STREAM = False
+
+# Decoded page, `meta` contains top level scalar values, `size` is the size
+# of the body in bytes
+Page = namedtuple("Page", ["meta", "items", "size"])
+
+SCALAR_EVENTS = ("null", "boolean", "integer", "double", "number", "string")
+
+
+def loads(content):
+    """
+    Decode JSON using the fastest available backend.
+
+    Params:
+        content (bytes): JSON document
+
+    Returns:
+        Decoded document
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def decode_page(resp, items_key, fields=None):
+    """
+    Decode page from response.
+
+    Params:
+        resp (`requests.Response`): Response with the page, requested with
+                                    `stream=True` for incremental parsing
+        items_key (str): Top level key with the list of items
+        fields (:obj:`tuple` of :obj:`str`): Dotted paths of item fields
+                                             to keep, None to keep everything
+
+    Returns:
+        (`Page`): Decoded page
+    """
+    if STREAM and ijson is not None:
+        if resp.raw is not None and not resp._content_consumed:
+            # Let urllib3 decompress the body while ijson reads it,
+            # the time includes reading the body from network
+            resp.raw.decode_content = True
+            with METRICS.timed("json"):
+                meta, items = _stream_decode(resp.raw, items_key, fields)
+            return Page(meta, items, resp.raw.tell())
+        content = resp.content
+        with METRICS.timed("json"):
+            return decode_bytes(content, items_key, fields, stream=True)
+    content = resp.content
+    with METRICS.timed("json"):
+        return decode_bytes(content, items_key, fields)
+
+
+def decode_bytes(content, items_key, fields=None, stream=False):
+    """
+    Decode page from bytes.
+
+    Params:
+        content (bytes): JSON document with the page
+        items_key (str): Top level key with the list of items
+        fields (:obj:`tuple` of :obj:`str`): Dotted paths of item fields
+                                             to keep, None to keep everything
+        stream (bool): Parse incrementally by ijson
+
+    Returns:
+        (`Page`): Decoded page
+    """
+    if stream and ijson is not None:
+        meta, items = _stream_decode(io.BytesIO(content), items_key, fields)
+        return Page(meta, items, len(content))
+
+    document = loads(content)
+    items = document.pop(items_key, None) or []
+    meta = {key: value for key, value in document.items() if not isinstance(value, (dict, list))}
+    if fields:
+        items = [project(item, fields) for item in items]
+    return Page(meta, items, len(content))
+
+
+def project(item, fields):
+    """
+    Reduce item to the requested fields.
+
+    Params:
+        item (dict): Decoded item
+        fields (:obj:`tuple` of :obj:`str`): Dotted paths of fields to keep
+
+    Returns:
+        (dict): New dict containing only the requested fields
+    """
+    result = {}
+    for field in fields:
+        source = item
+        target = result
+        keys = field.split(".")
+        for key in keys[:-1]:
+            if not isinstance(source, dict) or key not in source:
+                break
+            source = source[key]
+            target = target.setdefault(key, {})
+        else:
+            if isinstance(source, dict) and keys[-1] in source:
+                target[keys[-1]] = source[keys[-1]]
+    return result
+
+
+def _stream_decode(fileobj, items_key, fields):
+    """
+    Parse the page incrementally, building only the requested fields of items.
+    """
+    item_prefix = items_key + ".item"
+    meta = {}
+    items = []
+    builder = None
+
+    def needed(path):
+        return fields is None or any(
+            path == field or field.startswith(path + ".") or path.startswith(field + ".")
+            for field in fields
+        )
+
+    for prefix, event, value in ijson.parse(fileobj, use_float=True):
+        if builder is not None:
+            if prefix == item_prefix and event == "end_map":
+                builder.event(event, value)
+                items.append(builder.value)
+                builder = None
+                continue
+            path = prefix[len(item_prefix) + 1:]
+            if event == "map_key":
+                child = path + "." + value if path else value
+                if needed(child):
+                    builder.event(event, value)
+            elif needed(path):
+                builder.event(event, value)
+        elif prefix == item_prefix and event == "start_map":
+            builder = ObjectBuilder()
+            builder.event(event, value)
+        elif "." not in prefix and prefix and event in SCALAR_EVENTS:
+            meta[prefix] = value
+
+    return meta, items
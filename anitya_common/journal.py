@@ -0,0 +1,186 @@
+"""
+Append-only checkpoint journal for long batch runs.
+
+Every completed item is appended to the journal file as one JSON line
+containing the item and its result. When the script is started again,
+items found in the journal are skipped. Writes are buffered and flushed
+with fsync every FLUSH_EVERY records or FLUSH_INTERVAL seconds, whichever
+comes first, and when the journal is closed, so a crash loses at most
+the last unflushed batch.
+
+The first line of the journal contains the parameters of the run (server,
+option being set, digest of the input items, ...). A journal written with
+different parameters doesn't belong to this run and is ignored. When the
+run finishes, call `complete` to remove the journal, so the next run starts
+from scratch. Scripts where repeating the run must not skip anything open
+the journal with `resume` only when asked to.
+
+**Example**:
+    params = {"server": SERVER_URL, "input": input_digest(projects)}
+    with Journal("projects.journal", params, resume=RESUME) as journal:
+        for project in journal.pending(projects):
+            remove_latest_version(session, project)
+            journal.record(project)
+        journal.complete()
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+# Number of records buffered before they are written to disk
+FLUSH_EVERY = 100
+# Maximum time in seconds a record stays in buffer
+FLUSH_INTERVAL = 2.0
+
+
+class Journal:
+    """
+    Checkpoint journal, safe to share between threads.
+
+    Attributes:
+        path (str): Path to the journal file
+        params (dict): Parameters of the run
+        done (dict): Completed items from previous and current run
+                     mapped to their results
+        resumed (dict): Items completed by previous runs
+    """
+
+    def __init__(self, path, params=None, flush_every=FLUSH_EVERY, flush_interval=FLUSH_INTERVAL, resume=True):
+        """
+        Open the journal and read items completed by previous runs.
+
+        Params:
+            path (str): Path to the journal file
+            params (dict): Parameters changing the result of the run, journal
+                           written with other parameters is ignored
+            flush_every (int): Number of records buffered before writing
+            flush_interval (float): Maximum time in seconds record stays in buffer
+            resume (bool): Skip items completed by previous run, otherwise
+                           the journal is started again
+        """
+        self.path = path
+        self.params = params or {}
+        self.done = {}
+        self._flush_every = flush_every
+        self._flush_interval = flush_interval
+        self._buffer = []
+        self._flushed = time.monotonic()
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                header = f.readline()
+                if header.endswith("\n") and json.loads(header) == {"params": self.params}:
+                    for line in f:
+                        # Last line could be cut in half by crash
+                        if not line.endswith("\n"):
+                            break
+                        item, result = json.loads(line)
+                        self.done[item] = result
+                elif header:
+                    print("Journal '{}' was written with other parameters, ignoring it".format(path))
+            if self.done and not resume:
+                print("Journal '{}' of unfinished run with '{}' completed items found, starting again".format(
+                    path, len(self.done)
+                ))
+                self.done = {}
+            if self.done:
+                print("Journal '{}' contains '{}' completed items, skipping them".format(
+                    path, len(self.done)
+                ))
+        self.resumed = dict(self.done)
+        # Start new journal unless this one is resumed
+        self._file = open(path, "a" if self.done else "w")
+        if not self.done:
+            self._file.write(json.dumps({"params": self.params}) + "\n")
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contains__(self, item):
+        return item in self.done
+
+    def pending(self, items):
+        """
+        Filter out completed items.
+
+        Params:
+            items (iterable): Items to process
+
+        Returns:
+            (list): Items not found in journal, in original order
+        """
+        return [item for item in items if item not in self.done]
+
+    def record(self, item, result=None):
+        """
+        Record completed item.
+
+        Params:
+            item (str): Completed item
+            result: Result of the item, must be serializable to JSON
+        """
+        with self._lock:
+            self.done[item] = result
+            self._buffer.append(json.dumps([item, result]) + "\n")
+            if (
+                len(self._buffer) >= self._flush_every
+                or time.monotonic() - self._flushed >= self._flush_interval
+            ):
+                self._flush()
+
+    def flush(self):
+        """
+        Write buffered records to disk.
+        """
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        """
+        Flush the buffered records and close the journal file.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._flush()
+            self._file.close()
+            self._closed = True
+
+    def complete(self):
+        """
+        Close and remove the journal, the run is finished and the next one
+        must not skip anything.
+        """
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _flush(self):
+        self._flushed = time.monotonic()
+        if not self._buffer:
+            return
+        self._file.write("".join(self._buffer))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._buffer = []
+
+
+def input_digest(items):
+    """
+    Get digest of the input items of the run, for the journal parameters.
+
+    Params:
+        items (iterable): Input items, order and repetition don't matter
+
+    Returns:
+        (str): Hex digest
+    """
+    return hashlib.sha256("\n".join(sorted(set(items))).encode("utf-8")).hexdigest()
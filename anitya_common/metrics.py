@@ -0,0 +1,271 @@
+"""
+Instrumentation of requests and parsing shared by the scripts.
+
+`Client` records every request sent to the shared METRICS: latency, status,
+bytes sent and received and retries, grouped by endpoint (method and path
+with ids replaced by placeholders). Parsing is timed by wrapping it with
+`METRICS.timed("json")` or `METRICS.timed("html")`.
+
+At exit summary table is printed to stderr, when anything was recorded and
+SUMMARY is enabled. Metrics are also written as JSON to JSON_FILE and in
+Prometheus text format to PROMETHEUS_FILE (for node exporter textfile
+collector), when set. Both could be set by environment variables
+ANITYA_SCRIPTS_METRICS_JSON and ANITYA_SCRIPTS_METRICS_PROMETHEUS.
+
+**Example**:
+    with METRICS.timed("html"):
+        bs = BS(resp.content, "html.parser")
+"""
+import atexit
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+# Print summary table at exit
+SUMMARY = True
+JSON_FILE = os.environ.get("ANITYA_SCRIPTS_METRICS_JSON")
+PROMETHEUS_FILE = os.environ.get("ANITYA_SCRIPTS_METRICS_PROMETHEUS")
+PERCENTILES = (50, 95, 99)
+
+# Path patterns replaced to group requests by endpoint, first match wins
+ENDPOINT_PATTERNS = (
+    (re.compile(r"^/project/\d+/delete/[^/]+$"), "/project/{id}/delete/{version}"),
+    (re.compile(r"^/_dg/anitya/rpms/[^/]+$"), "/_dg/anitya/rpms/{package}"),
+    (re.compile(r"/\d+(?=/|$)"), "/{id}"),
+)
+
+
+class Metrics:
+    """
+    Collected metrics, safe to share between threads.
+
+    Attributes:
+        endpoints (dict): Statistics of every endpoint, endpoint is the key
+        parsers (dict): Number of calls and total time of every parser
+    """
+
+    def __init__(self):
+        self.endpoints = {}
+        self.parsers = {}
+        self._lock = threading.Lock()
+
+    def request(self, method, url, status, seconds, bytes_in=0, bytes_out=0):
+        """
+        Record finished request.
+
+        Params:
+            method (str): HTTP method
+            url (str): Requested URL
+            status (int): Response status, None on connection error
+            seconds (float): Time until the response was received
+            bytes_in (int): Size of the response body
+            bytes_out (int): Size of the request body
+        """
+        with self._lock:
+            stats = self._endpoint(method, url)
+            stats["count"] += 1
+            stats["latencies"].append(seconds)
+            stats["bytes_in"] += bytes_in
+            stats["bytes_out"] += bytes_out
+            if status is None or status >= 400:
+                stats["errors"] += 1
+
+    def retry(self, method, url):
+        """
+        Record retry of request.
+        """
+        with self._lock:
+            self._endpoint(method, url)["retries"] += 1
+
+    @contextmanager
+    def timed(self, parser):
+        """
+        Measure time spent in the block as parsing.
+
+        Params:
+            parser (str): Kind of parsing, for example "json" or "html"
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                stats = self.parsers.setdefault(parser, {"count": 0, "seconds": 0.0})
+                stats["count"] += 1
+                stats["seconds"] += elapsed
+
+    def snapshot(self):
+        """
+        Get the metrics with computed latency percentiles.
+
+        Returns:
+            (dict): Endpoints and parsers, ready to be serialized to JSON
+        """
+        with self._lock:
+            endpoints = {}
+            for endpoint, stats in sorted(self.endpoints.items()):
+                latencies = sorted(stats["latencies"])
+                endpoints[endpoint] = {
+                    key: value for key, value in stats.items() if key != "latencies"
+                }
+                endpoints[endpoint]["seconds"] = sum(latencies)
+                endpoints[endpoint].update(
+                    ("p{}".format(percent), percentile(latencies, percent))
+                    for percent in PERCENTILES
+                )
+            parsers = {parser: dict(stats) for parser, stats in sorted(self.parsers.items())}
+        return {"endpoints": endpoints, "parsers": parsers}
+
+    def print_summary(self, file=None):
+        """
+        Print summary table of the metrics.
+
+        Params:
+            file: Where to print, defaults to stderr
+        """
+        file = file or sys.stderr
+        data = self.snapshot()
+        print("{:<45} {:>7} {:>7} {:>7} {:>9} {:>9} {:>9} {:>10} {:>10}".format(
+            "endpoint", "count", "errors", "retries", "p50 [ms]", "p95 [ms]", "p99 [ms]",
+            "sent [kB]", "recv [kB]",
+        ), file=file)
+        for endpoint, stats in data["endpoints"].items():
+            print("{:<45} {:>7} {:>7} {:>7} {:>9.1f} {:>9.1f} {:>9.1f} {:>10.1f} {:>10.1f}".format(
+                endpoint, stats["count"], stats["errors"], stats["retries"],
+                stats["p50"] * 1000, stats["p95"] * 1000, stats["p99"] * 1000,
+                stats["bytes_out"] / 1024, stats["bytes_in"] / 1024,
+            ), file=file)
+        for parser, stats in data["parsers"].items():
+            print("Parsing {}: {} times, {:.2f} s".format(parser, stats["count"], stats["seconds"]), file=file)
+
+    def write_json(self, path):
+        """
+        Write the metrics to JSON file.
+        """
+        _write_atomic(path, json.dumps(self.snapshot(), indent=2))
+
+    def write_prometheus(self, path):
+        """
+        Write the metrics to file in Prometheus text format.
+        """
+        data = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append("# HELP anitya_scripts_{} {}".format(name, help_text))
+            lines.append("# TYPE anitya_scripts_{} {}".format(name, kind))
+            for labels, value in samples:
+                lines.append("anitya_scripts_{}{{{}}} {}".format(
+                    name, ",".join('{}="{}"'.format(key, value) for key, value in labels), value
+                ))
+
+        endpoints = [
+            ((("method", endpoint.split(" ", 1)[0]), ("path", endpoint.split(" ", 1)[1])), stats)
+            for endpoint, stats in data["endpoints"].items()
+        ]
+        for name, key, help_text in (
+            ("requests_total", "count", "Requests sent"),
+            ("request_errors_total", "errors", "Requests failed or answered with error status"),
+            ("request_retries_total", "retries", "Requests retried"),
+            ("request_bytes_total", "bytes_out", "Bytes of request bodies sent"),
+            ("response_bytes_total", "bytes_in", "Bytes of response bodies received"),
+        ):
+            metric(name, "counter", help_text, [(labels, stats[key]) for labels, stats in endpoints])
+        lines.append("# HELP anitya_scripts_request_duration_seconds Latency of requests")
+        lines.append("# TYPE anitya_scripts_request_duration_seconds summary")
+        for labels, stats in endpoints:
+            label_text = ",".join('{}="{}"'.format(key, value) for key, value in labels)
+            for percent in PERCENTILES:
+                lines.append('anitya_scripts_request_duration_seconds{{{},quantile="{}"}} {}'.format(
+                    label_text, percent / 100, stats["p{}".format(percent)]
+                ))
+            lines.append("anitya_scripts_request_duration_seconds_sum{{{}}} {}".format(
+                label_text, stats["seconds"]
+            ))
+            lines.append("anitya_scripts_request_duration_seconds_count{{{}}} {}".format(
+                label_text, stats["count"]
+            ))
+        parsers = [((("parser", parser),), stats) for parser, stats in data["parsers"].items()]
+        metric("parse_total", "counter", "Parsed documents",
+               [(labels, stats["count"]) for labels, stats in parsers])
+        metric("parse_seconds_total", "counter", "Time spent in parsing",
+               [(labels, stats["seconds"]) for labels, stats in parsers])
+        _write_atomic(path, "\n".join(lines) + "\n")
+
+    def report(self):
+        """
+        Print summary and write metrics files, if anything was recorded.
+        """
+        if not self.endpoints and not self.parsers:
+            return
+        if SUMMARY:
+            self.print_summary()
+        if JSON_FILE:
+            self.write_json(JSON_FILE)
+        if PROMETHEUS_FILE:
+            self.write_prometheus(PROMETHEUS_FILE)
+
+    def _endpoint(self, method, url):
+        endpoint = "{} {}".format(method, endpoint_path(url))
+        if endpoint not in self.endpoints:
+            self.endpoints[endpoint] = {
+                "count": 0, "errors": 0, "retries": 0, "bytes_in": 0, "bytes_out": 0, "latencies": [],
+            }
+        return self.endpoints[endpoint]
+
+
+def endpoint_path(url):
+    """
+    Get path of the URL with ids replaced by placeholders.
+
+    Params:
+        url (str): Requested URL
+
+    Returns:
+        (str): Path identifying the endpoint, like "/project/{id}"
+    """
+    path = urlparse(url).path or "/"
+    for pattern, replacement in ENDPOINT_PATTERNS:
+        path, replaced = pattern.subn(replacement, path)
+        if replaced:
+            break
+    return path
+
+
+def percentile(values, percent):
+    """
+    Get percentile of sorted values using nearest rank method.
+
+    Params:
+        values (list): Sorted values
+        percent (int): Percentile to get
+
+    Returns:
+        (float): Percentile, 0 for no values
+    """
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+def _write_atomic(path, content):
+    """
+    Write the file under temporary name and rename it, so readers
+    never see partially written file.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+METRICS = Metrics()
+atexit.register(METRICS.report)
@@ -0,0 +1,223 @@
+"""
+Structured output of the results of the scripts.
+
+Results are written as rows (dicts) by a buffered writer, so large results
+are written in a few big writes instead of one `print` per row and other
+tools don't need to parse the text output. Rows are buffered and written
+every BUFFER_ROWS rows, keys not in `fields` are ignored.
+
+Formats:
+    jsonl   one JSON object per line
+    csv     comma separated values with header
+    parquet columnar Parquet file, only available with `pyarrow` installed
+
+FORMATS contains only the formats available in this environment.
+
+**Example**:
+    with open_writer("csv", "packages.csv", (("project_id", int), ("name", str))) as writer:
+        for package in packages:
+            writer.write(package)
+"""
+import csv
+import importlib.util
+import json
+import operator
+import sys
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# pyarrow is slow to import, it's only imported when Parquet is written
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+# Number of rows kept in memory before they are written
+BUFFER_ROWS = 10000
+
+
+class Writer:
+    """
+    Buffered writer of rows.
+
+    Attributes:
+        fields (:obj:`tuple` of :obj:`tuple`): Pairs of (name, type) of
+                                               the written fields
+        rows (int): Number of rows written
+    """
+
+    # Writer needs file opened in binary mode
+    binary = False
+
+    def __init__(self, file, fields, close_file=False):
+        self.file = file
+        self.fields = tuple(fields)
+        self.names = [name for name, _ in self.fields]
+        self._name_set = set(self.names)
+        self.rows = 0
+        self._buffer = []
+        self._close_file = close_file
+
+    def write(self, row):
+        """
+        Write the row, it is buffered until BUFFER_ROWS rows are collected.
+
+        Params:
+            row (dict): Row to write
+        """
+        self._buffer.append(row)
+        if len(self._buffer) >= BUFFER_ROWS:
+            self.flush()
+
+    def write_rows(self, rows):
+        """
+        Write all the rows.
+
+        Params:
+            rows (iterable): Rows to write
+        """
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        if self._buffer:
+            self._write_batch(self._buffer)
+            self.rows += len(self._buffer)
+            self._buffer = []
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        if self._close_file:
+            self.file.close()
+
+    def _write_batch(self, rows):
+        raise NotImplementedError
+
+    def _project(self, row):
+        """
+        Get the row with exactly the written fields in the order of fields.
+        """
+        return {name: row.get(name) for name in self.names}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JsonLinesWriter(Writer):
+
+    def _write_batch(self, rows):
+        if orjson is not None:
+            dumps = orjson.dumps
+            self.file.write(b"".join([
+                dumps(self._project(row), option=orjson.OPT_APPEND_NEWLINE) for row in rows
+            ]).decode("utf-8"))
+            return
+        self.file.write("".join([json.dumps(self._project(row)) + "\n" for row in rows]))
+
+
+class CsvWriter(Writer):
+
+    def __init__(self, file, fields, close_file=False):
+        super().__init__(file, fields, close_file)
+        self._writer = csv.writer(file)
+        self._writer.writerow(self.names)
+        self._values = operator.itemgetter(*self.names) if len(self.names) > 1 else None
+
+    def _write_batch(self, rows):
+        if self._values is None:
+            self._writer.writerows([row.get(name) for name in self.names] for row in rows)
+            return
+        self._writer.writerows([
+            self._values(row) if row.keys() >= self._name_set else [row.get(name) for name in self.names]
+            for row in rows
+        ])
+
+
+class ParquetWriter(Writer):
+
+    binary = True
+    # Arrow types of the field types
+    TYPES = {int: "int64", float: "float64", str: "string", bool: "bool"}
+
+    def __init__(self, file, fields, close_file=False):
+        import pyarrow
+        import pyarrow.parquet
+
+        super().__init__(file, fields, close_file)
+        self._pyarrow = pyarrow
+        self.schema = pyarrow.schema(
+            (name, pyarrow.type_for_alias(self.TYPES[field_type])) for name, field_type in self.fields
+        )
+        self._writer = pyarrow.parquet.ParquetWriter(file, self.schema)
+
+    def _write_batch(self, rows):
+        # Every batch is one row group
+        self._writer.write_table(self._pyarrow.Table.from_pydict(
+            {name: [row.get(name) for row in rows] for name in self.names}, schema=self.schema
+        ))
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+        if self._close_file:
+            self.file.close()
+
+
+WRITERS = {"jsonl": JsonLinesWriter, "csv": CsvWriter}
+if HAS_PYARROW:
+    WRITERS["parquet"] = ParquetWriter
+FORMATS = tuple(WRITERS)
+
+
+def open_writer(output_format, file=None, fields=()):
+    """
+    Create writer of the format.
+
+    Params:
+        output_format (str): One of FORMATS
+        file: Path of the file or file object to write to, defaults to stdout
+        fields (:obj:`tuple` of :obj:`tuple`): Pairs of (name, type) of
+                                               the written fields
+
+    Returns:
+        (`Writer`): Writer, close it when all rows are written
+
+    Raises:
+        ValueError: When the format is not available
+    """
+    if output_format not in WRITERS:
+        raise ValueError("Unknown output format '{}', expected one of {}".format(output_format, FORMATS))
+    writer_class = WRITERS[output_format]
+    if file is None:
+        file = sys.stdout
+    if isinstance(file, str):
+        if writer_class.binary:
+            return writer_class(open(file, "wb"), fields, close_file=True)
+        return writer_class(open(file, "w", newline=""), fields, close_file=True)
+    if writer_class.binary:
+        file = getattr(file, "buffer", file)
+    return writer_class(file, fields)
+
+
+def write(output_format, rows, file=None, fields=()):
+    """
+    Write all the rows.
+
+    Params:
+        output_format (str): One of FORMATS
+        rows (iterable): Rows to write
+        file: Path of the file or file object to write to, defaults to stdout
+        fields (:obj:`tuple` of :obj:`tuple`): Pairs of (name, type) of
+                                               the written fields
+
+    Returns:
+        (int): Number of rows written
+    """
+    with open_writer(output_format, file, fields) as writer:
+        writer.write_rows(rows)
+    return writer.rows
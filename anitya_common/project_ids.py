@@ -0,0 +1,172 @@
+"""
+Cache of Anitya project ids resolved from project names.
+
+Resolving project name to id takes one request to `/api/v2/projects`.
+Resolved ids are kept in memory and stored in SQLite database at CACHE_PATH,
+so following runs only ask Anitya for projects not resolved in the last
+MAX_AGE seconds. Projects which were not found are cached as well, but only
+for MISSING_MAX_AGE seconds, as they could be created meanwhile. Projects
+missing in cache are resolved concurrently.
+
+**Example**:
+    with ProjectIdCache("https://release-monitoring.org/") as cache:
+        project_ids = cache.resolve([("requests", "pypi")], get_project_id)
+"""
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "anitya_scripts", "project_ids.sqlite")
+# Resolved project id younger than this (in seconds) is used without asking Anitya
+MAX_AGE = 24 * 60 * 60
+# Same for projects which were not found
+MISSING_MAX_AGE = 60 * 60
+# Number of projects resolved concurrently
+MAX_WORKERS = 8
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS project_ids (
+    server TEXT NOT NULL,
+    name TEXT NOT NULL,
+    ecosystem TEXT NOT NULL,
+    project_id INTEGER,
+    resolved_on REAL NOT NULL,
+    PRIMARY KEY (server, name, ecosystem)
+);
+"""
+
+
+class ProjectIdCache:
+    """
+    Project ids of one Anitya instance, keyed by project name and ecosystem.
+
+    Only the thread which created the cache could use it, the resolving
+    is done in worker threads, but the results are stored by the caller.
+    """
+
+    def __init__(self, server_url, path=None, max_age=MAX_AGE, missing_max_age=MISSING_MAX_AGE):
+        """
+        Open the cache.
+
+        Params:
+            server_url (str): URL of Anitya, ids are kept for every server separately
+            path (str): Path to the database, defaults to CACHE_PATH,
+                        ":memory:" keeps the ids only for this run
+            max_age (float): Seconds the resolved id is valid for
+            missing_max_age (float): Seconds the project not found is valid for
+        """
+        path = path or CACHE_PATH
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.server_url = server_url
+        self.max_age = max_age
+        self.missing_max_age = missing_max_age
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+        self._memo = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def get(self, name, ecosystem=None):
+        """
+        Get project id from cache.
+
+        Params:
+            name (str): Name of the project
+            ecosystem (str): Ecosystem of the project
+
+        Returns:
+            (tuple): Pair of (cached, project_id), project_id is None when the
+                     project wasn't found in Anitya or isn't cached
+        """
+        key = (name, ecosystem or "")
+        if key in self._memo:
+            return True, self._memo[key]
+        row = self.connection.execute(
+            "SELECT project_id, resolved_on FROM project_ids WHERE server = ? AND name = ? AND ecosystem = ?",
+            (self.server_url,) + key,
+        ).fetchone()
+        if row is None:
+            return False, None
+        project_id, resolved_on = row
+        max_age = self.max_age if project_id is not None else self.missing_max_age
+        if time.time() - resolved_on > max_age:
+            return False, None
+        self._memo[key] = project_id
+        return True, project_id
+
+    def store(self, resolved):
+        """
+        Store resolved project ids.
+
+        Params:
+            resolved (dict): Project id, or None if not found, of every
+                             (name, ecosystem) pair
+        """
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO project_ids VALUES (?, ?, ?, ?, ?)",
+                (
+                    (self.server_url, name, ecosystem or "", project_id, now)
+                    for (name, ecosystem), project_id in resolved.items()
+                ),
+            )
+        self._memo.update(
+            ((name, ecosystem or ""), project_id) for (name, ecosystem), project_id in resolved.items()
+        )
+
+    def resolve(self, projects, resolver, max_workers=MAX_WORKERS):
+        """
+        Get ids of the projects, resolving the ones not in cache concurrently.
+
+        Params:
+            projects (iterable): Pairs of (name, ecosystem), every pair is
+                                 resolved once even if repeated
+            resolver (callable): Called with name and ecosystem, returns
+                                 project id or None if not found, fails
+                                 with `requests.RequestException` on error
+            max_workers (int): Maximum number of resolvers running at once
+
+        Returns:
+            (dict): Project id of every (name, ecosystem) pair, None if
+                    the project wasn't found or resolving failed
+        """
+        result = {}
+        missing = []
+        for key in dict.fromkeys(projects):
+            cached, project_id = self.get(*key)
+            if cached:
+                result[key] = project_id
+            else:
+                missing.append(key)
+        if not missing:
+            return result
+
+        def resolve_one(key):
+            try:
+                return resolver(*key), True
+            except requests.RequestException as e:
+                print("ERROR: Resolving project '{}' failed: {}".format(key[0], e))
+                return None, False
+
+        resolved = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for key, (project_id, ok) in zip(missing, executor.map(resolve_one, missing)):
+                result[key] = project_id
+                # Failed requests are tried again next time
+                if ok:
+                    resolved[key] = project_id
+        self.store(resolved)
+        return result
@@ -0,0 +1,333 @@
+"""
+Local snapshot of Anitya packages and projects catalogue stored in SQLite.
+
+First use downloads the whole catalogue from `/api/v2/packages` and
+`/api/v2/projects`, later uses only query the local database. The snapshot
+is refreshed when it's older than MAX_AGE:
+
+    1) Probe the first page to get current total amount of items
+    2) If the amount grew, download the page where the stored items end
+       and the pages after it. Anitya pages are stable, new items are
+       appended to the end, so only these pages are stored when:
+         - every item on the first page and on the page where the stored
+           items end is the same as the stored one, all columns compared,
+           so projects changed there (new version, `updated_on`) count
+           as change too
+         - none of the appended items is already stored, which happens
+           when items before them were deleted or inserted
+    3) Otherwise, or when last full refresh is older than FULL_REFRESH_AGE,
+       download everything again. Unchanged amount is refreshed fully too,
+       one item deleted and another added can't be told from no change.
+       Changes cancelling out between the compared pages are only picked up
+       by the full refresh.
+
+**Example**:
+    with Snapshot("https://release-monitoring.org/") as snapshot:
+        snapshot.refresh("projects")
+        for project in snapshot.projects(ecosystem="crates.io"):
+            print(project["id"])
+"""
+import math
+import os
+import sqlite3
+import time
+
+from anitya_common import decode
+from anitya_common.client import Client
+
+
+SNAPSHOT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "anitya_scripts", "snapshot.sqlite")
+# Snapshot younger than this (in seconds) is used without asking Anitya
+MAX_AGE = 24 * 60 * 60
+# Everything is downloaded again when last full refresh is older than this
+FULL_REFRESH_AGE = 7 * 24 * 60 * 60
+ITEMS_PER_PAGE = 250
+
+# Columns stored for every scope, first columns are identifying the item
+SCOPES = {
+    "packages": ("name", "distribution", "project", "ecosystem"),
+    "projects": ("id", "name", "ecosystem", "version", "updated_on"),
+}
+KEY_COLUMNS = {
+    "packages": ("name", "distribution"),
+    "projects": ("id",),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    server TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    total_items INTEGER NOT NULL,
+    refreshed_on REAL NOT NULL,
+    full_refresh_on REAL NOT NULL,
+    PRIMARY KEY (server, scope)
+);
+CREATE TABLE IF NOT EXISTS packages (
+    server TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT,
+    distribution TEXT,
+    project TEXT,
+    ecosystem TEXT,
+    PRIMARY KEY (server, position)
+);
+CREATE INDEX IF NOT EXISTS packages_name ON packages (server, name, distribution);
+CREATE TABLE IF NOT EXISTS projects (
+    server TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    id INTEGER,
+    name TEXT,
+    ecosystem TEXT,
+    version TEXT,
+    updated_on REAL,
+    PRIMARY KEY (server, position)
+);
+CREATE INDEX IF NOT EXISTS projects_name ON projects (server, name, ecosystem);
+CREATE INDEX IF NOT EXISTS projects_ecosystem ON projects (server, ecosystem);
+"""
+
+
+class Snapshot:
+    """
+    Snapshot of Anitya catalogue for one server.
+
+    Attributes:
+        server_url (str): Anitya URL, for example "https://release-monitoring.org/"
+        connection (`sqlite3.Connection`): Connection to the snapshot database
+        client (`anitya_common.client.Client`): Client used for refresh
+    """
+
+    def __init__(self, server_url, path=None, client=None):
+        """
+        Open the snapshot database, creating it when missing.
+
+        Params:
+            server_url (str): Anitya URL
+            path (str): Path to the database, defaults to SNAPSHOT_PATH
+            client (`anitya_common.client.Client`): Client used for refresh,
+                                                    new one is created if
+                                                    not provided
+        """
+        path = path or SNAPSHOT_PATH
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.server_url = server_url
+        self.client = client or Client()
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Close the snapshot database.
+        """
+        self.connection.close()
+
+    def refresh(self, scope, force=False):
+        """
+        Refresh the scope of the snapshot if it's outdated.
+
+        Params:
+            scope (str): "packages" or "projects"
+            force (bool): Refresh even if the snapshot is younger than MAX_AGE
+        """
+        meta = self.connection.execute(
+            "SELECT * FROM meta WHERE server = ? AND scope = ?", (self.server_url, scope)
+        ).fetchone()
+        now = time.time()
+        if meta and not force and now - meta["refreshed_on"] < MAX_AGE:
+            return
+
+        first_page, total_items = self._request_page(scope, 1)
+        pages = math.ceil(total_items / ITEMS_PER_PAGE)
+        fetched = {1: first_page}
+        full_refresh = (
+            meta is None
+            or meta["total_items"] == 0
+            or total_items <= meta["total_items"]
+            or now - meta["full_refresh_on"] > FULL_REFRESH_AGE
+            or not self._matches_stored(scope, 0, first_page)
+        )
+        start_page = 1
+        if not full_refresh:
+            # Page holding the last stored item, it has to be the same,
+            # otherwise items were deleted or inserted before it
+            start_page = (meta["total_items"] - 1) // ITEMS_PER_PAGE + 1
+            if start_page not in fetched:
+                fetched[start_page], _ = self._request_page(scope, start_page)
+            full_refresh = not self._matches_stored(
+                scope, (start_page - 1) * ITEMS_PER_PAGE, fetched[start_page]
+            )
+        if not full_refresh:
+            for page in range(start_page + 1, pages + 1):
+                fetched[page], _ = self._request_page(scope, page)
+            full_refresh = self._contains_stored(scope, meta["total_items"], fetched)
+        if full_refresh:
+            start_page = 1
+
+        print("Refreshing snapshot of {} from page '{}' of '{}'".format(scope, start_page, pages))
+        with self.connection:
+            if full_refresh:
+                self.connection.execute(
+                    "DELETE FROM {} WHERE server = ?".format(scope), (self.server_url,)
+                )
+            for page in range(start_page, pages + 1):
+                if page in fetched:
+                    items = fetched.pop(page)
+                else:
+                    items, _ = self._request_page(scope, page)
+                self._store_items(scope, (page - 1) * ITEMS_PER_PAGE, items)
+            self.connection.execute(
+                "DELETE FROM {} WHERE server = ? AND position >= ?".format(scope),
+                (self.server_url, total_items),
+            )
+            self._store_meta(
+                scope, total_items, now, now if full_refresh else meta["full_refresh_on"]
+            )
+
+    def packages(self):
+        """
+        Iterate over all packages in snapshot.
+
+        Yields:
+            (dict): Package represented as dict containing name,
+                    distribution, project, ecosystem
+        """
+        cursor = self.connection.execute(
+            "SELECT name, distribution, project, ecosystem FROM packages "
+            "WHERE server = ? ORDER BY position",
+            (self.server_url,),
+        )
+        for row in cursor:
+            yield dict(row)
+
+    def projects(self, ecosystem=None):
+        """
+        Iterate over projects in snapshot.
+
+        Params:
+            ecosystem (str): Return only projects in this ecosystem
+
+        Yields:
+            (dict): Project represented as dict containing id, name,
+                    ecosystem, version, updated_on
+        """
+        query = "SELECT id, name, ecosystem, version, updated_on FROM projects WHERE server = ?"
+        params = [self.server_url]
+        if ecosystem:
+            query += " AND ecosystem = ?"
+            params.append(ecosystem)
+        for row in self.connection.execute(query + " ORDER BY position", params):
+            yield dict(row)
+
+    def package(self, name, distribution="Fedora"):
+        """
+        Find package in snapshot.
+
+        Params:
+            name (str): Name of the package
+            distribution (str): Distribution of the package
+
+        Returns:
+            (dict): Package represented as dict containing name,
+                    distribution, project, ecosystem. None if not found.
+        """
+        row = self.connection.execute(
+            "SELECT name, distribution, project, ecosystem FROM packages "
+            "WHERE server = ? AND name = ? AND distribution = ?",
+            (self.server_url, name, distribution),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def project_id(self, name, ecosystem=None):
+        """
+        Find id of project in snapshot.
+
+        Params:
+            name (str): Name of the project
+            ecosystem (str): Ecosystem of the project, project names
+                             are only unique inside ecosystem
+
+        Returns:
+            (int): Project id, None if not found
+        """
+        query = "SELECT id FROM projects WHERE server = ? AND name = ?"
+        params = [self.server_url, name]
+        if ecosystem:
+            query += " AND ecosystem = ?"
+            params.append(ecosystem)
+        row = self.connection.execute(query + " ORDER BY position LIMIT 1", params).fetchone()
+        return row["id"] if row else None
+
+    def _request_page(self, scope, page):
+        """
+        Request page from Anitya.
+
+        Returns:
+            (tuple): List of items on page and total amount of items
+        """
+        params = {
+            "items_per_page": ITEMS_PER_PAGE,
+            "page": page
+        }
+        resp = self.client.get(self.server_url + "api/v2/" + scope, params=params, stream=decode.STREAM)
+        resp.raise_for_status()
+        response_page = decode.decode_page(resp, "items", SCOPES[scope])
+        return response_page.items, response_page.meta["total_items"]
+
+    def _matches_stored(self, scope, position, items):
+        """
+        Check if items starting on position are the same as the stored ones,
+        items past the stored ones aren't compared.
+        """
+        columns = SCOPES[scope]
+        rows = self.connection.execute(
+            "SELECT {} FROM {} WHERE server = ? AND position >= ? AND position < ? ORDER BY position".format(
+                ", ".join(columns), scope
+            ),
+            (self.server_url, position, position + len(items)),
+        ).fetchall()
+        return [tuple(row) for row in rows] == [
+            tuple(item.get(column) for column in columns) for item in items[:len(rows)]
+        ]
+
+    def _contains_stored(self, scope, stored_items, fetched):
+        """
+        Check if any of the fetched items after the stored ones is already stored.
+        """
+        columns = KEY_COLUMNS[scope]
+        stored = {
+            tuple(row) for row in self.connection.execute(
+                "SELECT {} FROM {} WHERE server = ?".format(", ".join(columns), scope), (self.server_url,)
+            )
+        }
+        return any(
+            tuple(item.get(column) for column in columns) in stored
+            for page, items in fetched.items()
+            for position, item in enumerate(items, (page - 1) * ITEMS_PER_PAGE)
+            if position >= stored_items
+        )
+
+    def _store_items(self, scope, position, items):
+        columns = SCOPES[scope]
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO {} (server, position, {}) VALUES (?, ?, {})".format(
+                scope, ", ".join(columns), ", ".join("?" * len(columns))
+            ),
+            (
+                (self.server_url, position + index) + tuple(item.get(column) for column in columns)
+                for index, item in enumerate(items)
+            ),
+        )
+
+    def _store_meta(self, scope, total_items, refreshed_on, full_refresh_on):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO meta VALUES (?, ?, ?, ?, ?)",
+            (self.server_url, scope, total_items, refreshed_on, full_refresh_on),
+        )
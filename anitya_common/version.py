@@ -0,0 +1,141 @@
+"""
+Parsing and classification of version changes.
+
+Versions are parsed once into `Version`, repeated versions are taken from
+cache. Leading text like "v" or "release-" is ignored, components could be
+separated by ".", "_" or "-" and anything after the numeric part starting
+with PRERELEASE_RE marks prerelease ("1.0rc1", "v2.0.0-beta.2").
+
+**Example**:
+    classify("v1.9.2", "v2.0.0")      # "major"
+    classify("1.9", "1.10")           # "minor"
+    classify("1", "1.0.1")            # "patch"
+    classify("1.9.2", "2.0.0rc1")     # "prerelease"
+    classify("2.0.0rc1", "2.0.0")     # "major"
+"""
+import re
+from functools import lru_cache
+
+
+# Number of parsed versions kept in cache
+CACHE_SIZE = 65536
+# Kinds of version change returned by classify
+MAJOR = "major"
+MINOR = "minor"
+PATCH = "patch"
+PRERELEASE = "prerelease"
+UNKNOWN = "unknown"
+
+VERSION_RE = re.compile(r"(\d+(?:[._-]\d+)*)(.*)")
+PRERELEASE_RE = re.compile(r"^[._-]?(a|alpha|b|beta|c|rc|pre|preview|dev)(?![a-z])", re.IGNORECASE)
+
+
+class Version:
+    """
+    Parsed version.
+
+    Attributes:
+        release (tuple): Numeric components, empty if the version has none
+        prerelease (bool): Version is a prerelease
+    """
+
+    __slots__ = ("release", "prerelease")
+
+    def __init__(self, release, prerelease=False):
+        self.release = release
+        self.prerelease = prerelease
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, Version)
+            and self.release == other.release
+            and self.prerelease == other.prerelease
+        )
+
+    def __hash__(self):
+        return hash((self.release, self.prerelease))
+
+    def __repr__(self):
+        return "Version({!r}, prerelease={!r})".format(self.release, self.prerelease)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_version(version):
+    """
+    Parse version string.
+
+    Params:
+        version (str): Version, for example "v1.2.0-rc1"
+
+    Returns:
+        (`Version`): Parsed version, shared between calls with the same
+                     string, so it must not be changed
+    """
+    if version and version.replace(".", "").isdecimal():
+        # Most of the versions are plain "1.2.3"
+        return Version(tuple(int(component) for component in version.split(".") if component))
+    match = VERSION_RE.search(version or "")
+    if not match:
+        return Version(())
+    release = tuple(int(component) for component in re.split(r"[._-]", match.group(1)))
+    return Version(release, bool(PRERELEASE_RE.match(match.group(2))))
+
+
+def classify(old_version, new_version):
+    """
+    Classify change from old to new version.
+
+    Missing components are taken as zero, so "1" to "1.1" is a minor change.
+    Final release of a prerelease is classified by its last non-zero
+    component, the one changed since the last stable release, so "2.0.0rc1"
+    to "2.0.0" is a major change and "2.1.0rc1" to "2.1.0" a minor one.
+
+    Params:
+        old_version (str): Previous version
+        new_version (str): New version
+
+    Returns:
+        (str): PRERELEASE when the new version is a prerelease, otherwise
+               MAJOR, MINOR or PATCH by the first changed component.
+               UNKNOWN when any of the versions has no numeric component.
+    """
+    old = parse_version(old_version)
+    new = parse_version(new_version)
+    if new.prerelease:
+        return PRERELEASE
+    if not old.release or not new.release:
+        return UNKNOWN
+    length = max(len(old.release), len(new.release), 2)
+    old_release = old.release + (0,) * (length - len(old.release))
+    new_release = new.release + (0,) * (length - len(new.release))
+    if old.prerelease and old_release == new_release:
+        changed = [index for index, component in enumerate(new_release) if component]
+        if changed and changed[-1] == 0:
+            return MAJOR
+        if changed and changed[-1] == 1:
+            return MINOR
+        return PATCH
+    if old_release[0] != new_release[0]:
+        return MAJOR
+    if old_release[1] != new_release[1]:
+        return MINOR
+    return PATCH
+
+
+def classify_batch(pairs):
+    """
+    Classify many version changes, every distinct change is classified once.
+
+    Params:
+        pairs (iterable): Tuples of (old_version, new_version)
+
+    Returns:
+        (:obj:`list` of :obj:`str`): Kind of every change, see classify
+    """
+    classified = {}
+    result = []
+    for pair in pairs:
+        if pair not in classified:
+            classified[pair] = classify(*pair)
+        result.append(classified[pair])
+    return result
@@ -9,37 +9,93 @@ trigger the-new-hotness.
     12345
     12345
 
+Every project is processed once, even if listed more times. Projects with
+deleted version are recorded in JOURNAL_FILE. When the script is interrupted
+or some projects failed, the journal is kept. With RESUME the next run
+against the same SERVER_URL and the same projects skips the recorded
+projects, so no other version is deleted from them and only the failed
+ones are retried. Without RESUME the next run starts again, running the
+script again on the same projects deletes another version. The journal is
+removed when all the projects succeeded.
+
+Projects are processed by MAX_WORKERS workers in parallel. Every worker
+has its own session with the cookies of the logged in user, so it gets
+its own CSRF token. Projects which failed are listed at the end.
+
+With USE_API the latest versions are read from Anitya JSON API instead
+of the project pages. With DRY_RUN only report `project_id;version` of
+versions which would be deleted is printed, no login is needed for it.
 """
 
 import getpass
-import time
+import math
+import os
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 from bs4 import BeautifulSoup as BS
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from anitya_common import decode  # noqa: E402
+from anitya_common.client import Client  # noqa: E402
+from anitya_common.journal import Journal, input_digest  # noqa: E402
+from anitya_common.metrics import METRICS  # noqa: E402
+
 PROJECTS_FILE = "projects"
 SERVER_URL = "https://stg.release-monitoring.org/"
 LOGIN_URL = "https://id.fedoraproject.org/"
-WAIT_TIME = 0.5
+# File to record processed projects to
+JOURNAL_FILE = PROJECTS_FILE + ".journal"
+# Skip projects recorded in JOURNAL_FILE by unfinished run
+RESUME = False
+# Number of projects processed in parallel
+MAX_WORKERS = 4
+# Read latest versions from JSON API instead of project pages
+USE_API = False
+# Only print versions which would be deleted, implies USE_API
+DRY_RUN = False
+# Page size used when listing all projects through API
+ITEMS_PER_PAGE = 250
+# Fields of projects read from the API, the rest is dropped while decoding
+PROJECT_FIELDS = ("id", "version", "versions")
+
+# Only the first release row and the CSRF token input are needed from the pages,
+# these are found by regular expression and only the found part is parsed
+RELEASE_ROW_RE = re.compile(
+    rb"<tr\b[^>]*\bproperty\s*=\s*[\"']doap:release[\"'][^>]*>.*?</tr>", re.DOTALL | re.IGNORECASE
+)
+CSRF_TOKEN_RE = re.compile(rb"<input\b[^>]*\bid\s*=\s*[\"']csrf_token[\"'][^>]*>", re.IGNORECASE)
+
+
+class DeleteError(Exception):
+    """
+    Raised when the latest version can't be deleted from project.
+    """
 
 
 def login(session, username, password):
     """
-    Log user to Anitya inside requests session.
+    Log user to Anitya inside HTTP client session.
 
     Params:
-        session (`requests.Session`): Requests session HTTP
+        session (`anitya_common.client.Client`): HTTP client
         username (str): FAS username
         password (str): FAS password
     """
 
     resp = session.get(SERVER_URL + "login/fedora/")
-    bs = BS(resp.content, "html.parser")
+    with METRICS.timed("html"):
+        bs = BS(resp.content, "html.parser")
     payload = dict((tag["name"], tag["value"]) for tag in bs.find_all("input", type="hidden"))
     resp = session.post(LOGIN_URL + "openid", data=payload)
 
     resp = session.get(resp.url, allow_redirects=True)
-    bs = BS(resp.content, "html.parser")
+    with METRICS.timed("html"):
+        bs = BS(resp.content, "html.parser")
     payload = {
         "login_name": username,
         "login_password": password,
@@ -59,33 +115,50 @@ def remove_latest_version(session, project):
     3) Remove the latest version
 
     Params:
-        session (`requests.Session`): Requests session
+        session (`anitya_common.client.Client`): HTTP client
         project (str): Project id
+
+    Returns:
+        (str): Deleted version
+
+    Raises:
+        DeleteError: When the version can't be deleted
     """
 
     resp = session.get(SERVER_URL + "project/" + project)
     if resp.status_code != 200:
-        print("ERROR: Project '{}' not found. URL: '{}'".format(project, SERVER_URL + "project/" + project))
-        return
-    bs = BS(resp.content, "html.parser")
-    try:
-        latest_version_row = bs.findAll("tr", property="doap:release")[0]
-        latest_version = latest_version_row.findAll("td")[2].string
-    except IndexError:
-        print("ERROR: No version found on {}".format(SERVER_URL + "project/" + project))
-        return
-    resp = session.get(SERVER_URL + "project/" + project + "/delete/" + latest_version, cookies=session.cookies)
+        raise DeleteError("Project '{}' not found. URL: '{}'".format(project, SERVER_URL + "project/" + project))
+    with METRICS.timed("html"):
+        latest_version = extract_latest_version(resp.content)
+    if not latest_version:
+        raise DeleteError("No version found on {}".format(SERVER_URL + "project/" + project))
+    return delete_version(session, project, latest_version)
+
+
+def delete_version(session, project, latest_version):
+    """
+    Delete version from project.
+
+    Params:
+        session (`anitya_common.client.Client`): HTTP client
+        project (str): Project id
+        latest_version (str): Version to delete
+
+    Returns:
+        (str): Deleted version
+
+    Raises:
+        DeleteError: When the version can't be deleted
+    """
+    resp = session.get(SERVER_URL + "project/" + project + "/delete/" + latest_version)
     if resp.status_code != 200:
-        print("ERROR: Version '{}' not found on project '{}'. URL: '{}'".format(
+        raise DeleteError("Version '{}' not found on project '{}'. URL: '{}'".format(
             latest_version, project, SERVER_URL + "project/" + project + "/delete/" + latest_version)
         )
-        return
-    bs = BS(resp.content, "html.parser")
-    try:
-        csrf_token = bs.find("input", id="csrf_token")["value"]
-    except AttributeError:
-        print("ERROR: CSRF token not found. Something is wrong")
-        return
+    with METRICS.timed("html"):
+        csrf_token = extract_csrf_token(resp.content)
+    if not csrf_token:
+        raise DeleteError("CSRF token not found. Something is wrong")
     payload = {
         "csrf_token": csrf_token,
         "confirm": "Yes"
@@ -93,35 +166,261 @@ def remove_latest_version(session, project):
     resp = session.post(
         SERVER_URL + "project/" + project + "/delete/" + latest_version, data=payload
     )
-    if resp.status_code == 200:
-        print("Version '{}' deleted on project '{}'. URL: '{}'".format(
-            latest_version, project, SERVER_URL + "project/" + project + "/delete/" + latest_version)
-        )
-    else:
-        print("ERROR: Can't delete version '{}' on project '{}'. URL: '{}'".format(
+    if resp.status_code != 200:
+        raise DeleteError("Can't delete version '{}' on project '{}'. URL: '{}'".format(
             latest_version, project, SERVER_URL + "project/" + project + "/delete/" + latest_version)
         )
 
+    print("Version '{}' deleted on project '{}'. URL: '{}'".format(
+        latest_version, project, SERVER_URL + "project/" + project + "/delete/" + latest_version)
+    )
+    return latest_version
 
-if __name__ ==  "__main__":
+
+def get_latest_versions(session, projects, max_workers=None):
+    """
+    Get latest versions of projects from Anitya JSON API.
+
+    When there are more projects than pages in the listing of all projects,
+    the listing is paged through until all the projects are found. Otherwise
+    every project is requested separately.
+
+    Params:
+        session (`anitya_common.client.Client`): HTTP client, doesn't need
+                                                 to be logged in
+        projects (:obj:`list` of :obj:`str`): Project ids
+        max_workers (int): Number of concurrent requests, defaults to MAX_WORKERS
+
+    Returns:
+        (dict): Latest version of every project found, project id is the key
+    """
+    max_workers = max_workers or MAX_WORKERS
+    wanted = set(projects)
+    versions = {}
+
+    response_page = _request_projects_page(session, 1)
+    pages = math.ceil(response_page.meta["total_items"] / ITEMS_PER_PAGE)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        if len(wanted) > pages:
+            print("Reading latest versions from '{}' pages of projects".format(pages))
+            items = response_page.items
+            next_page = 2
+            while True:
+                for item in items:
+                    project = str(item["id"])
+                    if project in wanted and _latest_version(item):
+                        versions[project] = _latest_version(item)
+                if len(versions) == len(wanted) or next_page > pages:
+                    break
+                batch = range(next_page, min(next_page + max_workers, pages + 1))
+                next_page = batch.stop
+                items = [
+                    item
+                    for page_response in executor.map(lambda page: _request_projects_page(session, page), batch)
+                    for item in page_response.items
+                ]
+        else:
+            for project, version in zip(projects, executor.map(
+                lambda project: _request_latest_version(session, project), projects
+            )):
+                if version:
+                    versions[project] = version
+
+    return versions
+
+
+def _request_projects_page(session, page):
+    resp = session.get(
+        SERVER_URL + "api/v2/projects",
+        params={"items_per_page": ITEMS_PER_PAGE, "page": page},
+        stream=decode.STREAM,
+    )
+    resp.raise_for_status()
+    return decode.decode_page(resp, "items", PROJECT_FIELDS)
+
+
+def _request_latest_version(session, project):
+    resp = session.get(SERVER_URL + "api/project/" + project)
+    if resp.status_code != 200:
+        print("ERROR: Project '{}' not found. URL: '{}'".format(project, resp.url))
+        return None
+    with METRICS.timed("json"):
+        return _latest_version(resp.json())
+
+
+def _latest_version(project_dict):
+    """
+    Get latest version from project JSON, the same one shown
+    as the first row on the project page.
+    """
+    if project_dict.get("versions"):
+        return project_dict["versions"][0]
+    return project_dict.get("version")
+
+
+def extract_latest_version(content):
+    """
+    Extract latest version from project page.
+
+    The scan stops at the first release row and only this row is parsed,
+    whole page is parsed only when the row can't be found this way.
+
+    Params:
+        content (bytes): Content of the project page
+
+    Returns:
+        (str): Latest version, None if there is no version on page
+    """
+    match = RELEASE_ROW_RE.search(content)
+    if match:
+        cells = BS(match.group(0), "html.parser").findAll("td")
+        if len(cells) > 2:
+            return cells[2].string
+
+    bs = BS(content, "html.parser")
+    try:
+        latest_version_row = bs.findAll("tr", property="doap:release")[0]
+        return latest_version_row.findAll("td")[2].string
+    except IndexError:
+        return None
+
+
+def extract_csrf_token(content):
+    """
+    Extract CSRF token from page with form.
+
+    The scan stops at the CSRF token input and only this tag is parsed,
+    whole page is parsed only when the input can't be found this way.
+
+    Params:
+        content (bytes): Content of the page
+
+    Returns:
+        (str): CSRF token, None if not found
+    """
+    match = CSRF_TOKEN_RE.search(content)
+    if match:
+        csrf_input = BS(match.group(0), "html.parser").find("input")
+        if csrf_input and csrf_input.get("value"):
+            return csrf_input["value"]
+
+    csrf_input = BS(content, "html.parser").find("input", id="csrf_token")
+    if csrf_input:
+        return csrf_input.get("value")
+    return None
+
+
+def remove_latest_versions(session, projects, max_workers=None, journal=None, versions=None):
+    """
+    Remove latest version from projects in parallel.
+
+    Every worker gets its own HTTP client with copy of the cookies from
+    the logged in session, so requests of one worker don't change the
+    session (and CSRF token) of another worker.
+
+    Params:
+        session (`anitya_common.client.Client`): Logged in HTTP client
+        projects (:obj:`list` of :obj:`str`): Project ids
+        max_workers (int): Number of parallel workers, defaults to MAX_WORKERS
+        journal (`anitya_common.journal.Journal`): Journal to record projects
+                                                   with deleted version to
+        versions (dict): Latest versions of projects from get_latest_versions,
+                         if provided project pages are not read
+
+    Returns:
+        (dict): Errors of failed projects, project id is the key
+    """
+    max_workers = max_workers or MAX_WORKERS
+    # Every listed project loses only one version
+    projects = list(dict.fromkeys(projects))
+    worker = threading.local()
+    worker_sessions = []
+
+    def remove(project):
+        if not hasattr(worker, "session"):
+            worker.session = Client(pool_size=1)
+            worker.session.session.cookies.update(session.session.cookies)
+            worker_sessions.append(worker.session)
+        try:
+            if versions is None:
+                deleted_version = remove_latest_version(worker.session, project)
+            elif project in versions:
+                deleted_version = delete_version(worker.session, project, versions[project])
+            else:
+                raise DeleteError("No version found for project '{}'".format(project))
+        except (DeleteError, requests.RequestException) as exc:
+            print("ERROR: {}".format(exc))
+            return str(exc)
+        if journal:
+            journal.record(project, deleted_version)
+        return None
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            errors = {
+                project: error
+                for project, error in zip(projects, executor.map(remove, projects))
+                if error
+            }
+    finally:
+        for worker_session in worker_sessions:
+            worker_session.close()
+
+    return errors
+
+
+def main(output_format="text"):
+    """
+    Remove latest version from projects in PROJECTS_FILE, asking for credentials.
+
+    Params:
+        output_format (str): With "text" the result is printed,
+                             otherwise it's only returned
+
+    Returns:
+        (dict): With DRY_RUN latest version of every project, otherwise
+                errors of failed projects, project id is the key
+    """
     projects = []
     with open(PROJECTS_FILE, "r") as f:
         projects = f.readlines()
 
+    if DRY_RUN:
+        with Client(pool_size=MAX_WORKERS) as client:
+            projects = list(dict.fromkeys(project.strip() for project in projects if project.strip()))
+            versions = get_latest_versions(client, projects)
+        if output_format == "text":
+            for project in projects:
+                print("{};{}".format(project, versions.get(project, "")))
+        return {project: versions.get(project) for project in projects}
+
     print("Please provide your credentials.")
     username = input("Username: ")
     password = getpass.getpass()
 
-    with requests.Session() as r_session:
-        login(r_session, username, password)
-        for project in projects:
-            checked = False
-            while not checked:
-                try:
-                    remove_latest_version(r_session, project.strip())
-                    checked = True
-                except requests.ConnectionError:
-                    print("Connection error occurred, waiting for '{}' second before retry".format(
-                        WAIT_TIME
-                    ))
-                    time.sleep(WAIT_TIME)
+    projects = list(dict.fromkeys(project.strip() for project in projects if project.strip()))
+    params = {"server": SERVER_URL, "input": input_digest(projects)}
+    with Client() as client, Journal(JOURNAL_FILE, params, resume=RESUME) as journal:
+        login(client, username, password)
+        pending = journal.pending(projects)
+        versions = get_latest_versions(client, pending) if USE_API else None
+        errors = remove_latest_versions(client, pending, journal=journal, versions=versions)
+        if not errors:
+            journal.complete()
+    if errors:
+        print("Projects with deleted version are recorded in '{}', set RESUME to skip them "
+              "when retrying the failed ones".format(JOURNAL_FILE))
+
+    if output_format == "text":
+        print("Processed '{}' projects, '{}' failed, '{}' done by previous run".format(
+            len(pending), len(errors), len(journal.resumed)
+        ))
+        for project, error in errors.items():
+            print("{}: {}".format(project, error))
+
+    return errors
+
+
+if __name__ ==  "__main__":
+    main()
@@ -2,21 +2,113 @@
 
 """
 Report which applications have been updated in the last $DAYS.
+
+Messages are stored in local cache, so next runs only ask datagrepper
+for messages newer than the newest cached one.
+
+With `--consume` messages are received from fedora-messaging as they are
+published and stored to the same cache, then `--offline` reports from the
+cache only, without asking datagrepper at all. Connection to the broker is
+configured by fedora-messaging config file (`FEDORA_MESSAGING_CONF`).
+Messages dumped from datagrepper could be stored by the consumer with
+`--replay`, without any broker.
+
+Reported applications are APPS by default. Other registry could be loaded
+from TOML file with `--registry` and projects of whole ecosystems in Anitya
+could be added with `--anitya-ecosystem`. Updates are reported per team.
+
+**Example registry**:
+    [[app]]
+    name = "anitya"
+    title = "Anitya"
+    release_notes_url = "https://github.com/fedora-infra/anitya/releases/tag/{version}"
+    team = "infra"
+
+    [[app]]
+    name = "requests"
+    title = "Requests"
+    release_notes_url = "https://github.com/psf/requests/releases/tag/v{version}"
+    ecosystem = "pypi"
+    id = 4004
+    team = "python"
 """
 
+import hashlib
 import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, asdict
 from datetime import datetime
 from glob import glob
 from urllib.parse import urljoin
 
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
 import click
 import requests
 
+try:
+    from fedora_messaging import api as fedora_messaging
+except ImportError:
+    fedora_messaging = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from anitya_common import decode  # noqa: E402
+from anitya_common.client import Client  # noqa: E402
+from anitya_common.snapshot import Snapshot  # noqa: E402
+from anitya_common.version import MAJOR, MINOR, PRERELEASE, classify, classify_batch  # noqa: E402
+
 
 DATAGREPPER = "https://apps.fedoraproject.org/datagrepper/"
 DATAGREPPER_STG = "https://apps.stg.fedoraproject.org/datagrepper/"
+# Anitya to read projects from for --anitya-ecosystem
+ANITYA_URL = "https://release-monitoring.org/"
 TOPIC = "org.release-monitoring.prod.anitya.project.version.update.v2"
+# Number of datagrepper pages requested concurrently
+WORKERS = 4
+# Maximum number of app names sent to datagrepper as "contains" filter,
+# with more apps all the messages are fetched to keep the URL short
+MAX_CONTAINS = 50
+# Start of project name field in datagrepper messages, they are matched by
+# "contains" as JSON text (PostgreSQL jsonb, `"key": "value"`). Plain app
+# name matches also other fields, "anitya" is the agent of every message
+# and "pagure" is in URL of every project hosted on pagure.io.
+NAME_FIELD = '"name": "'
+CACHE_FILE = os.path.join(os.path.expanduser("~"), ".cache", "anitya_scripts", "datagrepper.sqlite")
+# Messages older than this (in days) are removed from cache
+CACHE_MAX_AGE = 180
+# Queue the consumer reads, named queue is durable and keeps messages while
+# the consumer is stopped, with None temporary queue is used
+QUEUE = None
+# Number of updates classified at once
+CLASSIFY_BATCH = 500
+# Fields of messages we use, the rest is dropped while decoding
+MESSAGE_FIELDS = (
+    "id",
+    "msg_id",
+    "timestamp",
+    "headers.sent-at",
+    "body.project.id",
+    "body.project.name",
+    "body.project.ecosystem",
+    "body.project.version",
+    "body.project.versions",
+    "body.project.updated_on",
+    "body.message.old_version",
+)
 
 
 @dataclass
@@ -24,6 +116,11 @@ class App:
     name: str
     title: str
     release_notes_url: str
+    # Anitya project names are only unique inside ecosystem, when ecosystem
+    # or id is set only the project matching it is reported
+    ecosystem: str = None
+    id: int = None
+    team: str = "infra"
 
 
 APPS = [
@@ -140,120 +237,619 @@ APPS = [
 ]
 
 
+class Registry:
+    """
+    Apps indexed by Anitya project id and by project name.
+    """
+
+    def __init__(self, apps):
+        self.apps = list(apps)
+        self.by_id = {}
+        self.by_name = {}
+        for app in self.apps:
+            if app.id is not None:
+                self.by_id[app.id] = app
+            else:
+                self.by_name.setdefault(app.name, []).append(app)
+
+    @classmethod
+    def from_toml(cls, path):
+        if tomllib is None:
+            raise click.UsageError("Reading registry needs Python 3.11 or tomli")
+        with open(path, "rb") as fh:
+            data = tomllib.load(fh)
+        return cls(App(**app) for app in data.get("app", []))
+
+    @classmethod
+    def from_anitya(cls, server_url, ecosystems, team=None):
+        with Snapshot(server_url) as snapshot:
+            snapshot.refresh("projects")
+            return cls(
+                App(
+                    name=project["name"],
+                    title=project["name"],
+                    release_notes_url=f"{server_url}project/{project['id']}/",
+                    ecosystem=project["ecosystem"],
+                    id=project["id"],
+                    team=team or project["ecosystem"],
+                )
+                for ecosystem in ecosystems
+                for project in snapshot.projects(ecosystem=ecosystem)
+            )
+
+    @property
+    def names(self):
+        return {app.name for app in self.apps}
+
+    def merge(self, other):
+        return Registry(self.apps + other.apps)
+
+    def for_teams(self, teams):
+        return Registry(app for app in self.apps if app.team in teams)
+
+    def match(self, project):
+        """
+        Find app of the Anitya project, project is matched by id first
+        and by name and ecosystem when no app has its id.
+        """
+        app = self.by_id.get(project.get("id"))
+        if app is not None and app.ecosystem in (None, project.get("ecosystem")):
+            return app
+        for app in self.by_name.get(project.get("name"), ()):
+            if app.ecosystem in (None, project.get("ecosystem")):
+                return app
+        return None
+
+
+REGISTRY = Registry(APPS)
+
+
+def load_registry(registry_file=None, anitya_ecosystems=(), teams=()):
+    registry = Registry.from_toml(registry_file) if registry_file else REGISTRY
+    if anitya_ecosystems:
+        registry = registry.merge(Registry.from_anitya(ANITYA_URL, anitya_ecosystems))
+    if teams:
+        registry = registry.for_teams(teams)
+    return registry
+
+
 @dataclass
 class Update:
     app: App
     datetime: datetime
     version: str
     old_version: str
+    # Classified when the update is created, unless provided
+    update_type: str = None
 
-    def _compare_version_slot(self, slot):
-        return self.old_version.split(".")[slot] == self.version.split(".")[slot]
+    def __post_init__(self):
+        if self.update_type is None:
+            self.update_type = classify(self.old_version, self.version)
 
     @property
     def is_major(self):
-        return not self._compare_version_slot(0)
+        return self.update_type == MAJOR
 
     @property
     def is_minor(self):
-        return not self.is_major and not self._compare_version_slot(1)
+        return self.update_type == MINOR
 
     @property
-    def update_type(self):
-        if self.is_major:
-            return "major"
-        elif self.is_minor:
-            return "minor"
-        else:
-            return "patch"
+    def is_prerelease(self):
+        return self.update_type == PRERELEASE
 
     @property
     def release_notes(self):
         return self.app.release_notes_url.format(**asdict(self))
 
 
-def get_all_pages(url, params=None):
-    http = requests.Session()
+@dataclass
+class FetchStats:
+    bytes: int = 0
+    messages: int = 0
+    kept: int = 0
+
+
+class MessageCache:
+    """
+    Local store of datagrepper messages keyed by message id.
+
+    Every query (datagrepper URL and app names filter) has its own set of
+    messages. `covered_since` is the time since which the stored messages
+    are complete, anything older must be fetched from datagrepper.
+    """
+
+    def __init__(self, path, base_url, names=None):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        query = base_url + TOPIC + ",".join(sorted(names or []))
+        self.key = hashlib.sha1(query.encode("utf-8")).hexdigest()
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS messages (
+                key TEXT NOT NULL,
+                msg_id TEXT NOT NULL,
+                timestamp REAL NOT NULL,
+                message TEXT NOT NULL,
+                PRIMARY KEY (key, msg_id)
+            );
+            CREATE INDEX IF NOT EXISTS messages_timestamp ON messages (key, timestamp);
+            CREATE TABLE IF NOT EXISTS coverage (
+                key TEXT PRIMARY KEY,
+                covered_since REAL NOT NULL
+            );
+        """)
+
+    def close(self):
+        self.connection.close()
+
+    @property
+    def newest(self):
+        row = self.connection.execute(
+            "SELECT MAX(timestamp) FROM messages WHERE key = ?", (self.key,)
+        ).fetchone()
+        return row[0]
+
+    @property
+    def covered_since(self):
+        row = self.connection.execute(
+            "SELECT covered_since FROM coverage WHERE key = ?", (self.key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    @covered_since.setter
+    def covered_since(self, value):
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO coverage VALUES (?, ?)", (self.key, value)
+            )
+
+    def add(self, messages):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO messages VALUES (?, ?, ?, ?)",
+                (
+                    (self.key, message_id(message), message_timestamp(message), json.dumps(message))
+                    for message in messages
+                ),
+            )
+
+    def evict(self, max_age):
+        cutoff = time.time() - 86400 * max_age
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM messages WHERE key = ? AND timestamp < ?", (self.key, cutoff)
+            )
+        if self.covered_since is not None and self.covered_since < cutoff:
+            self.covered_since = cutoff
+
+    def get(self, since):
+        cursor = self.connection.execute(
+            "SELECT message FROM messages WHERE key = ? AND timestamp >= ? ORDER BY timestamp DESC",
+            (self.key, since),
+        )
+        for (message,) in cursor:
+            yield json.loads(message)
+
+
+def message_id(message):
+    return message.get("id") or message["msg_id"]
+
+
+def message_timestamp(message):
+    if "timestamp" in message:
+        return float(message["timestamp"])
+    try:
+        return datetime.fromisoformat(message["headers"]["sent-at"]).timestamp()
+    except (KeyError, ValueError):
+        return float(message["body"]["project"]["updated_on"])
+
+
+def message_versions(message):
+    """
+    Get update time, new and old version of the project from the message.
+    """
+    try:
+        old_version = message["body"]["message"]["old_version"]
+    except KeyError:
+        versions = message["body"]["project"]["versions"]
+        # First version of the project has no previous one
+        old_version = versions[1] if len(versions) > 1 else None
+    return (
+        datetime.fromtimestamp(message["body"]["project"]["updated_on"]),
+        message["body"]["project"]["version"],
+        old_version,
+    )
+
+
+def get_all_pages(url, params=None, workers=WORKERS, stats=None):
+    http = Client(pool_size=workers)
     params = params or {}
     params["rows_per_page"] = 100
     params["page"] = 1
     total_pages = None
+    stats = stats or FetchStats()
+
+    def get_page(page):
+        response = http.get(url, params={**params, "page": page}, stream=decode.STREAM)
+        response.raise_for_status()
+        return decode.decode_page(response, "raw_messages", MESSAGE_FIELDS)
+
+    def counted(response):
+        # Called only by the consumer, so the workers don't race on stats
+        stats.bytes += response.size
+        stats.messages += len(response.items)
+        return response.items
+
     with click.progressbar(
         length=total_pages or 1,
         item_show_func=lambda p: f"Page {p or 1}/{total_pages or '?'}",
-    ) as bar:
-        while True:
-            response = http.get(url, params=params)
-            response.raise_for_status()
-            response = response.json()
-            total_pages = response["pages"]
-            bar.length = total_pages
-            yield response["raw_messages"]
-            if params["page"] == total_pages:
-                break
-            params["page"] += 1
-            bar.update(1, params["page"])
+    ) as bar, ThreadPoolExecutor(max_workers=workers) as executor:
+        response = get_page(1)
+        total_pages = response.meta["pages"]
+        bar.length = total_pages
+        yield counted(response)
+        # The first page tells how many pages there are, the rest is
+        # requested concurrently, keeping at most `workers` pages ahead
+        in_flight = deque()
+        next_page = 2
+        for page in range(2, total_pages + 1):
+            while next_page <= total_pages and len(in_flight) < workers:
+                in_flight.append(executor.submit(get_page, next_page))
+                next_page += 1
+            bar.update(1, page)
+            yield counted(in_flight.popleft().result())
 
 
-def get_messages_from_datagrepper(base_url, duration):
+def get_messages_from_datagrepper(base_url, duration, workers=WORKERS, names=None, stats=None, start=None):
     url = urljoin(base_url, "v2/search")
-    duration = 86400 * duration
-    for messages in get_all_pages(url, {"topic": TOPIC, "delta": duration}):
+    if start is not None:
+        params = {"topic": TOPIC, "start": start}
+    else:
+        params = {"topic": TOPIC, "delta": 86400 * duration}
+    contains = None
+    if names and len(names) <= MAX_CONTAINS:
+        try:
+            contains = choose_contains(url, params, names)
+        except requests.HTTPError as e:
+            click.echo(f"Filtering by app names isn't supported ({e}), fetching all messages", err=True)
+    if contains:
+        # Let datagrepper drop messages not mentioning any of our apps,
+        # "contains" is a substring match, so exact matching is still done locally
+        params = {**params, "contains": contains}
+    for messages in get_all_pages(url, params, workers=workers, stats=stats):
         yield from messages
 
 
+def choose_contains(url, params, names):
+    """
+    Choose "contains" filter of datagrepper moving the fewest messages.
+
+    Project name fields of the apps are used when datagrepper serializes the
+    messages as NAME_FIELD expects, plain app names otherwise. The filter is
+    only used when it matches fewer messages than there are, the totals are
+    read from one row pages.
+
+    Returns:
+        (list): Values of "contains", None to fetch all messages
+    """
+    with Client() as http:
+        def count(contains=None):
+            response = http.get(url, params={**params, "contains": contains, "rows_per_page": 1, "page": 1})
+            response.raise_for_status()
+            return response.json()["total"]
+
+        total = count()
+        if not total:
+            return None
+        if count([NAME_FIELD]) == total:
+            contains = [f"{NAME_FIELD}{name}\"" for name in sorted(names)]
+        else:
+            contains = sorted(names)
+        matching = count(contains)
+    click.echo(f"Filter by app names matches {matching} of {total} messages", err=True)
+    return contains if matching < total else None
+
+
 def get_messages_from_file(base_url, duration):
     for fn in sorted(glob("updates-today-*.json")):
         with open(fn) as fh:
             yield from json.load(fh)
 
 
-def get_messages(base_url, duration):
+def update_cache(base_url, duration, workers=WORKERS, names=None, stats=None, cache=None):
+    """
+    Fetch messages missing in cache for the last `duration` days.
+    """
+    since = time.time() - 86400 * duration
+    newest = cache.newest
+    covered_since = cache.covered_since
+    if newest is not None and covered_since is not None and covered_since <= since:
+        # Cache already has the whole window, only ask for newer messages
+        cache.add(get_messages_from_datagrepper(
+            base_url, duration, workers=workers, names=names, stats=stats, start=newest
+        ))
+    else:
+        cache.add(get_messages_from_datagrepper(
+            base_url, duration, workers=workers, names=names, stats=stats
+        ))
+        if newest is not None and covered_since is not None and since <= newest:
+            cache.covered_since = min(covered_since, since)
+        else:
+            cache.covered_since = since
+
+
+def get_messages(base_url, duration, workers=WORKERS, names=None, stats=None, cache=None, offline=False):
     # yield from get_messages_from_file(base_url, duration)
-    yield from get_messages_from_datagrepper(base_url, duration)
+    if cache is None:
+        yield from get_messages_from_datagrepper(base_url, duration, workers=workers, names=names, stats=stats)
+        return
 
+    since = time.time() - 86400 * duration
+    if offline:
+        # Only what the consumer or previous runs stored
+        covered_since = cache.covered_since
+        if covered_since is None or covered_since > since:
+            click.echo(
+                "Cache doesn't cover the whole period, run the report without --offline "
+                "or start the consumer with --consume",
+                err=True,
+            )
+    else:
+        update_cache(base_url, duration, workers=workers, names=names, stats=stats, cache=cache)
+    yield from cache.get(since)
 
-def get_updates(base_url, duration):
-    apps_by_name = {a.name: a for a in APPS}
-    for message in get_messages(base_url, duration):
-        name = message["body"]["project"]["name"]
-        try:
-            app = apps_by_name[name]
-        except KeyError:
+
+def get_updates(base_url, duration, workers=WORKERS, server_filter=True, stats=None, cache_file=None, registry=None,
+                offline=False):
+    registry = registry or REGISTRY
+    names = registry.names if server_filter else None
+    stats = stats or FetchStats()
+    if offline and not cache_file:
+        raise click.UsageError("Offline report needs the message cache")
+    cache = MessageCache(cache_file, base_url, names) if cache_file else None
+    try:
+        yield from _get_updates(base_url, duration, workers, names, stats, cache, registry, offline)
+    finally:
+        if cache:
+            cache.evict(CACHE_MAX_AGE)
+            cache.close()
+
+
+def _get_updates(base_url, duration, workers, names, stats, cache, registry, offline=False):
+    batch = []
+    for message in get_messages(
+        base_url, duration, workers=workers, names=names, stats=stats, cache=cache, offline=offline
+    ):
+        if offline:
+            stats.messages += 1
+        app = registry.match(message["body"]["project"])
+        if app is None:
             continue
-        try:
-            old_version = message["body"]["message"]["old_version"]
-        except KeyError:
-            try:
-                old_version = message["body"]["project"]["versions"][1]
-            except IndexError:
-                print(name)
-                print(message["body"]["project"])
-                raise
+        stats.kept += 1
+        batch.append((app, *message_versions(message)))
+        if len(batch) >= CLASSIFY_BATCH:
+            yield from _classify(batch)
+            batch = []
+    yield from _classify(batch)
+
+
+def _classify(batch):
+    update_types = classify_batch((old_version, version) for _, _, version, old_version in batch)
+    for (app, updated_on, version, old_version), update_type in zip(batch, update_types):
         yield Update(
             app=app,
-            datetime=datetime.fromtimestamp(message["body"]["project"]["updated_on"]),
-            version=message["body"]["project"]["version"],
+            datetime=updated_on,
+            version=version,
             old_version=old_version,
+            update_type=update_type,
+        )
+
+
+class UpdateConsumer:
+    """
+    fedora-messaging consumer storing messages about our apps to the cache
+    as they arrive.
+
+    Messages are stored under the same key as the ones fetched from
+    datagrepper, so the report reads both. fedora-messaging calls the
+    consumer from its own thread, every thread opens its own cache.
+
+    `backfill` is called with the cache before the first message is stored.
+    The queue is bound by then, so messages published before it are fetched
+    and the ones published since are consumed, messages fetched and consumed
+    both are stored once.
+    """
+
+    def __init__(self, base_url, cache_file, registry=None, server_filter=True, backfill=None):
+        self.base_url = base_url
+        self.cache_file = cache_file
+        self.registry = registry or REGISTRY
+        self.names = self.registry.names if server_filter else None
+        self._local = threading.local()
+        self._backfill = backfill
+        self._backfill_lock = threading.Lock()
+
+    @property
+    def cache(self):
+        if not hasattr(self._local, "cache"):
+            self._local.cache = MessageCache(self.cache_file, self.base_url, self.names)
+        return self._local.cache
+
+    def __call__(self, message):
+        # Same shape as raw messages of datagrepper
+        return self.handle({
+            "id": message.id,
+            "topic": message.topic,
+            "headers": dict(getattr(message, "_headers", None) or {}),
+            "body": message.body,
+        })
+
+    def handle(self, message):
+        """
+        Store the message and report update of our app in it.
+
+        Params:
+            message (dict): Message as returned by datagrepper
+
+        Returns:
+            (`Update`): Update of our app, None for other projects
+        """
+        with self._backfill_lock:
+            if self._backfill is not None:
+                # Must run before the message is stored, it fetches
+                # messages newer than the newest stored one
+                self._backfill(self.cache)
+                self._backfill = None
+        project = message["body"]["project"]
+        if self.names is not None and project["name"] not in self.names:
+            return None
+        self.cache.add([message])
+        app = self.registry.match(project)
+        if app is None:
+            return None
+        update = Update(app, *message_versions(message))
+        click.echo(
+            f"{update.update_type.title()} update of {update.app.title} from "
+            f"{update.old_version or '?'} to {update.version}",
+            err=True,
         )
+        return update
+
+
+def consume(base_url, duration, cache_file, registry=None, server_filter=True, workers=WORKERS, queue=QUEUE):
+    """
+    Fetch messages missing in cache and store new ones as they are published.
+    Runs until interrupted.
+
+    Messages published between the first fetch and binding of the queue are
+    fetched again once the queue is bound, when the first message arrives.
+    """
+    if fedora_messaging is None:
+        raise click.UsageError("Consuming messages needs fedora-messaging")
+
+    def backfill(cache):
+        update_cache(base_url, duration, workers=workers, names=consumer.names, cache=cache)
+
+    consumer = UpdateConsumer(base_url, cache_file, registry, server_filter, backfill=backfill)
+    # Cache is complete right away, not only after the first message
+    backfill(consumer.cache)
+    durable = queue is not None
+    queue = queue or f"anitya-scripts-{uuid.uuid4()}"
+    fedora_messaging.consume(
+        consumer,
+        bindings=[{"exchange": "amq.topic", "queue": queue, "routing_keys": [TOPIC]}],
+        queues={
+            queue: {
+                "durable": durable,
+                "auto_delete": not durable,
+                "exclusive": False,
+                "arguments": {},
+            },
+        },
+    )
+
+
+def replay_messages(base_url, paths, cache_file, registry=None, server_filter=True):
+    """
+    Pass messages dumped from datagrepper to the consumer, as if they were
+    published.
+
+    Returns:
+        (:obj:`list` of `Update`): Updates of our apps
+    """
+    consumer = UpdateConsumer(base_url, cache_file, registry, server_filter)
+    updates = []
+    for path in paths:
+        with open(path) as fh:
+            messages = json.load(fh)
+        if isinstance(messages, dict):
+            # Whole datagrepper page
+            messages = messages["raw_messages"]
+        for message in messages:
+            update = consumer.handle(message)
+            if update is not None:
+                updates.append(update)
+    consumer.cache.close()
+    return updates
 
 
 @click.command()
 @click.option("-d", "--duration", type=int, default=7)
 @click.option("--staging", is_flag=True)
-def main(duration, staging):
+@click.option("-w", "--workers", type=int, default=WORKERS, help="Pages requested concurrently")
+@click.option(
+    "--server-filter/--no-server-filter", default=True,
+    help="Ask datagrepper only for messages mentioning our apps",
+)
+@click.option("--cache-file", default=CACHE_FILE, show_default=True, help="Local message cache")
+@click.option("--no-cache", is_flag=True, help="Always fetch all the messages from datagrepper")
+@click.option("--stream-json", is_flag=True, help="Parse datagrepper pages incrementally (needs ijson)")
+@click.option("--registry", "registry_file", type=click.Path(exists=True), help="TOML file with apps to report")
+@click.option(
+    "--anitya-ecosystem", multiple=True, help="Report also all Anitya projects in the ecosystem",
+)
+@click.option("--team", multiple=True, help="Report only apps of the team")
+@click.option("--offline", is_flag=True, help="Report only messages already in cache")
+@click.option("--consume", "consume_messages", is_flag=True, help="Store new messages to cache as they are published")
+@click.option("--replay", multiple=True, type=click.Path(exists=True), help="Store messages dumped from datagrepper")
+@click.option("--queue", default=QUEUE, help="Durable queue of the consumer, temporary one by default")
+def main(duration, staging, workers, server_filter, cache_file, no_cache, stream_json, registry_file,
+         anitya_ecosystem, team, offline, consume_messages, replay, queue):
+    decode.STREAM = stream_json
     base_url = DATAGREPPER_STG if staging else DATAGREPPER
+    registry = load_registry(registry_file, anitya_ecosystem, team)
+    if no_cache and (offline or consume_messages or replay):
+        raise click.UsageError("--offline, --consume and --replay need the message cache")
+    if consume_messages:
+        consume(
+            base_url, duration, cache_file, registry=registry, server_filter=server_filter,
+            workers=workers, queue=queue,
+        )
+        return
+    if replay:
+        replay_messages(base_url, replay, cache_file, registry=registry, server_filter=server_filter)
+        return
+    report(
+        base_url, duration, workers=workers,
+        server_filter=server_filter, cache_file=None if no_cache else cache_file,
+        registry=registry, offline=offline,
+    )
+
+
+def report(base_url, duration, workers=WORKERS, server_filter=True, cache_file=CACHE_FILE, output_format="text",
+           registry=None, offline=False):
     updates = []
-    for update in get_updates(base_url, duration):
+    updates_by_team = {}
+    stats = FetchStats()
+    for update in get_updates(
+        base_url, duration, workers=workers, server_filter=server_filter, stats=stats,
+        cache_file=cache_file, registry=registry, offline=offline,
+    ):
         updates.append(update)
+        updates_by_team.setdefault(update.app.team, []).append(update)
+    if offline:
+        click.echo(f"Read {stats.messages} messages from cache, kept {stats.kept}", err=True)
+    else:
+        click.echo(
+            f"Fetched {stats.messages} messages ({stats.bytes / 1024:.1f} kB), kept {stats.kept}",
+            err=True,
+        )
+    if output_format != "text":
+        return updates
     if not updates:
         print(f"None of our apps were released in the last {duration} days.")
-    for update in updates:
-        print(
-            f"{update.update_type.title()} update of {update.app.title} from "
-            f"{update.old_version or '?'} to {update.version} on "
-            f"{update.datetime.strftime('%Y-%m-%d')}: {update.release_notes}"
-        )
+    for index, (team, team_updates) in enumerate(sorted(updates_by_team.items())):
+        if len(updates_by_team) > 1:
+            if index:
+                print()
+            print(f"{team}:")
+        for update in team_updates:
+            print(
+                f"{update.update_type.title()} update of {update.app.title} from "
+                f"{update.old_version or '?'} to {update.version} on "
+                f"{update.datetime.strftime('%Y-%m-%d')}: {update.release_notes}"
+            )
+    return updates
 
 
 if __name__ == "__main__":
@@ -2,22 +2,85 @@
 """
 This script will retrieve packages names for partial names defined in PARTIAL_NAMES constant.
 It will actually retrieves all the packages from Anitya and then tries to match the partial name.
+
+How the partial names are matched is decided by MATCH_MODE:
+    substring - partial name is anywhere in the package name
+    prefix - package name starts with partial name
+    suffix - package name ends with partial name
+    glob - partial name is a shell-style pattern, e.g. "python-*-delete"
+    regex - partial name is a regular expression
+Matching is case insensitive in every mode.
+
+Project ids of the matching packages are resolved once for every project,
+concurrently, and kept in cache of anitya_common/project_ids.py across runs.
+Packages which already carry their project id from Anitya aren't resolved.
+
+With OUTPUT_FORMAT other than "text" the packages are written to OUTPUT_FILE
+(stdout if not set) in one of the formats of anitya_common/output.py instead
+of printing them.
 """
-import time
+import fnmatch
+import math
+import os
+import re
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
 
-import requests
+from anitya_common import decode, output  # noqa: E402
+from anitya_common.client import Client  # noqa: E402
+from anitya_common.metrics import METRICS  # noqa: E402
+from anitya_common.project_ids import ProjectIdCache  # noqa: E402
+from anitya_common.snapshot import Snapshot  # noqa: E402
 
 # Generate delete url for Anitya to delete the package
 GENERATE_DELTE_URL = True
 # List of partial names to look for
 PARTIAL_NAMES = ["-delete"]
+# How to match PARTIAL_NAMES, one of MATCH_MODES
+MATCH_MODE = "substring"
+MATCH_MODES = ("substring", "prefix", "suffix", "glob", "regex")
 # Anitya URL to use
 SERVER_URL = "https://release-monitoring.org/"
 # Number of items to request per page
 # Let's use maximum page size, so we don't do too much requests
 ITEMS_PER_PAGE = 250
-# Wait time before retry of the request
-WAIT_TIME = 0.5
+# Fetch the pages concurrently once the total amount of packages is known
+CONCURRENT_FETCH = True
+# Maximum number of page requests in flight when CONCURRENT_FETCH is enabled
+MAX_WORKERS = 8
+# Filter, resolve and print the packages page by page instead of
+# downloading the whole catalogue first
+STREAMING = True
+# Query local snapshot of Anitya catalogue instead of paging through the API,
+# see anitya_common/snapshot.py
+USE_SNAPSHOT = False
+# Fields of packages read from the API, the rest is dropped while decoding,
+# project_id is used when Anitya provides it
+PACKAGE_FIELDS = ("name", "distribution", "project", "ecosystem", "project_id")
+# Keep resolved project ids across runs, see anitya_common/project_ids.py,
+# otherwise they are kept only for this run
+PROJECT_ID_CACHE = True
+# Print every resolved project id, slow with many matching packages
+VERBOSE = True
+# "text" to print the packages, otherwise one of anitya_common.output.FORMATS
+OUTPUT_FORMAT = "text"
+# File to write the packages to with other OUTPUT_FORMAT than "text",
+# None for stdout
+OUTPUT_FILE = None
+# Fields of the written rows and their types
+OUTPUT_FIELDS = (
+    ("project_id", int),
+    ("distribution", str),
+    ("name", str),
+    ("project", str),
+    ("ecosystem", str),
+)
+
+# HTTP client shared by all requests, see anitya_common/client.py
+CLIENT = Client(pool_size=MAX_WORKERS)
 
 
 def get_all_packages():
@@ -29,85 +92,264 @@ def get_all_packages():
               distribution, project, ecosystem.
     """
     packages_list = []
+    for packages_list_page in iter_packages_pages():
+        packages_list.extend(packages_list_page)
+
+    return packages_list
+
+
+def iter_packages():
+    """
+    Iterate over all packages in Anitya without keeping them in memory.
+
+    Only the pages currently being fetched are held at once, so the packages
+    can be filtered and printed while the paging is still running.
+
+    Yields:
+      (dict): Package in Anitya represented as dict containing name,
+              distribution, project, ecosystem.
+    """
+    for packages_list_page in iter_packages_pages():
+        yield from packages_list_page
+
+
+def iter_packages_pages():
+    """
+    Iterate over pages of packages in Anitya.
+
+    Uses concurrent fetch when CONCURRENT_FETCH is enabled.
+
+    Yields:
+      (list): List of packages for each page, in page order.
+    """
+    if CONCURRENT_FETCH:
+        yield from _iter_packages_pages_concurrent()
+        return
+
     run = True
     page = 0
     while(run):
         page = page + 1
-        request_failure = True
-        while(request_failure):
-            try:
-                packages_list_page = _request_anitya_packages_page(page)
-            except requests.ConnectionError:
-                print("Connection error occurred, waiting for '{}' second before retry".format(
-                    WAIT_TIME
-                ))
-                time.sleep(WAIT_TIME)
-            else:
-                request_failure = False
+        packages_list_page = _request_anitya_packages_page(page)
         if len(packages_list_page) < ITEMS_PER_PAGE:
             run = False
-        packages_list = packages_list + packages_list_page
+        yield packages_list_page
+
+
+def get_all_packages_concurrent(max_workers=None):
+    """
+    Get all packages in Anitya, fetching the pages concurrently.
+
+    Params:
+      max_workers (int): Maximum number of requests in flight,
+                         defaults to MAX_WORKERS
+
+    Returns:
+      (list): List of packages in Anitya represented as dict containing name,
+              distribution, project, ecosystem. Packages are in page order.
+    """
+    packages_list = []
+    for packages_list_page in _iter_packages_pages_concurrent(max_workers):
+        packages_list.extend(packages_list_page)
 
     return packages_list
 
 
-def _request_anitya_packages_page(page):
+def _iter_packages_pages_concurrent(max_workers=None):
+    """
+    Iterate over pages of packages in Anitya, fetching the pages concurrently.
+
+    The first page is used as a probe to read the total amount of packages,
+    the remaining pages are then requested through a thread pool sharing
+    connection pool of CLIENT. At most `max_workers` pages are requested ahead
+    of the consumer.
+
+    Params:
+      max_workers (int): Maximum number of requests in flight,
+                         defaults to MAX_WORKERS
+
+    Yields:
+      (list): List of packages for each page, in page order.
+    """
+    max_workers = max_workers or MAX_WORKERS
+    first_page, total_items = _request_anitya_packages_page(1, with_total=True)
+    pages = math.ceil(total_items / ITEMS_PER_PAGE)
+    print("Number of pages '{}' = '{}'/'{}'".format(pages, total_items, ITEMS_PER_PAGE))
+    yield first_page
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = deque()
+        for page in range(2, pages + 1):
+            in_flight.append(executor.submit(_request_anitya_packages_page, page))
+            if len(in_flight) >= max_workers:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def _request_anitya_packages_page(page, with_total=False):
     """
     Sent paged request to Anitya.
 
+    Params:
+      page (int): Page index starting from 1
+      with_total (bool): Return also total amount of packages
+
     Returns:
       (list): List of packages in Anitya represented as dict containing name,
-              distribution, project, ecosystem for the provided page.
+              distribution, project, ecosystem for the provided page. When
+              `with_total` is set tuple of this list and total amount
+              of packages is returned.
     """
     packages_list = []
+    total_items = 0
     params = {
         "items_per_page": ITEMS_PER_PAGE,
         "page": page
     }
-    resp = requests.get(SERVER_URL + "api/v2/packages", params=params)
+    resp = CLIENT.get(SERVER_URL + "api/v2/packages", params=params, stream=decode.STREAM)
     #print(resp.url)
     if resp.status_code == 200:
-        response_dict = resp.json()
-        for item in response_dict["items"]:
-            packages_list.append(item)
+        response_page = decode.decode_page(resp, "items", PACKAGE_FIELDS)
+        total_items = response_page.meta.get("total_items", 0)
+        packages_list = response_page.items
     else:
         print("ERROR: Wrong arguments for request '{}'".format(resp.url))
 
+    if with_total:
+        return packages_list, total_items
     return packages_list
 
 
-def filter_packages(packages):
+def filter_packages(packages, matcher=None):
     """
     Filter list of packages dict by the PARTIAL_NAMES list.
 
     Params:
       (list): List of packages represented as dict containing name,
               distribution, project, ecosystem.
+      matcher (`re.Pattern`): Matcher from compile_matcher, pass it when
+                              filtering many pages so it's compiled once
 
     Returns:
       (list): List of packages represented as dict containing name,
               distribution, project, ecosystem for the provided page
               filtered by PARTIAL_NAMES list.
     """
-    filtered_list = []
+    return list(iter_filter_packages(packages, matcher))
+
+
+def iter_filter_packages(packages, matcher=None):
+    """
+    Lazily filter packages dict by the PARTIAL_NAMES list.
+
+    Every package is yielded at most once, even if it matches
+    more partial names.
+
+    Params:
+      (iterable): Packages represented as dict containing name,
+                  distribution, project, ecosystem.
+      matcher (`re.Pattern`): Matcher from compile_matcher, compiled
+                              from PARTIAL_NAMES and MATCH_MODE if not set
+
+    Yields:
+      (dict): Packages matching any of the PARTIAL_NAMES.
+    """
+    if matcher is None:
+        matcher = compile_matcher(PARTIAL_NAMES, MATCH_MODE)
     for package in packages:
-        for partial_name in PARTIAL_NAMES:
-            if partial_name.lower() in package["name"].lower():
-                filtered_list.append(package)
+        if matcher.search(package["name"]):
+            yield package
+
 
+def compile_matcher(patterns, mode="substring"):
+    """
+    Compile all the patterns into one case insensitive regular expression.
+
+    Plain strings (substring, prefix and suffix modes) are merged into a trie
+    first, so the regular expression engine only follows the branch matching
+    the current character instead of trying every pattern one by one.
+
+    Params:
+        patterns (:obj:`list` of :obj:`str`): Patterns to match
+        mode (str): One of MATCH_MODES
+
+    Returns:
+        (`re.Pattern`): Compiled pattern, use its `search` method for matching
+
+    Raises:
+        ValueError: When mode is not one of MATCH_MODES
+    """
+    if mode not in MATCH_MODES:
+        raise ValueError("Unknown match mode '{}', expected one of {}".format(mode, MATCH_MODES))
+    if not patterns:
+        # Nothing to look for, this will never match
+        return re.compile(r"(?!)")
+
+    if mode == "glob":
+        pattern = "|".join(r"\A" + fnmatch.translate(glob) for glob in patterns)
+    elif mode == "regex":
+        pattern = "|".join("(?:{})".format(regex) for regex in patterns)
+    else:
+        trie = {}
+        for word in patterns:
+            node = trie
+            for char in word.lower():
+                node = node.setdefault(char, {})
+            node[""] = True
+        # Without the end anchor the shortest word matched is enough,
+        # longer words sharing its prefix can't change the result
+        pattern = "(?:{})".format(_trie_to_pattern(trie, prune=mode != "suffix"))
+        if mode == "prefix":
+            pattern = r"\A" + pattern
+        elif mode == "suffix":
+            pattern = pattern + r"\Z"
+
+    return re.compile(pattern, re.IGNORECASE)
+
+
+def _trie_to_pattern(node, prune):
+    """
+    Convert trie of characters to regular expression.
 
-    return filtered_list
+    Params:
+        node (dict): Trie node, key "" marks the end of a word
+        prune (bool): Drop longer words sharing the prefix of ended word
 
+    Returns:
+        (str): Regular expression matching the words in trie
+    """
+    ends_here = "" in node
+    if ends_here and prune:
+        return ""
+    alternatives = [
+        re.escape(char) + _trie_to_pattern(child, prune)
+        for char, child in sorted(node.items()) if char
+    ]
+    if not alternatives:
+        return ""
+    if len(alternatives) == 1 and not ends_here:
+        return alternatives[0]
+    pattern = "(?:{})".format("|".join(alternatives))
+    if ends_here:
+        pattern += "?"
+    return pattern
 
-def get_project_id(project):
+
+def get_project_id(project, ecosystem=None):
     """
     Get project id from name.
 
     Params:
         project (str): Project name
+        ecosystem (str): Ecosystem of the project, project names
+                         are only unique inside ecosystem
 
     Returns:
         (str): Project id
+
+    Raises:
+        requests.HTTPError: When Anitya responds with error
     """
     result = None
     if not project:
@@ -116,44 +358,139 @@ def get_project_id(project):
     params = {
         "name": project
     }
-    resp = requests.get(SERVER_URL + "api/v2/projects", params=params)
+    if ecosystem:
+        params["ecosystem"] = ecosystem
+    resp = CLIENT.get(SERVER_URL + "api/v2/projects", params=params)
     #print(resp.url)
     if resp.status_code == 200:
-        response_dict = resp.json()
+        with METRICS.timed("json"):
+            response_dict = resp.json()
         if response_dict["items"]:
             result = response_dict["items"][0]["id"]
-            print("Project '{}' has id '{}'".format(project, result))
-        else:
+            if VERBOSE:
+                print("Project '{}' has id '{}'".format(project, result))
+        elif VERBOSE:
             print("Package '{}' not found".format(project))
     else:
         print("ERROR: Wrong arguments for request '{}'".format(resp.url))
+        resp.raise_for_status()
 
     return result
 
 
-if __name__ ==  "__main__":
-    packages = get_all_packages()
-    filtered_packages = filter_packages(packages)
-    for package in filtered_packages:
-        checked = False
-        while not checked:
-            try:
-                project_id = get_project_id(package["project"])
-            except requests.ConnectionError:
-                print("Connection error occurred, waiting for '{}' second before retry".format(
-                    WAIT_TIME
-                ))
-                time.sleep(WAIT_TIME)
-            else:
-                checked = True
+def resolve_project_ids(packages, cache):
+    """
+    Add project ids to package dicts.
+
+    Packages with project id provided by Anitya are left as they are. Every
+    other project is resolved only once, even when it has packages in more
+    distributions, projects not in cache are requested concurrently.
+
+    Params:
+        packages (:obj:`list` of :obj:`dict`): Packages represented as dict
+                                               containing name, distribution,
+                                               project, ecosystem
+        cache (`anitya_common.project_ids.ProjectIdCache`): Cache of project ids
+    """
+    pending = [package for package in packages if not package.get("project_id") and package.get("project")]
+    project_ids = cache.resolve(
+        ((package["project"], package.get("ecosystem")) for package in pending),
+        get_project_id,
+        max_workers=MAX_WORKERS,
+    )
+    for package in pending:
+        project_id = project_ids[(package["project"], package.get("ecosystem"))]
         if project_id:
             package["project_id"] = project_id
 
-    for package in filtered_packages:
-        if GENERATE_DELTE_URL:
-            print(
-                "{}project/{}/delete/{}/{}".format(
-                    SERVER_URL, package["project_id"], package["distribution"].replace(" ", "%20"), package["name"])
-            )
+
+def print_package(package):
+    """
+    Print the package either as delete URL or as `project_id;distribution;name`.
+
+    Params:
+        package (dict): Package with project id resolved
+    """
+    if GENERATE_DELTE_URL:
+        print(
+            "{}project/{}/delete/{}/{}".format(
+                SERVER_URL, package.get("project_id"), package["distribution"].replace(" ", "%20"), package["name"])
+        )
+    else:
+        print("{};{};{}".format(package.get("project_id"), package["distribution"], package["name"]))
+
+
+def output_package(package, output_format, writer=None):
+    """
+    Print the package or write it by the writer.
+
+    Params:
+        package (dict): Package with project id resolved
+        output_format (str): With "text" the package is printed by print_package
+        writer (`anitya_common.output.Writer`): Writer of other output formats
+    """
+    if output_format == "text":
+        print_package(package)
+    elif writer is not None:
+        writer.write(package)
+
+
+def main(output_format="text", output_file=None):
+    """
+    Find packages matching PARTIAL_NAMES and resolve their project ids.
+
+    Params:
+        output_format (str): With "text" every package is printed by
+                             print_package, with one of output.FORMATS they
+                             are written to output_file, otherwise they are
+                             only returned
+        output_file: Path or file object to write the packages to,
+                     defaults to stdout
+
+    Returns:
+        (list): Matching packages represented as dict containing name,
+                distribution, project, ecosystem and project_id when found
+    """
+    filtered_packages = []
+    writer = None
+    if output_format in output.FORMATS:
+        writer = output.open_writer(output_format, output_file, OUTPUT_FIELDS)
+    try:
+        if USE_SNAPSHOT:
+            with Snapshot(SERVER_URL, client=CLIENT) as snapshot:
+                snapshot.refresh("packages")
+                snapshot.refresh("projects")
+                for package in iter_filter_packages(snapshot.packages()):
+                    project_id = snapshot.project_id(package["project"], package["ecosystem"])
+                    if project_id:
+                        package["project_id"] = project_id
+                    filtered_packages.append(package)
+                    output_package(package, output_format, writer)
+        elif STREAMING:
+            with ProjectIdCache(SERVER_URL, path=None if PROJECT_ID_CACHE else ":memory:") as cache:
+                matcher = compile_matcher(PARTIAL_NAMES, MATCH_MODE)
+                # Projects of every page are resolved together
+                for packages_list_page in iter_packages_pages():
+                    page_packages = filter_packages(packages_list_page, matcher)
+                    resolve_project_ids(page_packages, cache)
+                    for package in page_packages:
+                        filtered_packages.append(package)
+                        output_package(package, output_format, writer)
         else:
-            print("{};{};{}".format(package["project_id"], package["distribution"], package["name"]))
+            packages = get_all_packages()
+            filtered_packages = filter_packages(packages)
+            with ProjectIdCache(SERVER_URL, path=None if PROJECT_ID_CACHE else ":memory:") as cache:
+                resolve_project_ids(filtered_packages, cache)
+
+            for package in filtered_packages:
+                output_package(package, output_format, writer)
+    finally:
+        if writer is not None:
+            writer.close()
+            print("Wrote {} packages".format(writer.rows), file=sys.stderr)
+
+    return filtered_packages
+
+
+if __name__ ==  "__main__":
+    main(OUTPUT_FORMAT, OUTPUT_FILE)
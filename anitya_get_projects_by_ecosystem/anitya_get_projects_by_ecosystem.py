@@ -1,37 +1,70 @@
 #!/usr/bin/env python3
 """
-This script will retrieve every project id for ecosystem in ECOSYSTEM constant.
+This script will retrieve every project id for ecosystems in ECOSYSTEMS constant.
+
+The amount of pages is known from the first request, so all the pages
+of all the ecosystems are then requested concurrently.
+
+With OUTPUT_FORMAT other than "text" the project ids are written to
+OUTPUT_FILE (stdout if not set) in one of the formats of anitya_common/output.py.
 """
 import math
-import time
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
 
-import requests
+from anitya_common import decode, output  # noqa: E402
+from anitya_common.client import Client  # noqa: E402
+from anitya_common.metrics import METRICS  # noqa: E402
+from anitya_common.snapshot import Snapshot  # noqa: E402
 
 
-ECOSYSTEM = "crates.io"
+ECOSYSTEMS = ["crates.io"]
 SERVER_URL = "https://stg.release-monitoring.org/"
 ITEMS_PER_PAGE = 250
-WAIT_TIME = 0.5
-
-
-def get_total_items():
+# Number of pages requested concurrently
+MAX_WORKERS = 8
+# Query local snapshot of Anitya catalogue instead of paging through the API,
+# see anitya_common/snapshot.py
+USE_SNAPSHOT = False
+# Print every project found, slow for large ecosystems
+VERBOSE = True
+# "text" to print the project ids, otherwise one of anitya_common.output.FORMATS
+OUTPUT_FORMAT = "text"
+# File to write the project ids to with other OUTPUT_FORMAT than "text",
+# None for stdout
+OUTPUT_FILE = None
+# Fields of the written rows and their types
+OUTPUT_FIELDS = (("project_id", int),)
+
+# HTTP client shared by all requests, see anitya_common/client.py
+CLIENT = Client(pool_size=MAX_WORKERS)
+
+
+def get_total_items(ecosystem):
     """
     Get total amount of projects in ecosystem.
 
+    Params:
+        ecosystem (str): Ecosystem name
+
     Returns:
         (int): Total amount of items
     """
     result = 0
     params = {
-        "ecosystem": ECOSYSTEM,
+        "ecosystem": ecosystem,
         "items_per_page": 1
     }
-    resp = requests.get(SERVER_URL + "api/v2/projects", params=params)
+    resp = CLIENT.get(SERVER_URL + "api/v2/projects", params=params)
     if resp.status_code == 200:
-        response_dict = resp.json()
+        with METRICS.timed("json"):
+            response_dict = resp.json()
         if response_dict["total_items"]:
             result = response_dict["total_items"]
-            print("Ecosystem '{}' contain '{}' projects".format(ECOSYSTEM, result))
+            print("Ecosystem '{}' contain '{}' projects".format(ecosystem, result))
         else:
             print("Didn't found expected key 'total_items' in json '{}':".format(response_dict))
     else:
@@ -40,13 +73,14 @@ def get_total_items():
     return result
 
 
-def get_project_ids(page, items_per_page):
+def get_project_ids(page, items_per_page, ecosystem):
     """
     Get project ids for ecosystem.
 
     Params:
         page (int): Page index
         items_per_page (int): Items per page
+        ecosystem (str): Ecosystem name
 
     Returns:
         (:obj:`list` of :obj:`str`): List of project ids
@@ -54,43 +88,107 @@ def get_project_ids(page, items_per_page):
     result = []
 
     params = {
-        "ecosystem": ECOSYSTEM,
+        "ecosystem": ecosystem,
         "page": page + 1,
         "items_per_page": items_per_page
     }
-    resp = requests.get(SERVER_URL + "api/v2/projects", params=params)
+    resp = CLIENT.get(SERVER_URL + "api/v2/projects", params=params, stream=decode.STREAM)
     if resp.status_code == 200:
-        response_dict = resp.json()
-        if response_dict["items"]:
-            for item in response_dict["items"]:
+        response_page = decode.decode_page(resp, "items", ("id", "name"))
+        if response_page.items:
+            for item in response_page.items:
                 result.append(item["id"])
-                print("Project '{}' has id '{}'".format(item["name"], item["id"]))
+                if VERBOSE:
+                    print("Project '{}' has id '{}'".format(item["name"], item["id"]))
         else:
-            print("Didn't found expected key 'items' in json '{}':".format(response_dict))
+            print("Didn't found expected key 'items' in json '{}':".format(response_page.meta))
     else:
         print("ERROR: Wrong arguments for request")
 
     return result
 
 
-if __name__ == "__main__":
+def get_all_project_ids(ecosystems, max_workers=None):
+    """
+    Get project ids for all ecosystems, fetching the pages concurrently.
+
+    Params:
+        ecosystems (:obj:`list` of :obj:`str`): Ecosystem names
+        max_workers (int): Maximum number of requests in flight,
+                           defaults to MAX_WORKERS
+
+    Returns:
+        (set): Set of project ids
+    """
+    max_workers = max_workers or MAX_WORKERS
     project_ids = set()
-    total_items = get_total_items()
-    pages = math.ceil(total_items/ITEMS_PER_PAGE)
-    print("Number of pages '{}' = '{}'/'{}'".format(pages, total_items, ITEMS_PER_PAGE))
-    for index in range(0, pages):
-        checked = False
-        while not checked:
-            try:
-                project_id_list = get_project_ids(index, ITEMS_PER_PAGE)
-                checked = True
-            except requests.ConnectionError:
-                print("Connection error occurred, waiting for '{}' second before retry".format(
-                    WAIT_TIME
-                ))
-                time.sleep(WAIT_TIME)
-        if project_id_list:
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        totals = executor.map(get_total_items, ecosystems)
+        page_plan = []
+        for ecosystem, total_items in zip(ecosystems, totals):
+            pages = math.ceil(total_items/ITEMS_PER_PAGE)
+            print("Number of pages for '{}' '{}' = '{}'/'{}'".format(
+                ecosystem, pages, total_items, ITEMS_PER_PAGE
+            ))
+            page_plan.extend((index, ecosystem) for index in range(0, pages))
+
+        for project_id_list in executor.map(
+            lambda plan: get_project_ids(plan[0], ITEMS_PER_PAGE, plan[1]), page_plan
+        ):
             project_ids.update(project_id_list)
 
-    for project_id in project_ids:
-        print(project_id)
+    return project_ids
+
+
+def get_project_ids_from_snapshot(ecosystems):
+    """
+    Get project ids for ecosystems from local snapshot of Anitya.
+
+    Params:
+        ecosystems (:obj:`list` of :obj:`str`): Ecosystem names
+
+    Returns:
+        (set): Set of project ids
+    """
+    project_ids = set()
+    with Snapshot(SERVER_URL, client=CLIENT) as snapshot:
+        snapshot.refresh("projects")
+        for ecosystem in ecosystems:
+            project_ids.update(project["id"] for project in snapshot.projects(ecosystem=ecosystem))
+
+    return project_ids
+
+
+def main(output_format="text", output_file=None):
+    """
+    Get project ids for ECOSYSTEMS.
+
+    Params:
+        output_format (str): With "text" every project id is printed, with
+                             one of output.FORMATS they are written to
+                             output_file, otherwise they are only returned
+        output_file: Path or file object to write the project ids to,
+                     defaults to stdout
+
+    Returns:
+        (list): Project ids
+    """
+    if USE_SNAPSHOT:
+        project_ids = get_project_ids_from_snapshot(ECOSYSTEMS)
+    else:
+        project_ids = get_all_project_ids(ECOSYSTEMS)
+
+    if output_format == "text":
+        for project_id in project_ids:
+            print(project_id)
+    elif output_format in output.FORMATS:
+        rows = output.write(
+            output_format, ({"project_id": project_id} for project_id in project_ids), output_file, OUTPUT_FIELDS
+        )
+        print("Wrote {} project ids".format(rows), file=sys.stderr)
+
+    return list(project_ids)
+
+
+if __name__ == "__main__":
+    main(OUTPUT_FORMAT, OUTPUT_FILE)
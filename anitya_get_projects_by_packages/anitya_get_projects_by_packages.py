@@ -7,15 +7,59 @@ package.
 **Example file**:
     0ad
     python-requests
+
+Mapping of every package to its project and project id is written
+to MAPPING_FILE as `package;project;project_id` lines.
+
+Resolved packages are recorded in JOURNAL_FILE together with their project
+and project id. When the script is started again, these are taken from
+the journal instead of Anitya, when the SERVER_URL and the packages are
+the same. Packages are recorded as soon as they are resolved, failed
+requests are not recorded and are retried by the next run. The journal is
+removed when all packages are resolved without failure.
+
+With OUTPUT_FORMAT other than "text" the mapping is written to OUTPUT_FILE
+(stdout if not set) in one of the formats of anitya_common/output.py instead
+of printing the project ids.
 """
-import time
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 import requests
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from anitya_common import output  # noqa: E402
+from anitya_common.client import Client  # noqa: E402
+from anitya_common.journal import Journal, input_digest  # noqa: E402
+from anitya_common.metrics import METRICS  # noqa: E402
+from anitya_common.snapshot import Snapshot  # noqa: E402
+
 
 PACKAGES_FILE = "packages"
 SERVER_URL = "https://stg.release-monitoring.org/"
-WAIT_TIME = 0.5
+# File to write package;project;project_id mapping to, None to skip it
+MAPPING_FILE = "packages_mapping"
+# File to record resolved packages to
+JOURNAL_FILE = PACKAGES_FILE + ".journal"
+# Number of packages resolved concurrently
+MAX_WORKERS = 8
+# Query local snapshot of Anitya catalogue instead of asking the API,
+# see anitya_common/snapshot.py
+USE_SNAPSHOT = False
+# Print every resolved package and project, slow for long PACKAGES_FILE
+VERBOSE = True
+# "text" to print the project ids, otherwise one of anitya_common.output.FORMATS
+OUTPUT_FORMAT = "text"
+# File to write the mapping to with other OUTPUT_FORMAT than "text",
+# None for stdout
+OUTPUT_FILE = None
+# Fields of the written rows and their types
+OUTPUT_FIELDS = (("package", str), ("project", str), ("project_id", int))
+
+# HTTP client shared by all requests, see anitya_common/client.py
+CLIENT = Client(pool_size=MAX_WORKERS)
 
 
 def get_project_name(package):
@@ -28,34 +72,63 @@ def get_project_name(package):
     Returns:
         (str): Name of the project
     """
+    result = get_package(package)
+    if result:
+        return result["project"]
+
+    return None
+
+
+def get_package(package):
+    """
+    Get Fedora package from Anitya.
+
+    Params:
+        package (str): Name of the package
+
+    Returns:
+        (dict): Package represented as dict containing name, distribution,
+                project, ecosystem. None if package isn't in Anitya.
+
+    Raises:
+        requests.HTTPError: When Anitya doesn't respond with the package list
+    """
     result = None
     params = {
         "name": package,
         "distribution": "Fedora"
     }
-    resp = requests.get(SERVER_URL + "api/v2/packages", params=params)
+    resp = CLIENT.get(SERVER_URL + "api/v2/packages", params=params)
     if resp.status_code == 200:
-        response_dict = resp.json()
+        with METRICS.timed("json"):
+            response_dict = resp.json()
         if response_dict["items"]:
-            result = response_dict["items"][0]["project"]
-            print("Package '{}' belongs to project '{}'".format(package, result))
+            result = response_dict["items"][0]
+            if VERBOSE:
+                print("Package '{}' belongs to project '{}'".format(package, result["project"]))
         else:
             print("Package '{}' doesn't belongs to any project".format(package))
     else:
         print("ERROR: Wrong arguments for request")
+        raise requests.HTTPError("Unexpected status {} of {}".format(resp.status_code, resp.url), response=resp)
 
     return result
 
 
-def get_project_id(project):
+def get_project_id(project, ecosystem=None):
     """
     Get project id from name.
 
     Params:
         project (str): Project name
+        ecosystem (str): Ecosystem of the project, project names
+                         are only unique inside ecosystem
 
     Returns:
         (str): Project id
+
+    Raises:
+        requests.HTTPError: When Anitya doesn't respond with the project list
     """
     result = None
     if not project:
@@ -64,40 +137,235 @@ def get_project_id(project):
     params = {
         "name": project
     }
-    resp = requests.get(SERVER_URL + "api/v2/projects", params=params)
+    if ecosystem:
+        params["ecosystem"] = ecosystem
+    resp = CLIENT.get(SERVER_URL + "api/v2/projects", params=params)
     if resp.status_code == 200:
-        response_dict = resp.json()
+        with METRICS.timed("json"):
+            response_dict = resp.json()
         if response_dict["items"]:
             result = response_dict["items"][0]["id"]
-            print("Project '{}' has id '{}'".format(project, result))
+            if VERBOSE:
+                print("Project '{}' has id '{}'".format(project, result))
         else:
             print("Package '{}' not found".format(project))
     else:
         print("ERROR: Wrong arguments for request")
+        raise requests.HTTPError("Unexpected status {} of {}".format(resp.status_code, resp.url), response=resp)
 
     return result
 
 
-if __name__ ==  "__main__":
+def resolve_packages(packages, max_workers=None, journal=None):
+    """
+    Resolve packages to projects and project ids in batch.
+
+    1) Deduplicate the packages
+    2) Concurrently get project name and ecosystem for every package
+    3) As soon as the project of a package is known, get its id, each
+       project is requested only once even if more packages belong to it
+
+    Every package is recorded in journal as soon as it's resolved. Packages
+    which failed are not recorded, they are returned as not found.
+
+    Params:
+        packages (:obj:`list` of :obj:`str`): Names of the Fedora packages
+        max_workers (int): Maximum number of requests in flight,
+                           defaults to MAX_WORKERS
+        journal (`anitya_common.journal.Journal`): Journal to record resolved
+                                                   packages to, packages found
+                                                   in it are not requested
+
+    Returns:
+        (:obj:`list` of :obj:`tuple`): List of (package, project, project_id)
+                                       tuples, project and project_id are None
+                                       if not found
+    """
+    max_workers = max_workers or MAX_WORKERS
+    packages = list(dict.fromkeys(package.strip() for package in packages if package.strip()))
+    resolved = {}
+    if journal:
+        resolved.update(
+            (package, tuple(journal.done[package])) for package in packages if package in journal
+        )
+    pending = [package for package in packages if package not in resolved]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        package_futures = {executor.submit(get_package, package): package for package in pending}
+        project_futures = {}
+        packages_by_project = {}
+        # Ids of finished projects and projects which failed
+        project_ids = {}
+        failed_projects = set()
+        running = set(package_futures)
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in package_futures:
+                    package = package_futures[future]
+                    try:
+                        package_dict = future.result()
+                    except requests.RequestException as exc:
+                        print("ERROR: Package '{}' failed with {}".format(package, exc))
+                        resolved[package] = (None, None)
+                        continue
+                    if not package_dict:
+                        _resolved(resolved, journal, package, None, None)
+                        continue
+                    project = (package_dict["project"], package_dict["ecosystem"])
+                    if project in project_ids or project in failed_projects:
+                        _project_resolved(
+                            resolved, journal, [package], project, project_ids.get(project),
+                            failed=project in failed_projects,
+                        )
+                        continue
+                    if project not in packages_by_project:
+                        packages_by_project[project] = []
+                        project_future = executor.submit(get_project_id, *project)
+                        project_futures[project_future] = project
+                        running.add(project_future)
+                    packages_by_project[project].append(package)
+                else:
+                    project = project_futures[future]
+                    try:
+                        project_ids[project] = future.result()
+                    except requests.RequestException as exc:
+                        print("ERROR: Project '{}' failed with {}".format(project[0], exc))
+                        failed_projects.add(project)
+                    _project_resolved(
+                        resolved, journal, packages_by_project.pop(project), project, project_ids.get(project),
+                        failed=project in failed_projects,
+                    )
+
+    return [(package,) + resolved[package] for package in packages]
+
+
+def _project_resolved(resolved, journal, packages, project, project_id, failed=False):
+    """
+    Store packages of resolved project, packages of failed project
+    are not recorded in journal.
+    """
+    for package in packages:
+        if failed:
+            resolved[package] = (project[0], None)
+        else:
+            _resolved(resolved, journal, package, project[0], project_id)
+
+
+def _resolved(resolved, journal, package, project, project_id):
+    """
+    Store resolved package and record it in journal.
+    """
+    resolved[package] = (project, project_id)
+    if journal:
+        journal.record(package, [project, project_id])
+
+
+def write_mapping(mapping, path):
+    """
+    Write package to project mapping to file.
+
+    Params:
+        mapping (:obj:`list` of :obj:`tuple`): List of (package, project, project_id)
+        path (str): Path to the file
+    """
+    with open(path, "w") as f:
+        for package, project, project_id in mapping:
+            f.write("{};{};{}\n".format(
+                package, project or "", project_id if project_id is not None else ""
+            ))
+
+
+def get_mapping_from_snapshot(packages):
+    """
+    Resolve packages to projects and project ids from local snapshot of Anitya.
+
+    Params:
+        packages (:obj:`list` of :obj:`str`): Names of the Fedora packages
+
+    Returns:
+        (:obj:`list` of :obj:`tuple`): List of (package, project, project_id)
+                                       tuples, project and project_id are None
+                                       if not found
+    """
+    mapping = []
+    with Snapshot(SERVER_URL, client=CLIENT) as snapshot:
+        snapshot.refresh("packages")
+        snapshot.refresh("projects")
+        for package in dict.fromkeys(package.strip() for package in packages if package.strip()):
+            package_dict = snapshot.package(package, "Fedora")
+            if not package_dict:
+                print("Package '{}' doesn't belongs to any project".format(package))
+                mapping.append((package, None, None))
+                continue
+            project_id = snapshot.project_id(package_dict["project"], package_dict["ecosystem"])
+            mapping.append((package, package_dict["project"], project_id))
+
+    return mapping
+
+
+def get_project_ids_from_snapshot(packages):
+    """
+    Get project ids for packages from local snapshot of Anitya.
+
+    Params:
+        packages (:obj:`list` of :obj:`str`): Names of the Fedora packages
+
+    Returns:
+        (set): Set of project ids
+    """
+    return {project_id for _, _, project_id in get_mapping_from_snapshot(packages) if project_id}
+
+
+def main(output_format="text", output_file=None):
+    """
+    Get project ids for packages in PACKAGES_FILE.
+
+    Params:
+        output_format (str): With "text" every project id is printed, with
+                             one of output.FORMATS the mapping is written
+                             to output_file, otherwise they are only returned
+        output_file: Path or file object to write the mapping to,
+                     defaults to stdout
+
+    Returns:
+        (list): Project ids
+    """
     packages = []
     with open(PACKAGES_FILE, "r") as f:
         packages = f.readlines()
 
-    project_ids = set()
-    for package in packages:
-        checked = False
-        while not checked:
-            try:
-                project_name = get_project_name(package.strip())
-                project_id = get_project_id(project_name)
-                checked = True
-            except requests.ConnectionError:
-                print("Connection error occurred, waiting for '{}' second before retry".format(
-                    WAIT_TIME
-                ))
-                time.sleep(WAIT_TIME)
-        if project_id:
-            project_ids.add(project_id)
-
-    for project_id in project_ids:
-        print(project_id)
+    if USE_SNAPSHOT:
+        mapping = get_mapping_from_snapshot(packages)
+    else:
+        params = {
+            "server": SERVER_URL,
+            "input": input_digest(package.strip() for package in packages if package.strip()),
+        }
+        with Journal(JOURNAL_FILE, params) as journal:
+            mapping = resolve_packages(packages, journal=journal)
+            # Packages which failed are the only ones not recorded
+            if all(package in journal for package, _, _ in mapping):
+                journal.complete()
+        if MAPPING_FILE:
+            write_mapping(mapping, MAPPING_FILE)
+    project_ids = {project_id for _, _, project_id in mapping if project_id}
+
+    if output_format == "text":
+        for project_id in project_ids:
+            print(project_id)
+    elif output_format in output.FORMATS:
+        rows = output.write(
+            output_format,
+            ({"package": package, "project": project, "project_id": project_id}
+             for package, project, project_id in mapping),
+            output_file,
+            OUTPUT_FIELDS,
+        )
+        print("Wrote {} packages".format(rows), file=sys.stderr)
+
+    return list(project_ids)
+
+
+if __name__ ==  "__main__":
+    main(OUTPUT_FORMAT, OUTPUT_FILE)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark of filtering datagrepper messages by app names on the server.
+
+Fetches messages of the last week from the fake datagrepper of
+`fake_server.FakeServer`, which matches "contains" against the whole
+message body like datagrepper does, and reports requests, messages and
+bytes moved by every way of asking for messages of the apps:
+
+    all          no filter, apps are matched locally
+    names        "contains" with plain app names
+    name fields  "contains" with project name fields of the apps
+    per app      one query per app with its project name field
+    chosen       what updated-versions.py chooses, including its probes
+
+**Example**:
+    ./bench_datagrepper_filter.py --items 10000 100000
+"""
+import argparse
+import contextlib
+import os
+import sys
+
+from fake_server import Catalogue, FakeServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from anitya_common import cli, metrics  # noqa: E402
+
+DAYS = 7
+
+
+def fetch(script, url, params):
+    """
+    Fetch all pages of the query.
+
+    Returns:
+        (list): Fetched messages
+    """
+    return [
+        message
+        for page in script.get_all_pages(url, dict(params), workers=script.WORKERS)
+        for message in page
+    ]
+
+
+def run(script, url, approach, names):
+    params = {"topic": script.TOPIC, "delta": 86400 * DAYS}
+    fields = [script.NAME_FIELD + name + '"' for name in sorted(names)]
+    if approach == "all":
+        return fetch(script, url, params)
+    if approach == "names":
+        return fetch(script, url, {**params, "contains": sorted(names)})
+    if approach == "name fields":
+        return fetch(script, url, {**params, "contains": fields})
+    if approach == "per app":
+        messages = {}
+        for field in fields:
+            for message in fetch(script, url, {**params, "contains": [field]}):
+                messages[message["msg_id"]] = message
+        return list(messages.values())
+    return list(script.get_messages_from_datagrepper(url.rsplit("v2/", 1)[0], DAYS, names=names))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, nargs="+", default=[10000])
+    args = parser.parse_args()
+    metrics.SUMMARY = False
+    script = cli.load_script("updated-versions")
+    names = script.REGISTRY.names
+
+    print("{:>8} {:>12} {:>9} {:>9} {:>6} {:>11}".format(
+        "items", "approach", "requests", "messages", "apps", "recv [kB]"
+    ))
+    for items in args.items:
+        with FakeServer(Catalogue(items, versions=10)) as server:
+            url = server.url + "datagrepper/v2/search"
+            for approach in ("all", "names", "name fields", "per app", "chosen"):
+                server.reset_stats()
+                # Progress bar and messages of the script would break the table
+                with open(os.devnull, "w") as devnull, \
+                        contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+                    messages = run(script, url, approach, names)
+                apps = sum(1 for message in messages if script.REGISTRY.match(message["body"]["project"]))
+                print("{:>8} {:>12} {:>9} {:>9} {:>6} {:>11.1f}".format(
+                    items, approach, server.stats["requests"], len(messages), apps,
+                    server.stats["bytes_out"] / 1024,
+                ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of filter_packages in anitya_get_packages_by_partial_name.
+
+Compares the compiled matcher with the original nested loop over
+packages x PARTIAL_NAMES on synthetic package dump. Package names are
+generated to look like real distribution package names.
+
+**Example**:
+    ./bench_filter_packages.py --packages 300000 --patterns 10 100 1000 5000
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "anitya_get_packages_by_partial_name")
+)
+
+import anitya_get_packages_by_partial_name as partial_name  # noqa: E402
+
+PREFIXES = ["python-", "python3-", "rust-", "golang-", "perl-", "nodejs-", "ghc-", "php-", "R-", ""]
+SUFFIXES = ["", "", "", "-devel", "-doc", "-libs", "-delete", "-common"]
+
+
+def generate_packages(count, seed=0):
+    """
+    Generate synthetic package dump.
+
+    Params:
+        count (int): Number of packages to generate
+        seed (int): Seed for random generator
+
+    Returns:
+        (list): List of packages represented as dict containing name,
+                distribution, project, ecosystem
+    """
+    rnd = random.Random(seed)
+    packages = []
+    for _ in range(count):
+        stem = "".join(rnd.choice(string.ascii_lowercase) for _ in range(rnd.randint(3, 12)))
+        packages.append({
+            "name": rnd.choice(PREFIXES) + stem + rnd.choice(SUFFIXES),
+            "distribution": rnd.choice(["Fedora", "Debian", "Ubuntu"]),
+            "project": stem,
+            "ecosystem": "https://" + stem + ".example.org",
+        })
+    return packages
+
+
+def generate_patterns(count, seed=1):
+    """
+    Generate partial names to look for.
+
+    Params:
+        count (int): Number of patterns to generate
+        seed (int): Seed for random generator
+
+    Returns:
+        (:obj:`list` of :obj:`str`): List of partial names
+    """
+    rnd = random.Random(seed)
+    return [
+        "".join(rnd.choice(string.ascii_lowercase) for _ in range(rnd.randint(4, 10)))
+        for _ in range(count)
+    ]
+
+
+def naive_filter(packages, patterns):
+    """
+    Original implementation of filter_packages.
+    """
+    filtered_list = []
+    for package in packages:
+        for partial_name in patterns:
+            if partial_name.lower() in package["name"].lower():
+                filtered_list.append(package)
+    return filtered_list
+
+
+def measure(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--packages", type=int, default=100000)
+    parser.add_argument("--patterns", type=int, nargs="+", default=[1, 10, 100, 1000, 5000])
+    parser.add_argument(
+        "--naive-limit", type=int, default=100,
+        help="Skip the nested loop above this number of patterns, it is too slow"
+    )
+    args = parser.parse_args()
+
+    packages = generate_packages(args.packages)
+    print("{:>9} {:>12} {:>12} {:>10} {:>9}".format("patterns", "compile [s]", "match [s]", "naive [s]", "matches"))
+    for pattern_count in args.patterns:
+        partial_name.PARTIAL_NAMES = generate_patterns(pattern_count)
+        compile_time, _ = measure(partial_name.compile_matcher, partial_name.PARTIAL_NAMES)
+        match_time, matched = measure(partial_name.filter_packages, packages)
+        if pattern_count <= args.naive_limit:
+            naive_time, naive_matched = measure(naive_filter, packages, partial_name.PARTIAL_NAMES)
+            # The nested loop appends package for every matching pattern
+            assert {id(p) for p in naive_matched} == {id(p) for p in matched}
+            naive_time = "{:.3f}".format(naive_time)
+        else:
+            naive_time = "-"
+        print("{:>9} {:>12.3f} {:>12.3f} {:>10} {:>9}".format(
+            pattern_count, compile_time, match_time, naive_time, len(matched)
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark of HTML extraction in anitya_del_last_version.
+
+Compares extract_latest_version and extract_csrf_token with parsing
+the whole page by BeautifulSoup. Saved project page could be provided,
+otherwise project page with VERSIONS rows is generated.
+
+**Example**:
+    curl -o project.html https://release-monitoring.org/project/5271
+    ./bench_html_extraction.py --page project.html
+    ./bench_html_extraction.py --versions 100 1000 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+from bs4 import BeautifulSoup as BS
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "anitya_del_last_version")
+)
+
+import anitya_del_last_version as del_last_version  # noqa: E402
+
+
+def generate_project_page(versions):
+    """
+    Generate page similar to Anitya project page.
+
+    Params:
+        versions (int): Number of rows in versions table
+
+    Returns:
+        (bytes): Content of the page
+    """
+    rows = "".join(
+        '<tr property="doap:release" typeof="doap:Version">'
+        '<td><span class="badge">stable</span></td>'
+        '<td property="dc:created">2023-01-{:02d}</td>'
+        '<td property="doap:revision">1.{}.0</td>'
+        '<td><a href="/project/1/delete/1.{}.0" class="btn btn-sm">Delete</a></td>'
+        '</tr>\n'.format(index % 28 + 1, versions - index, versions - index)
+        for index in range(versions)
+    )
+    page = (
+        "<!DOCTYPE html><html><head><title>project</title>"
+        + '<link rel="stylesheet" href="/static/css/style.css">' * 20
+        + "</head><body>"
+        + '<nav class="navbar"><ul>' + '<li><a href="/">item</a></li>' * 50 + "</ul></nav>"
+        + '<div class="card"><dl>' + "<dt>key</dt><dd>value</dd>" * 30 + "</dl></div>"
+        + '<form><input id="csrf_token" name="csrf_token" type="hidden" value="token"/>'
+        + '<input type="submit" value="Check"/></form>'
+        + '<table class="table">' + rows + "</table>"
+        + "</body></html>"
+    )
+    return page.encode("utf-8")
+
+
+def full_parse(content):
+    """
+    Extraction used before, parsing the whole page.
+    """
+    bs = BS(content, "html.parser")
+    version = bs.find_all("tr", property="doap:release")[0].find_all("td")[2].string
+    csrf_token = bs.find("input", id="csrf_token")["value"]
+    return version, csrf_token
+
+
+def targeted(content):
+    return (
+        del_last_version.extract_latest_version(content),
+        del_last_version.extract_csrf_token(content),
+    )
+
+
+def measure(func, content, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(content)
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--page", action="append", default=[], help="Saved project page")
+    parser.add_argument("--versions", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = []
+    for path in args.page:
+        with open(path, "rb") as f:
+            pages.append((os.path.basename(path), f.read()))
+    if not pages:
+        pages = [
+            ("{} versions".format(versions), generate_project_page(versions))
+            for versions in args.versions
+        ]
+
+    print("{:>16} {:>10} {:>18} {:>14} {:>8}".format(
+        "page", "size [kB]", "BeautifulSoup [ms]", "targeted [ms]", "speedup"
+    ))
+    for name, content in pages:
+        full_time, full_result = measure(full_parse, content, args.repeat)
+        targeted_time, targeted_result = measure(targeted, content, args.repeat)
+        assert full_result == targeted_result, (full_result, targeted_result)
+        print("{:>16} {:>10.1f} {:>18.2f} {:>14.2f} {:>7.0f}x".format(
+            name, len(content) / 1024, full_time * 1000, targeted_time * 1000, full_time / targeted_time
+        ))
+
+
+if __name__ == "__main__":
+    main()
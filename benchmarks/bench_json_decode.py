@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Benchmark of JSON page decoding in anitya_common.decode.
+
+Compares decoding of whole page by json and orjson with decoding projected
+to the fields used by the scripts and with incremental parsing by ijson.
+Messages are projected to the fields of updated-versions.py, projects to
+the fields of anitya_del_last_version.py.
+Measures time and peak memory allocated while decoding. Saved pages could
+be provided, otherwise datagrepper and Anitya pages are generated.
+
+**Example**:
+    curl -o messages.json "https://apps.fedoraproject.org/datagrepper/v2/search?topic=org.release-monitoring.prod.anitya.project.version.update.v2&rows_per_page=100"
+    ./bench_json_decode.py --page raw_messages:messages.json
+    ./bench_json_decode.py --items 100 1000 --versions 500
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from anitya_common import cli, decode, metrics  # noqa: E402
+
+
+def generate_messages_page(items, versions):
+    """
+    Generate page similar to datagrepper search results.
+
+    Params:
+        items (int): Number of messages on page
+        versions (int): Number of versions in every project
+
+    Returns:
+        (bytes): Content of the page
+    """
+    messages = []
+    for index in range(items):
+        version_list = ["1.{}.0".format(number) for number in range(versions)]
+        project = {
+            "id": index,
+            "name": "project-{}".format(index),
+            "ecosystem": "pypi",
+            "homepage": "https://example.com/project-{}".format(index),
+            "version": version_list[-1],
+            "versions": version_list,
+            "stable_versions": version_list,
+            "packages": [{"distro": "Fedora", "package_name": "python-project-{}".format(index)}],
+        }
+        messages.append({
+            "msg_id": "2023-{}".format(index),
+            "topic": "org.release-monitoring.prod.anitya.project.version.update.v2",
+            "headers": {"sent-at": "2023-01-01T00:00:00+00:00"},
+            "body": {
+                "project": project,
+                "message": {
+                    "project": project,
+                    "upstream_versions": version_list[-2:],
+                    "old_version": version_list[-3],
+                    "packages": project["packages"],
+                },
+            },
+        })
+    return json.dumps({
+        "arguments": {"rows_per_page": items},
+        "count": items,
+        "pages": 1,
+        "total": items,
+        "raw_messages": messages,
+    }).encode("utf-8")
+
+
+def generate_projects_page(items):
+    """
+    Generate page similar to Anitya `/api/v2/projects` response.
+
+    Params:
+        items (int): Number of projects on page
+
+    Returns:
+        (bytes): Content of the page
+    """
+    projects = [
+        {
+            "id": index,
+            "name": "project-{}".format(index),
+            "ecosystem": "pypi",
+            "homepage": "https://example.com/project-{}".format(index),
+            "backend": "PyPI",
+            "version_url": None,
+            "regex": None,
+            "version": "1.0.{}".format(index),
+            "versions": ["1.0.{}".format(number) for number in range(index % 50, -1, -1)],
+            "stable_versions": [],
+            "created_on": 1600000000.0,
+            "updated_on": 1600000000.0,
+        }
+        for index in range(items)
+    ]
+    return json.dumps({
+        "items": projects, "page": 1, "items_per_page": items, "total_items": items
+    }).encode("utf-8")
+
+
+def measure(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed = (time.perf_counter() - start) / repeat
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--page", action="append", default=[], help="Saved page as ITEMS_KEY:PATH"
+    )
+    parser.add_argument("--items", type=int, nargs="+", default=[100, 250])
+    parser.add_argument("--versions", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    metrics.SUMMARY = False
+    message_fields = cli.load_script("updated-versions").MESSAGE_FIELDS
+    project_fields = cli.load_script("del-last-version").PROJECT_FIELDS
+
+    pages = []
+    for page in args.page:
+        items_key, path = page.split(":", 1)
+        fields = message_fields if items_key == "raw_messages" else project_fields
+        with open(path, "rb") as f:
+            pages.append((os.path.basename(path), items_key, fields, f.read()))
+    if not pages:
+        for items in args.items:
+            pages.append((
+                "{} messages".format(items), "raw_messages", message_fields,
+                generate_messages_page(items, args.versions),
+            ))
+            pages.append((
+                "{} projects".format(items), "items", project_fields,
+                generate_projects_page(items),
+            ))
+
+    methods = [("json", lambda content, key, fields: json.loads(content))]
+    if decode.orjson is not None:
+        methods.append(("orjson", lambda content, key, fields: decode.orjson.loads(content)))
+    methods.append(
+        ("projected", lambda content, key, fields: decode.decode_bytes(content, key, fields))
+    )
+    if decode.ijson is not None:
+        methods.append((
+            "ijson stream",
+            lambda content, key, fields: decode.decode_bytes(content, key, fields, stream=True),
+        ))
+    else:
+        print("ijson is not installed, skipping streaming")
+
+    print("{:>16} {:>10} {:>14} {:>10} {:>12}".format(
+        "page", "size [kB]", "method", "time [ms]", "peak [MB]"
+    ))
+    for name, items_key, fields, content in pages:
+        expected = None
+        for method, func in methods:
+            elapsed, peak, result = measure(
+                lambda: func(content, items_key, fields), args.repeat
+            )
+            if isinstance(result, decode.Page):
+                if expected is None:
+                    expected = result
+                assert result == expected, method
+            print("{:>16} {:>10.1f} {:>14} {:>10.2f} {:>12.2f}".format(
+                name, len(content) / 1024, method, elapsed * 1000, peak / 1024 / 1024
+            ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark of writing results by anitya_common.output.
+
+Compares printing of the text output, as the scripts do in terminal (line
+buffered, with progress line and `project_id;distribution;name` line for
+every package), and parsing the lines back, as other tools have to, with
+writing the rows by buffered writers of every available format and reading
+them back.
+
+**Example**:
+    ./bench_output.py --rows 10000 100000 1000000
+"""
+import argparse
+import contextlib
+import csv
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from anitya_common import decode, output  # noqa: E402
+
+FIELDS = (("project_id", int), ("distribution", str), ("name", str))
+
+
+def generate_rows(count):
+    """
+    Generate packages resolved to project ids.
+
+    Params:
+        count (int): Number of rows
+
+    Returns:
+        (:obj:`list` of :obj:`dict`): Rows
+    """
+    distributions = ("Fedora", "Debian", "Ubuntu", "PyPI")
+    return [
+        {
+            "project_id": index // len(distributions) + 1,
+            "distribution": distributions[index % len(distributions)],
+            "name": "package-{}".format(index),
+        }
+        for index in range(count)
+    ]
+
+
+def print_rows(rows, path):
+    # Terminal is line buffered
+    with open(path, "w", buffering=1) as f, contextlib.redirect_stdout(f):
+        for row in rows:
+            print("Project '{}' has id '{}'".format(row["name"], row["project_id"]))
+            print("{};{};{}".format(row["project_id"], row["distribution"], row["name"]))
+
+
+def parse_text(path):
+    rows = []
+    with open(path, "r") as f:
+        for line in f:
+            if line.startswith("Project '"):
+                continue
+            project_id, distribution, name = line.rstrip("\n").split(";")
+            rows.append({"project_id": int(project_id), "distribution": distribution, "name": name})
+    return rows
+
+
+def read_back(output_format, path):
+    if output_format == "jsonl":
+        with open(path, "r") as f:
+            return [decode.loads(line) for line in f]
+    if output_format == "csv":
+        with open(path, "r", newline="") as f:
+            return [dict(row, project_id=int(row["project_id"])) for row in csv.DictReader(f)]
+    import pyarrow.parquet
+    return pyarrow.parquet.read_table(path).to_pylist()
+
+
+def measure(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    print("{:>10} {:>8} {:>12} {:>12} {:>10}".format("rows", "format", "write [ms]", "read [ms]", "size [kB]"))
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.rows:
+            rows = generate_rows(count)
+            path = os.path.join(tmp, "rows.txt")
+            _, write_time = measure(print_rows, rows, path)
+            parsed, read_time = measure(parse_text, path)
+            assert parsed == rows
+            print("{:>10} {:>8} {:>12.1f} {:>12.1f} {:>10.1f}".format(
+                count, "print", write_time * 1000, read_time * 1000, os.path.getsize(path) / 1024
+            ))
+            for output_format in output.FORMATS:
+                path = os.path.join(tmp, "rows." + output_format)
+                _, write_time = measure(output.write, output_format, rows, path, FIELDS)
+                parsed, read_time = measure(read_back, output_format, path)
+                assert parsed == rows
+                print("{:>10} {:>8} {:>12.1f} {:>12.1f} {:>10.1f}".format(
+                    count, output_format, write_time * 1000, read_time * 1000, os.path.getsize(path) / 1024
+                ))
+
+
+if __name__ == "__main__":
+    main()
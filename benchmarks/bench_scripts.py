@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the main flows of the scripts against local fake server.
+
+Every scenario runs the main flow of one script at every requested amount
+of items against `fake_server.FakeServer` and reports wall time, number of
+requests issued, bytes sent and received and peak RSS. Each run is done in
+separate process, so peak RSS belongs only to that run.
+
+Results are appended to RESULTS_FILE and every run is compared with the
+last stored run of the same scenario, amount of items, versions and latency.
+Runs slower by more than `--threshold` are reported as regressions.
+
+Scenarios:
+    packages    anitya_get_packages_by_partial_name, get all packages and filter them
+    ecosystem   anitya_get_projects_by_ecosystem, get project ids of all ecosystems
+    mapping     anitya_get_projects_by_packages, resolve packages to project ids
+    updates     updated-versions.py, get updates of infra apps from datagrepper
+    delete      anitya_del_last_version, delete latest version of projects
+    monitoring  set_monitoring_on_distgit, set monitoring of packages
+
+**Example**:
+    ./bench_scripts.py
+    ./bench_scripts.py --scenario packages updates --items 1000 10000 --latency 0.01
+    ./bench_scripts.py --fixtures recorded/ --fail-on-regression
+"""
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from fake_server import VERSIONS, Catalogue, FakeServer
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+RESULTS_FILE = os.path.join(BENCHMARKS_DIR, "results.jsonl")
+SCENARIOS = ("packages", "ecosystem", "mapping", "updates", "delete", "monitoring")
+ITEMS = (1000, 10000, 100000)
+# Relative slowdown of wall time reported as regression
+THRESHOLD = 0.1
+
+
+def load_script(directory, filename):
+    """
+    Import script from its directory.
+
+    Params:
+        directory (str): Directory of the script in repository
+        filename (str): File name of the script
+
+    Returns:
+        (module): Imported script
+    """
+    path = os.path.join(REPO_DIR, directory, filename)
+    sys.path.insert(0, os.path.dirname(path))
+    spec = importlib.util.spec_from_file_location(
+        os.path.splitext(filename)[0].replace("-", "_"), path
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_packages(server_url, items):
+    script = load_script("anitya_get_packages_by_partial_name", "anitya_get_packages_by_partial_name.py")
+    script.SERVER_URL = server_url
+    return len(script.filter_packages(script.get_all_packages_concurrent()))
+
+
+def run_ecosystem(server_url, items):
+    script = load_script("anitya_get_projects_by_ecosystem", "anitya_get_projects_by_ecosystem.py")
+    script.SERVER_URL = server_url
+    return len(script.get_all_project_ids(["crates.io", "pypi"]))
+
+
+def run_mapping(server_url, items):
+    script = load_script("anitya_get_projects_by_packages", "anitya_get_projects_by_packages.py")
+    script.SERVER_URL = server_url
+    return len(script.resolve_packages(items))
+
+
+def run_updates(server_url, items):
+    script = load_script("anitya_get_new_releases_for_infra_apps", "updated-versions.py")
+    return len(list(script.get_updates(server_url + "datagrepper/", 7)))
+
+
+def run_delete(server_url, items):
+    script = load_script("anitya_del_last_version", "anitya_del_last_version.py")
+    script.SERVER_URL = server_url
+    with script.Client(pool_size=script.MAX_WORKERS) as client:
+        versions = script.get_latest_versions(client, items) if script.USE_API else None
+        errors = script.remove_latest_versions(client, items, versions=versions)
+    return len(items) - len(errors)
+
+
+def run_monitoring(server_url, items):
+    script = load_script("set_monitoring_on_distgit", "set_monitoring_on_distgit.py")
+    script.DISTGIT_URL = server_url
+    return len(script.set_monitoring_on_packages(items))
+
+
+def scenario_input(scenario, catalogue):
+    """
+    Get input file content of the script, like PACKAGES_FILE or PROJECTS_FILE.
+    """
+    if scenario in ("mapping", "monitoring"):
+        return catalogue.fedora_packages()
+    if scenario == "delete":
+        return [str(project["id"]) for project in catalogue.projects]
+    return []
+
+
+def run_child(scenario, server_url, input_file, result_file):
+    """
+    Run the scenario in this process and write its measurements to result_file.
+    """
+    with open(input_file, "r") as f:
+        items = json.load(f)
+    sys.path.insert(0, REPO_DIR)
+    from anitya_common import metrics
+    # Keep the output of the benchmark readable
+    metrics.SUMMARY = False
+    runner = globals()["run_" + scenario]
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        processed = runner(server_url, items)
+    wall = time.perf_counter() - start
+    with open(result_file, "w") as f:
+        json.dump({
+            "wall": wall,
+            "processed": processed,
+            "peak_rss": peak_rss(),
+        }, f)
+
+
+def peak_rss():
+    """
+    Get peak RSS of this process in bytes.
+
+    `ru_maxrss` survives exec, so it could report the benchmark parent
+    instead, VmHWM of /proc is used when available.
+    """
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # Kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run_scenario(scenario, items, versions, latency, fixtures):
+    """
+    Start fake server and run the scenario against it in child process.
+
+    Returns:
+        (dict): Measurements of the run
+    """
+    catalogue = Catalogue(items, versions, fixtures)
+    with FakeServer(catalogue, latency=latency) as server, tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "input.json")
+        result_file = os.path.join(tmp, "result.json")
+        with open(input_file, "w") as f:
+            json.dump(scenario_input(scenario, catalogue), f)
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", scenario,
+             "--server", server.url, "--input", input_file, "--result", result_file],
+            check=True,
+        )
+        with open(result_file, "r") as f:
+            result = json.load(f)
+        result.update(server.stats)
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_results(path):
+    """
+    Read stored results, last result of every key wins.
+    """
+    previous = {}
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            for line in f:
+                if line.strip():
+                    result = json.loads(line)
+                    previous[result_key(result)] = result
+    return previous
+
+
+def result_key(result):
+    return (result["scenario"], result["items"], result["versions"], result["latency"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenario", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--items", type=int, nargs="+", default=list(ITEMS))
+    parser.add_argument("--versions", type=int, default=VERSIONS, help="Versions of every project")
+    parser.add_argument("--latency", type=float, default=0.0, help="Delay of responses in seconds")
+    parser.add_argument("--fixtures", help="Directory with recorded pages, see fake_server.py")
+    parser.add_argument("--results", default=RESULTS_FILE, help="File to store results to")
+    parser.add_argument("--no-store", action="store_true", help="Don't store the results")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--server", help=argparse.SUPPRESS)
+    parser.add_argument("--input", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.server, args.input, args.result)
+        return
+
+    previous = load_results(args.results)
+    commit = git_commit()
+    regressions = []
+    print("{:>10} {:>7} {:>9} {:>9} {:>10} {:>12} {:>10} {:>8}".format(
+        "scenario", "items", "wall [s]", "requests", "sent [kB]", "recv [kB]", "RSS [MB]", "change"
+    ))
+    for scenario in args.scenario:
+        for items in args.items:
+            result = {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "commit": commit,
+                "scenario": scenario,
+                "items": items,
+                "versions": args.versions,
+                "latency": args.latency,
+            }
+            result.update(run_scenario(scenario, items, args.versions, args.latency, args.fixtures))
+
+            change = ""
+            last = previous.get(result_key(result))
+            if last:
+                ratio = result["wall"] / last["wall"] - 1
+                change = "{:+.0%}".format(ratio)
+                if ratio > args.threshold:
+                    regressions.append((result, last))
+                    change += " !"
+            print("{:>10} {:>7} {:>9.2f} {:>9} {:>10.1f} {:>12.1f} {:>10.1f} {:>8}".format(
+                scenario, items, result["wall"], result["requests"], result["bytes_in"] / 1024,
+                result["bytes_out"] / 1024, result["peak_rss"] / 1024 / 1024, change,
+            ))
+            if not args.no_store:
+                with open(args.results, "a") as f:
+                    f.write(json.dumps(result) + "\n")
+
+    for result, last in regressions:
+        print("Regression of '{}' with '{}' items: {:.2f} s, was {:.2f} s on '{}'".format(
+            result["scenario"], result["items"], result["wall"], last["wall"], last["commit"]
+        ))
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
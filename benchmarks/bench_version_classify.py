@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark of version classification in updated-versions.py.
+
+Compares classification of updates by splitting the version strings on
+every property access, as it was done by `Update` before, with
+anitya_common.version, parsing every distinct version once. Updates are
+generated with REPEAT_RATIO of them repeating already seen versions, as in
+reports over many months where the same release is announced repeatedly.
+
+**Example**:
+    ./bench_version_classify.py --updates 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from anitya_common import version  # noqa: E402
+
+REPEAT_RATIO = 0.5
+
+
+def generate_updates(count):
+    """
+    Generate pairs of (old_version, new_version).
+
+    Params:
+        count (int): Number of pairs
+
+    Returns:
+        (:obj:`list` of :obj:`tuple`): Pairs of versions
+    """
+    random.seed(0)
+    pairs = []
+    for index in range(count):
+        if pairs and random.random() < REPEAT_RATIO:
+            pairs.append(random.choice(pairs))
+            continue
+        major, minor, patch = index % 13, index % 29, index % 7
+        old = "{}.{}.{}".format(major, minor, patch)
+        new = random.choice((
+            "{}.0.0".format(major + 1),
+            "{}.{}.0".format(major, minor + 1),
+            "{}.{}.{}".format(major, minor, patch + 1),
+        ))
+        pairs.append((old, new))
+    return pairs
+
+
+class SplitUpdate:
+    """
+    Classification used by `Update` before, splitting the versions on every
+    property access.
+    """
+
+    def __init__(self, old_version, version):
+        self.old_version = old_version
+        self.version = version
+
+    def _compare_version_slot(self, slot):
+        return self.old_version.split(".")[slot] == self.version.split(".")[slot]
+
+    @property
+    def is_major(self):
+        return not self._compare_version_slot(0)
+
+    @property
+    def is_minor(self):
+        return not self.is_major and not self._compare_version_slot(1)
+
+    @property
+    def update_type(self):
+        if self.is_major:
+            return "major"
+        elif self.is_minor:
+            return "minor"
+        else:
+            return "patch"
+
+
+def split_classify(pairs):
+    return [SplitUpdate(old, new).update_type for old, new in pairs]
+
+
+def batch_classify(pairs):
+    version.parse_version.cache_clear()
+    return version.classify_batch(pairs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--updates", type=int, nargs="+", default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    print("{:>10} {:>12} {:>12} {:>8}".format("updates", "split [ms]", "batch [ms]", "speedup"))
+    for count in args.updates:
+        pairs = generate_updates(count)
+        start = time.perf_counter()
+        expected = split_classify(pairs)
+        split_time = time.perf_counter() - start
+        start = time.perf_counter()
+        result = batch_classify(pairs)
+        batch_time = time.perf_counter() - start
+        assert result == expected
+        print("{:>10} {:>12.1f} {:>12.1f} {:>7.1f}x".format(
+            count, split_time * 1000, batch_time * 1000, split_time / batch_time
+        ))
+
+
+if __name__ == "__main__":
+    main()
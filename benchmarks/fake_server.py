@@ -0,0 +1,606 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for Anitya, datagrepper and dist-git used by the benchmarks.
+
+Serves generated catalogue of ITEMS packages, projects and datagrepper
+messages with configurable latency of every response and configurable
+number of versions of every project, which drives the size of responses.
+Items could be generated from recorded responses, see `--fixtures`.
+
+Endpoints:
+    GET  /api/v2/packages                 Anitya packages, paged
+    GET  /api/v2/projects                 Anitya projects, paged
+    GET  /api/project/<id>                Anitya project
+    GET  /project/<id>                    Anitya project page
+    GET  /project/<id>/delete/<version>   Anitya delete version form
+    POST /project/<id>/delete/<version>   Anitya delete version
+    GET  /datagrepper/v2/search           datagrepper messages, paged
+    GET  /_dg/anitya/rpms/<package>       dist-git monitoring status
+    POST /_dg/anitya/rpms/<package>       dist-git set monitoring status
+    GET  /login/fedora/                   Anitya login, OpenID form
+    POST /openid                          Ipsilon OpenID request, redirects to login form
+    GET  /openid                          Ipsilon login form with transaction id
+    POST /login/fas                       Ipsilon login, sets session cookie
+
+Anitya and Ipsilon are served on the same URL. Login with USERNAME and
+PASSWORD sets `session` cookie. The delete form stores new CSRF nonce in
+the cookie and its CSRF token is derived from it, so the form has to be
+posted with the cookie of the same session. With `login_required` only
+logged in sessions could delete versions.
+
+Requests, bytes received and sent and the most requests handled at once
+are counted, see `FakeServer.stats`. Every response could be delayed by
+random jitter on top of the latency, so concurrent requests finish out of
+order, and requests could be recorded, see `FakeServer.requests`.
+
+**Example**:
+    ./fake_server.py --port 8765 --items 10000 --latency 0.01
+    ./fake_server.py --port 8765 --fixtures recorded/
+
+The fixtures directory could contain `packages.json`, `projects.json` and
+`messages.json`, each with one page recorded from Anitya or datagrepper.
+Items of the page are used as templates for the generated items.
+"""
+import argparse
+import copy
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+
+ITEMS = 1000
+# Number of versions of every project
+VERSIONS = 10
+# Delay of every response in seconds
+LATENCY = 0.0
+ECOSYSTEMS = ("crates.io", "pypi")
+DISTRIBUTIONS = ("Fedora", "Fedora", "Fedora", "Ubuntu")
+# Every APP_EVERY-th datagrepper message is about one of APP_NAMES
+APP_NAMES = ("anitya", "bodhi", "datagrepper", "duffy", "fmn", "noggin-aaa")
+APP_EVERY = 25
+# Messages are spread over this many days before now
+MESSAGES_DAYS = 6
+# Every PAGURE_EVERY-th project is hosted on pagure.io
+PAGURE_EVERY = 10
+TOPIC = "org.release-monitoring.prod.anitya.project.version.update.v2"
+# Credentials accepted by the fake Ipsilon
+USERNAME = "user"
+PASSWORD = "password"
+
+PROJECT_PAGE = """<!DOCTYPE html><html><head><title>{name}</title></head><body>
+<nav class="navbar"><ul>{navigation}</ul></nav>
+<div class="card"><dl><dt>Project</dt><dd>{name}</dd><dt>Ecosystem</dt><dd>{ecosystem}</dd></dl></div>
+<table class="table">{rows}</table>
+</body></html>"""
+RELEASE_ROW = (
+    '<tr property="doap:release" typeof="doap:Version">'
+    '<td><span class="badge">stable</span></td>'
+    '<td property="dc:created">2023-01-01</td>'
+    '<td property="doap:revision">{version}</td>'
+    '<td><a href="/project/{id}/delete/{version}" class="btn btn-sm">Delete</a></td>'
+    "</tr>\n"
+)
+DELETE_FORM = (
+    "<!DOCTYPE html><html><body><form method=\"POST\">"
+    '<input id="csrf_token" name="csrf_token" type="hidden" value="{token}"/>'
+    '<input id="confirm" name="confirm" type="submit" value="Yes"/>'
+    "</form></body></html>"
+)
+OPENID_FORM = (
+    '<!DOCTYPE html><html><body><form method="POST" action="/openid">'
+    '<input type="hidden" name="openid.mode" value="checkid_setup"/>'
+    '<input type="hidden" name="openid.return_to" value="/login/fedora/"/>'
+    "</form></body></html>"
+)
+IPSILON_FORM = (
+    '<!DOCTYPE html><html><body><form method="POST" action="/login/fas">'
+    '<input type="text" name="login_name"/><input type="password" name="login_password"/>'
+    '<input type="hidden" id="ipsilon_transaction_id" name="ipsilon_transaction_id" value="{transaction}"/>'
+    "</form></body></html>"
+)
+
+
+class Catalogue:
+    """
+    Generated data served by the fake server.
+
+    Attributes:
+        packages (list): Anitya packages
+        projects (list): Anitya projects
+        messages (list): Datagrepper messages, newest first
+        monitoring (dict): Dist-git monitoring status of packages
+    """
+
+    def __init__(self, items=ITEMS, versions=VERSIONS, fixtures=None):
+        """
+        Params:
+            items (int): Number of packages, projects and messages
+            versions (int): Number of versions of every project
+            fixtures (str): Directory with recorded pages used as templates
+        """
+        templates = _load_fixtures(fixtures)
+        self.projects = [
+            self._project(index, versions, templates.get("projects")) for index in range(items)
+        ]
+        self.packages = [
+            self._package(index, self.projects[index], templates.get("packages"))
+            for index in range(items)
+        ]
+        now = time.time()
+        step = MESSAGES_DAYS * 86400 / max(items, 1)
+        self.messages = [
+            self._message(index, now - index * step, templates.get("messages"))
+            for index in range(items)
+        ]
+        self.monitoring = {
+            package["name"]: "monitoring" if index % 2 else "no-monitoring"
+            for index, package in enumerate(self.packages)
+            if package["distribution"] == "Fedora"
+        }
+        self.lock = threading.Lock()
+        self._filtered = {}
+        self._serialized = []
+
+        self.projects_by_id = {project["id"]: project for project in self.projects}
+        self.projects_by_name = {}
+        self.projects_by_ecosystem = {}
+        for project in self.projects:
+            self.projects_by_name.setdefault(project["name"], []).append(project)
+            self.projects_by_ecosystem.setdefault(project["ecosystem"], []).append(project)
+        self.packages_by_name = {}
+        for package in self.packages:
+            self.packages_by_name.setdefault(package["name"], []).append(package)
+
+    def fedora_packages(self):
+        """
+        Names of Fedora packages, for the scripts reading list of packages.
+        """
+        return list(self.monitoring)
+
+    def publish(self, message):
+        """
+        Add new message, as the newest one.
+        """
+        with self.lock:
+            self.messages.insert(0, message)
+            self._filtered = {}
+            self._serialized = []
+
+    def messages_containing(self, contains):
+        """
+        Messages with body containing any of the values, all messages when
+        no values are provided. Like datagrepper, the values are matched
+        against the whole body serialized as JSON, not only project name.
+        """
+        if not contains:
+            return self.messages
+        key = tuple(sorted(contains))
+        with self.lock:
+            if key not in self._filtered:
+                self._filtered[key] = [
+                    message for message, body in zip(self.messages, self._bodies())
+                    if any(value in body for value in key)
+                ]
+            return self._filtered[key]
+
+    def _bodies(self):
+        """
+        Bodies of the messages serialized as JSON, the way datagrepper stores them.
+        """
+        if len(self._serialized) != len(self.messages):
+            self._serialized = [json.dumps(message["body"]) for message in self.messages]
+        return self._serialized
+
+    def _project(self, index, versions, templates):
+        project = _from_template(templates, index)
+        version_list = ["{}.{}.0".format(index % 7 + 1, number) for number in range(versions, 0, -1)]
+        project.update({
+            "id": index + 1,
+            "name": "{}-{}".format(project.get("name", "project"), index),
+            "ecosystem": ECOSYSTEMS[index % len(ECOSYSTEMS)],
+            "version": version_list[0] if version_list else None,
+            "versions": version_list,
+            "stable_versions": version_list,
+            "created_on": 1600000000.0 + index,
+            "updated_on": 1700000000.0 + index,
+        })
+        if index % PAGURE_EVERY == 0:
+            project.setdefault("homepage", "https://pagure.io/{}".format(project["name"]))
+        project.setdefault("homepage", "https://example.com/{}".format(project["name"]))
+        project.setdefault("backend", "custom")
+        return project
+
+    def _package(self, index, project, templates):
+        package = _from_template(templates, index)
+        name = "{}-{}".format(package.get("name", "package"), index)
+        if index % 100 == 99:
+            name += "-delete"
+        package.update({
+            "name": name,
+            "distribution": DISTRIBUTIONS[index % len(DISTRIBUTIONS)],
+            "project": project["name"],
+            "ecosystem": project["ecosystem"],
+        })
+        package.setdefault("version", project["version"])
+        package.setdefault("stable_version", project["version"])
+        return package
+
+    def _message(self, index, timestamp, templates):
+        message = _from_template(templates, index)
+        if index % APP_EVERY == 0:
+            project = dict(self.projects[index], name=APP_NAMES[index // APP_EVERY % len(APP_NAMES)])
+        else:
+            project = self.projects[index]
+        body = message.setdefault("body", {})
+        body["project"] = project
+        body.setdefault("message", {}).update({
+            "agent": "anitya",
+            "project": project,
+            "old_version": project["versions"][1] if len(project["versions"]) > 1 else None,
+            "upstream_versions": project["versions"][:1],
+            "packages": [],
+        })
+        message.update({
+            "msg_id": "msg-{}".format(index),
+            "topic": TOPIC,
+            "timestamp": timestamp,
+            "headers": {
+                "sent-at": datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+            },
+        })
+        return message
+
+
+class FakeServer:
+    """
+    Fake server running in background thread.
+
+    Attributes:
+        catalogue (`Catalogue`): Data served
+        latency (float): Delay of every response in seconds
+        jitter (float): Maximum random delay added to latency in seconds
+        url (str): Base URL of the server, ending with slash
+        stats (dict): Number of requests, bytes received and bytes sent and
+                      the most requests handled at once
+        requests (list): Pairs of (method, path) of the requests in order
+                         they were received, None if not recorded
+        login_required (bool): Only logged in sessions could delete versions
+        sessions (set): Ids of logged in sessions
+    """
+
+    def __init__(self, catalogue, latency=LATENCY, port=0, jitter=0.0, record=False, login_required=False):
+        """
+        Params:
+            catalogue (`Catalogue`): Data to serve
+            latency (float): Delay of every response in seconds
+            port (int): Port to listen on, random free port by default
+            jitter (float): Maximum random delay added to latency in seconds
+            record (bool): Record the requests in `requests`
+            login_required (bool): Only logged in sessions could delete versions
+        """
+        self.catalogue = catalogue
+        self.latency = latency
+        self.jitter = jitter
+        self.stats = {"requests": 0, "bytes_in": 0, "bytes_out": 0, "max_in_flight": 0}
+        self.requests = [] if record else None
+        self.login_required = login_required
+        self.sessions = set()
+        self.transactions = set()
+        self._in_flight = 0
+        self._stats_lock = threading.Lock()
+        handler = type("Handler", (Handler,), {"fake": self})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.httpd.daemon_threads = True
+        self.url = "http://127.0.0.1:{}/".format(self.httpd.server_address[1])
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.stats = {"requests": 0, "bytes_in": 0, "bytes_out": 0, "max_in_flight": 0}
+            if self.requests is not None:
+                self.requests = []
+
+    def count(self, requests=0, bytes_in=0, bytes_out=0):
+        with self._stats_lock:
+            self.stats["requests"] += requests
+            self.stats["bytes_in"] += bytes_in
+            self.stats["bytes_out"] += bytes_out
+
+    def started(self, method, path):
+        with self._stats_lock:
+            self._in_flight += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self._in_flight)
+            if self.requests is not None:
+                self.requests.append((method, path))
+
+    def finished(self):
+        with self._stats_lock:
+            self._in_flight -= 1
+
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    Request handler, `fake` is set to the `FakeServer` by the server.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, don't let Nagle delay them
+    disable_nagle_algorithm = True
+    fake = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def _handle(self, method):
+        self.fake.started(method, self.path)
+        try:
+            self._respond(method)
+        finally:
+            self.fake.finished()
+
+    def _respond(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        self.fake.count(
+            requests=1, bytes_in=len(self.requestline) + len(str(self.headers)) + length
+        )
+        delay = self.fake.latency + random.uniform(0, self.fake.jitter)
+        if delay:
+            time.sleep(delay)
+
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        catalogue = self.fake.catalogue
+        path = unquote(url.path)
+
+        if path == "/api/v2/packages" and method == "GET":
+            items = catalogue.packages
+            if "name" in query:
+                items = catalogue.packages_by_name.get(query["name"][0], [])
+            if "distribution" in query:
+                items = [item for item in items if item["distribution"] == query["distribution"][0]]
+            return self._send_json(_anitya_page(items, query))
+        if path == "/api/v2/projects" and method == "GET":
+            items = catalogue.projects
+            if "name" in query:
+                items = catalogue.projects_by_name.get(query["name"][0], [])
+            if "ecosystem" in query:
+                ecosystem = query["ecosystem"][0]
+                if "name" in query:
+                    items = [item for item in items if item["ecosystem"] == ecosystem]
+                else:
+                    items = catalogue.projects_by_ecosystem.get(ecosystem, [])
+            return self._send_json(_anitya_page(items, query))
+        if path == "/datagrepper/v2/search" and method == "GET":
+            return self._send_json(_datagrepper_page(catalogue, query))
+
+        match = re.match(r"^/api/project/(\d+)$", path)
+        if match and method == "GET":
+            project = catalogue.projects_by_id.get(int(match.group(1)))
+            if project is None:
+                return self._send(404, b'{"error": "No such project"}', "application/json")
+            return self._send_json(project)
+
+        if path == "/login/fedora/" and method == "GET":
+            return self._send(200, OPENID_FORM.encode("utf-8"), "text/html")
+        if path == "/openid":
+            return self._openid(method, query, body)
+        if path == "/login/fas" and method == "POST":
+            return self._login(body)
+
+        match = re.match(r"^/project/(\d+)(?:/delete/(.+))?$", path)
+        if match:
+            return self._project(method, int(match.group(1)), match.group(2), body)
+
+        match = re.match(r"^/_dg/anitya/rpms/(.+)$", path)
+        if match:
+            return self._monitoring(method, match.group(1), body)
+
+        self._send(404, b"Not found", "text/plain")
+
+    def _project(self, method, project_id, version, body):
+        catalogue = self.fake.catalogue
+        project = catalogue.projects_by_id.get(project_id)
+        if project is None or (version and version not in project["versions"]):
+            return self._send(404, b"Not found", "text/html")
+        if version is None:
+            page = PROJECT_PAGE.format(
+                name=project["name"],
+                ecosystem=project["ecosystem"],
+                navigation='<li><a href="/">item</a></li>' * 20,
+                rows="".join(
+                    RELEASE_ROW.format(id=project_id, version=item) for item in project["versions"]
+                ),
+            )
+            return self._send(200, page.encode("utf-8"), "text/html")
+        session, _, nonce = self._cookie("session").partition(".")
+        if self.fake.login_required and session not in self.fake.sessions:
+            return self._send(403, b"Login required", "text/html")
+        if method == "GET":
+            # Every form gets new token, kept in the session cookie
+            nonce = uuid.uuid4().hex
+            token = "token-{}-{}".format(project_id, nonce)
+            return self._send(
+                200, DELETE_FORM.format(token=token).encode("utf-8"), "text/html",
+                headers={"Set-Cookie": "session={}.{}; Path=/".format(session, nonce)},
+            )
+        token = "token-{}-{}".format(project_id, nonce)
+        if not nonce or parse_qs(body.decode("utf-8")).get("csrf_token") != [token]:
+            return self._send(400, b"Bad CSRF token", "text/html")
+        with catalogue.lock:
+            if version in project["versions"]:
+                project["versions"].remove(version)
+                project["version"] = project["versions"][0] if project["versions"] else None
+        self._send(200, b"Deleted", "text/html")
+
+    def _openid(self, method, query, body):
+        if method == "POST":
+            if parse_qs(body.decode("utf-8")).get("openid.mode") != ["checkid_setup"]:
+                return self._send(400, b"Bad OpenID request", "text/html")
+            transaction = uuid.uuid4().hex
+            with self.fake.catalogue.lock:
+                self.fake.transactions.add(transaction)
+            return self._send(
+                303, b"", "text/html", headers={"Location": "/openid?transaction=" + transaction}
+            )
+        transaction = query.get("transaction", [""])[0]
+        if transaction not in self.fake.transactions:
+            return self._send(400, b"Unknown transaction", "text/html")
+        self._send(200, IPSILON_FORM.format(transaction=transaction).encode("utf-8"), "text/html")
+
+    def _login(self, body):
+        form = parse_qs(body.decode("utf-8"))
+        if (
+            form.get("ipsilon_transaction_id", [""])[0] not in self.fake.transactions
+            or form.get("login_name") != [USERNAME]
+            or form.get("login_password") != [PASSWORD]
+        ):
+            return self._send(401, b"Login failed", "text/html")
+        session = uuid.uuid4().hex
+        with self.fake.catalogue.lock:
+            self.fake.sessions.add(session)
+        self._send(200, b"Logged in", "text/html", headers={"Set-Cookie": "session={}; Path=/".format(session)})
+
+    def _cookie(self, name):
+        cookie = SimpleCookie(self.headers.get("Cookie") or "")
+        return cookie[name].value if name in cookie else ""
+
+    def _monitoring(self, method, package, body):
+        monitoring = self.fake.catalogue.monitoring
+        if package not in monitoring:
+            return self._send(404, b'{"error": "No such package"}', "application/json")
+        if method == "POST":
+            monitoring[package] = json.loads(body)["anitya_status"]
+        self._send_json({"name": package, "monitoring": monitoring[package]})
+
+    def _send_json(self, document):
+        self._send(200, json.dumps(document).encode("utf-8"), "application/json")
+
+    def _send(self, status, content, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+        # Status line and headers are roughly 150 bytes
+        self.fake.count(bytes_out=len(content) + 150)
+
+
+def _anitya_page(items, query):
+    items_per_page = int(query.get("items_per_page", ["25"])[0])
+    page = int(query.get("page", ["1"])[0])
+    return {
+        "items": items[(page - 1) * items_per_page:page * items_per_page],
+        "page": page,
+        "items_per_page": items_per_page,
+        "total_items": len(items),
+    }
+
+
+def _datagrepper_page(catalogue, query):
+    if "start" in query:
+        start = float(query["start"][0])
+    else:
+        start = time.time() - float(query.get("delta", ["600"])[0])
+    messages = catalogue.messages_containing(query.get("contains"))
+    # Messages are sorted from the newest, find the oldest one still in range
+    low, high = 0, len(messages)
+    while low < high:
+        middle = (low + high) // 2
+        if messages[middle]["timestamp"] >= start:
+            low = middle + 1
+        else:
+            high = middle
+    messages = messages[:low]
+    rows_per_page = int(query.get("rows_per_page", ["25"])[0])
+    page = int(query.get("page", ["1"])[0])
+    return {
+        "arguments": {"page": page, "rows_per_page": rows_per_page},
+        "count": len(messages[(page - 1) * rows_per_page:page * rows_per_page]),
+        "pages": max(1, math.ceil(len(messages) / rows_per_page)),
+        "total": len(messages),
+        "raw_messages": messages[(page - 1) * rows_per_page:page * rows_per_page],
+    }
+
+
+def _load_fixtures(path):
+    """
+    Load items of recorded pages from the fixtures directory.
+    """
+    templates = {}
+    if not path:
+        return templates
+    for scope, items_key in (("packages", "items"), ("projects", "items"), ("messages", "raw_messages")):
+        fixture = os.path.join(path, scope + ".json")
+        if os.path.exists(fixture):
+            with open(fixture, "r") as f:
+                templates[scope] = json.load(f)[items_key]
+    return templates
+
+
+def _from_template(templates, index):
+    if not templates:
+        return {}
+    template = copy.deepcopy(templates[index % len(templates)])
+    if "name" in template:
+        # Names are made unique by the caller appending the index
+        template["name"] = re.sub(r"-\d+$", "", str(template["name"]))
+    return template
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--items", type=int, default=ITEMS)
+    parser.add_argument("--versions", type=int, default=VERSIONS)
+    parser.add_argument("--latency", type=float, default=LATENCY, help="Delay of responses in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Maximum random delay added to latency")
+    parser.add_argument("--fixtures", help="Directory with recorded pages")
+    parser.add_argument("--login-required", action="store_true", help="Only logged in sessions delete versions")
+    args = parser.parse_args()
+
+    catalogue = Catalogue(args.items, args.versions, args.fixtures)
+    server = FakeServer(catalogue, latency=args.latency, port=args.port, jitter=args.jitter, login_required=args.login_required)
+    print("Serving '{}' items on {}".format(args.items, server.url))
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("Requests: {requests}, received: {bytes_in} B, sent: {bytes_out} B".format(**server.stats))
+
+
+if __name__ == "__main__":
+    main()
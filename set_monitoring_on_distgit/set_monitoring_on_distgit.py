@@ -11,48 +11,238 @@ Fedora package.
 **Example file**:
     0ad
     python-requests
+
+With SKIP_UNCHANGED enabled the current monitoring status of all the packages
+is read first and only packages with different status are updated.
+
+Updated packages are recorded in JOURNAL_FILE and skipped when the script
+is interrupted and started again with the same MONITORING_OPTION,
+DISTGIT_URL and packages, they are still counted in the summary. The
+journal is removed when all the packages are processed without failure.
 """
 import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 
-from requests.adapters import HTTPAdapter
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from anitya_common.client import Client  # noqa: E402
+from anitya_common.journal import Journal, input_digest  # noqa: E402
+from anitya_common.metrics import METRICS  # noqa: E402
 
 
 PACKAGES_FILE = "packages"
 DISTGIT_URL = "https://src.stg.fedoraproject.org/"
 DISTGIT_API_KEY = "token"
 MONITORING_OPTION = "monitoring"
+# Number of packages updated concurrently
+MAX_WORKERS = 8
+# Read current status first and don't update packages already set
+# to MONITORING_OPTION
+SKIP_UNCHANGED = True
+# File to record processed packages to, not shared with anitya_get_projects_by_packages
+JOURNAL_FILE = PACKAGES_FILE + ".monitoring.journal"
 
-if __name__ == "__main__":
-    packages = []
-    with open(PACKAGES_FILE, "r") as f:
-        packages = f.readlines()
+# Results of the update of the package
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+UNCHANGED = "unchanged"
+
+
+def set_monitoring(client, package, body, headers):
+    """
+    Set monitoring status of the package on dist-git.
+
+    Params:
+        client (`anitya_common.client.Client`): HTTP client
+        package (str): Name of the package
+        body (str): Serialized JSON body of the request
+        headers (dict): Headers of the request
 
-    # Create a requests session
-    requests_session = requests.Session()
+    Returns:
+        (str): SUCCEEDED or FAILED
+    """
+    # Setting the same status again does no harm, the request can be retried
+    resp = client.post(
+        DISTGIT_URL + f"_dg/anitya/rpms/{package}",
+        data=body,
+        headers=headers,
+        idempotent=True,
+    )
+    if resp.status_code != requests.codes.ok:
+        try:
+            print(f"Request {resp.url} failed with {resp.json()}")
+        except json.decoder.JSONDecodeError:
+            print(f"Request {resp.url} failed with {resp.content}")
+        return FAILED
 
-    requests_session.mount("https://", HTTPAdapter(max_retries=5))
+    print(
+        "Changed monitoring status to "
+        f"{MONITORING_OPTION} for {package}"
+    )
+    return SUCCEEDED
 
+
+def get_monitoring(client, package):
+    """
+    Get current monitoring status of the package on dist-git.
+
+    Params:
+        client (`anitya_common.client.Client`): HTTP client
+        package (str): Name of the package
+
+    Returns:
+        (str): Current monitoring status, None if it couldn't be retrieved
+    """
+    try:
+        resp = client.get(
+            DISTGIT_URL + f"_dg/anitya/rpms/{package}",
+            headers={"Accept": "application/json"}
+        )
+    except requests.RequestException as exc:
+        print(f"Request for {package} failed with {exc}")
+        return None
+    if resp.status_code != requests.codes.ok:
+        print(f"Can't read monitoring status of {package}, request {resp.url} failed")
+        return None
+    try:
+        with METRICS.timed("json"):
+            return resp.json().get("monitoring")
+    except json.decoder.JSONDecodeError:
+        return None
+
+
+def set_monitoring_on_packages(packages, max_workers=None, journal=None):
+    """
+    Set monitoring status on dist-git for every package concurrently.
+
+    Params:
+        packages (:obj:`list` of :obj:`str`): Names of the packages
+        max_workers (int): Number of concurrent requests, defaults to MAX_WORKERS
+        journal (`anitya_common.journal.Journal`): Journal to record succeeded
+                                                   and unchanged packages to,
+                                                   packages found in it are
+                                                   skipped
+
+    Returns:
+        (dict): Result of every package, package name is the key and value
+                is SUCCEEDED, FAILED or UNCHANGED. Packages listed more than
+                once are only updated once, packages found in journal have
+                the result recorded there.
+    """
+    max_workers = max_workers or MAX_WORKERS
     headers = {
         "Authorization": f"token {DISTGIT_API_KEY}",
         "Accept": "application/json",
         "Content-Type": "application/json",
     }
+    # Same body for every package, serialize it only once
+    body = json.dumps({"anitya_status": MONITORING_OPTION})
 
+    results = {}
+    unique_packages = []
     for package in packages:
-        resp = requests_session.post(
-            DISTGIT_URL + f"_dg/anitya/rpms/{package.strip()}",
-            data=json.dumps({"anitya_status": MONITORING_OPTION}),
-            headers=headers
-        )
-        if resp.status_code != requests.codes.ok:
-            try:
-                print(f"Request {resp.url} failed with {resp.json()}")
-            except json.decoder.JSONDecodeError:
-                print(f"Request {resp.url} failed with {resp.content}")
-        else:
+        package = package.strip()
+        if not package:
+            continue
+        if package in results:
+            print(f"Package {package} listed more than once, skipping")
+            continue
+        if journal and package in journal:
+            results[package] = journal.done[package]
+            continue
+        results[package] = None
+        unique_packages.append(package)
+    if journal and len(unique_packages) < len(results):
+        print(f"{len(results) - len(unique_packages)} packages already processed by previous run")
+
+    with Client(pool_size=max_workers) as client, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        if SKIP_UNCHANGED:
+            statuses = executor.map(lambda package: get_monitoring(client, package), unique_packages)
+            current = dict(zip(unique_packages, statuses))
+            for package, status in current.items():
+                if status == MONITORING_OPTION:
+                    results[package] = UNCHANGED
+                    if journal:
+                        journal.record(package, UNCHANGED)
+            unique_packages = [package for package in unique_packages if results[package] != UNCHANGED]
             print(
-                "Changed monitoring status to "
-                f"{MONITORING_OPTION} for {package.strip()}"
+                f"{len(current) - len(unique_packages)} packages already set to {MONITORING_OPTION}, "
+                f"{len(unique_packages)} packages to update"
             )
+
+        for package, result in zip(unique_packages, executor.map(
+            lambda package: _set_monitoring_safe(client, package, body, headers), unique_packages
+        )):
+            results[package] = result
+            if journal and result == SUCCEEDED:
+                journal.record(package, result)
+
+    return results
+
+
+def _set_monitoring_safe(client, package, body, headers):
+    """
+    Call set_monitoring, reporting connection failures as FAILED
+    instead of stopping the whole run.
+    """
+    try:
+        return set_monitoring(client, package, body, headers)
+    except requests.RequestException as exc:
+        print(f"Request for {package} failed with {exc}")
+        return FAILED
+
+
+def print_summary(results):
+    """
+    Print summary of the results.
+
+    Params:
+        results (dict): Result of every package returned
+                        by set_monitoring_on_packages
+    """
+    for status in (SUCCEEDED, FAILED, UNCHANGED):
+        packages = [package for package, result in results.items() if result == status]
+        print(f"{status.title()}: {len(packages)}")
+        if status == FAILED:
+            for package in packages:
+                print(f"    {package}")
+        if status == UNCHANGED and SKIP_UNCHANGED:
+            print(f"Writes avoided: {len(packages)}")
+
+
+def main(output_format="text"):
+    """
+    Set monitoring status on dist-git for packages in PACKAGES_FILE.
+
+    Params:
+        output_format (str): With "text" summary is printed,
+                             otherwise the results are only returned
+
+    Returns:
+        (dict): Result of every package, see set_monitoring_on_packages
+    """
+    packages = []
+    with open(PACKAGES_FILE, "r") as f:
+        packages = f.readlines()
+
+    params = {
+        "monitoring": MONITORING_OPTION,
+        "server": DISTGIT_URL,
+        "input": input_digest(package.strip() for package in packages if package.strip()),
+    }
+    with Journal(JOURNAL_FILE, params) as journal:
+        results = set_monitoring_on_packages(packages, journal=journal)
+        if FAILED not in results.values():
+            journal.complete()
+    if output_format == "text":
+        print_summary(results)
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Shared fixtures of the tests running the scripts against the fake server
+of the benchmarks, see `benchmarks/fake_server.py`.
+"""
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+
+from anitya_common import cli, metrics  # noqa: E402
+from fake_server import Catalogue, FakeServer  # noqa: E402
+
+# Number of packages, projects and messages served
+ITEMS = 200
+
+# Summary of the requests is printed at exit, keep it out of the test output
+metrics.SUMMARY = False
+
+
+@pytest.fixture
+def catalogue():
+    return Catalogue(ITEMS, versions=3)
+
+
+@pytest.fixture
+def server(catalogue):
+    with FakeServer(catalogue) as fake:
+        yield fake
+
+
+@pytest.fixture
+def load_script():
+    """
+    Import fresh copy of the script of the `anitya-scripts` subcommand,
+    so constants changed by one test don't leak to another.
+    """
+    return cli.load_script
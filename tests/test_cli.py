@@ -0,0 +1,49 @@
+"""
+Tests of exit codes of the `anitya-scripts` command.
+"""
+from anitya_common import cli, client
+
+
+def run(server, tmp_path, command, items, *options):
+    items_file = tmp_path / "items"
+    items_file.write_text("\n".join(items) + "\n")
+    return cli.main(["--server", server.url, command, str(items_file), *options])
+
+
+def test_set_monitoring(server, catalogue, tmp_path):
+    packages = catalogue.fedora_packages()[:10]
+
+    assert run(server, tmp_path, "set-monitoring", packages, "--monitoring", "monitoring") == 0
+    assert run(server, tmp_path, "set-monitoring", packages + ["no-such-package"]) == cli.EXIT_FAILED
+
+
+def test_set_monitoring_json(server, catalogue, tmp_path, capsys):
+    items_file = tmp_path / "items"
+    items_file.write_text("no-such-package\n")
+
+    code = cli.main(["--server", server.url, "--output-format", "json", "set-monitoring", str(items_file)])
+
+    assert code == cli.EXIT_FAILED
+    assert '"no-such-package": "failed"' in capsys.readouterr().out
+
+
+def test_projects_by_packages(server, catalogue, tmp_path):
+    packages = catalogue.fedora_packages()[:10]
+
+    assert run(server, tmp_path, "projects-by-packages", packages, "--mapping-file", "") == 0
+
+
+def test_projects_by_packages_failed(server, catalogue, tmp_path, monkeypatch):
+    monkeypatch.setattr(client, "BACKOFF_FACTOR", 0)
+    server.stop()
+
+    assert run(server, tmp_path, "projects-by-packages", ["package-0"], "--mapping-file", "") == cli.EXIT_FAILED
+
+
+def test_del_last_version():
+    script = cli.load_script("del-last-version")
+
+    assert not cli.failed("del-last-version", script, {})
+    assert cli.failed("del-last-version", script, {"1": "Project '1' not found."})
+    script.DRY_RUN = True
+    assert not cli.failed("del-last-version", script, {"1": None})
@@ -0,0 +1,129 @@
+"""
+Tests of retries of anitya_common.client.
+"""
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from anitya_common import client as client_module
+from anitya_common.client import Client, connect_failed
+
+
+class FailingHandler(BaseHTTPRequestHandler):
+    """
+    Responds with status and headers from the path, `/502`, `/503?retry-after`
+    or `/slow` sleeping longer than the timeout of the tests.
+    """
+
+    protocol_version = "HTTP/1.1"
+    requests = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self._handle()
+
+    def _handle(self):
+        self.requests.append((self.command, self.path))
+        path, _, query = self.path.lstrip("/").partition("?")
+        if path == "slow":
+            time.sleep(0.5)
+            status = 200
+        else:
+            status = int(path)
+        self.send_response(status)
+        if query == "retry-after":
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+@pytest.fixture
+def server():
+    handler = type("Handler", (FailingHandler,), {"requests": []})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.url = "http://127.0.0.1:{}/".format(httpd.server_address[1])
+    httpd.requests = handler.requests
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(client_module, "BACKOFF_FACTOR", 0)
+    with Client(max_retries=2) as client:
+        yield client
+
+
+def test_get_is_retried(client, server):
+    resp = client.get(server.url + "502")
+
+    assert resp.status_code == 502
+    assert len(server.requests) == 3
+
+
+def test_post_is_not_retried_on_server_error(client, server):
+    resp = client.post(server.url + "502", data={"confirm": "Yes"})
+
+    assert resp.status_code == 502
+    assert server.requests == [("POST", "/502")]
+
+
+def test_post_is_retried_when_refused_with_retry_after(client, server):
+    resp = client.post(server.url + "503?retry-after", data={"confirm": "Yes"})
+
+    assert resp.status_code == 503
+    assert len(server.requests) == 3
+
+
+def test_post_is_not_retried_on_503_without_retry_after(client, server):
+    client.post(server.url + "503", data={"confirm": "Yes"})
+
+    assert len(server.requests) == 1
+
+
+def test_idempotent_post_is_retried(client, server):
+    client.post(server.url + "502", data={"confirm": "Yes"}, idempotent=True)
+
+    assert len(server.requests) == 3
+
+
+def test_post_is_not_retried_on_read_timeout(client, server):
+    with pytest.raises(requests.Timeout):
+        client.post(server.url + "slow", data={"confirm": "Yes"}, timeout=0.1)
+
+    assert len(server.requests) == 1
+
+
+def test_get_is_retried_on_read_timeout(client, server):
+    with pytest.raises(requests.Timeout):
+        client.get(server.url + "slow", timeout=0.1)
+
+    assert len(server.requests) == 3
+
+
+def test_connect_failed():
+    # Nothing is listening on the port after it's released
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    with pytest.raises(requests.ConnectionError) as exc_info:
+        requests.post("http://127.0.0.1:{}/".format(port), timeout=1)
+
+    assert connect_failed(exc_info.value)
+    assert not connect_failed(requests.ReadTimeout("read timed out"))
+    assert not connect_failed(requests.ConnectionError("Connection aborted."))
@@ -0,0 +1,165 @@
+"""
+Tests of anitya_del_last_version against the fake Anitya web UI and Ipsilon.
+"""
+import pytest
+
+from fake_server import PASSWORD, USERNAME, FakeServer
+
+
+@pytest.fixture
+def server(catalogue):
+    with FakeServer(catalogue, jitter=0.01, login_required=True) as fake:
+        yield fake
+
+
+@pytest.fixture
+def script(load_script, server):
+    script = load_script("del-last-version")
+    script.SERVER_URL = server.url
+    script.LOGIN_URL = server.url
+    return script
+
+
+@pytest.fixture
+def session(script):
+    with script.Client() as client:
+        script.login(client, USERNAME, PASSWORD)
+        yield client
+
+
+def test_login(script, server, capsys):
+    with script.Client() as client:
+        script.login(client, USERNAME, PASSWORD)
+
+        assert client.session.cookies["session"] in server.sessions
+    assert "Logged in" in capsys.readouterr().out
+
+
+def test_login_with_wrong_password(script, server):
+    with script.Client() as client:
+        script.login(client, USERNAME, "wrong")
+
+        assert "session" not in client.session.cookies
+    assert not server.sessions
+
+
+def test_delete_needs_login(script, catalogue):
+    with script.Client() as client:
+        errors = script.remove_latest_versions(client, ["1", "2"])
+
+    assert sorted(errors) == ["1", "2"]
+    assert catalogue.projects_by_id[1]["versions"] == ["1.3.0", "1.2.0", "1.1.0"]
+
+
+def test_csrf_token_belongs_to_session(script, session):
+    # Another form fetched by the same session replaces the token,
+    # this is what workers sharing one session would run into
+    first = session.get(script.SERVER_URL + "project/1/delete/1.3.0")
+    session.get(script.SERVER_URL + "project/2/delete/2.3.0")
+
+    resp = session.post(
+        script.SERVER_URL + "project/1/delete/1.3.0",
+        data={"csrf_token": script.extract_csrf_token(first.content), "confirm": "Yes"},
+    )
+
+    assert resp.status_code == 400
+
+
+def test_workers_have_own_sessions(script, catalogue, session):
+    cookie = session.session.cookies["session"]
+    projects = [str(project["id"]) for project in catalogue.projects[:40]]
+
+    errors = script.remove_latest_versions(session, projects, max_workers=4)
+
+    assert errors == {}
+    assert all(len(catalogue.projects_by_id[int(project)]["versions"]) == 2 for project in projects)
+    # Forms fetched by the workers didn't touch the logged in session
+    assert session.session.cookies["session"] == cookie
+
+
+def test_remove_latest_versions(script, catalogue, session, capsys):
+    projects = [str(project["id"]) for project in catalogue.projects[:20]]
+    expected = {project: catalogue.projects_by_id[int(project)]["versions"][1:] for project in projects}
+
+    errors = script.remove_latest_versions(session, projects, max_workers=4)
+
+    assert errors == {}
+    assert {project: catalogue.projects_by_id[int(project)]["versions"] for project in projects} == expected
+    assert capsys.readouterr().out.count("deleted on project") == len(projects)
+
+
+def test_errors_are_reported_per_project(script, catalogue, session, capsys):
+    catalogue.projects_by_id[2]["versions"] = []
+
+    errors = script.remove_latest_versions(session, ["1", "2", "99999", "3"], max_workers=2)
+
+    assert sorted(errors) == ["2", "99999"]
+    assert errors["2"].startswith("No version found on ")
+    assert errors["99999"].startswith("Project '99999' not found.")
+    out = capsys.readouterr().out
+    assert "ERROR: Project '99999' not found." in out
+    # Failures don't stop the other projects
+    assert catalogue.projects_by_id[1]["versions"] == ["1.2.0", "1.1.0"]
+    assert catalogue.projects_by_id[3]["versions"] == ["3.2.0", "3.1.0"]
+
+
+def test_duplicate_projects_lose_one_version(script, catalogue, session):
+    errors = script.remove_latest_versions(session, ["5", "5", "5"])
+
+    assert errors == {}
+    assert catalogue.projects_by_id[5]["versions"] == ["5.2.0", "5.1.0"]
+
+
+def test_versions_from_api(script, catalogue, session):
+    projects = [str(project["id"]) for project in catalogue.projects[:10]] + ["99999"]
+
+    versions = script.get_latest_versions(session, projects)
+    errors = script.remove_latest_versions(session, projects, versions=versions)
+
+    assert versions == {project: "{}.3.0".format((int(project) - 1) % 7 + 1) for project in projects[:-1]}
+    assert list(errors) == ["99999"]
+    assert all(len(catalogue.projects_by_id[int(project)]["versions"]) == 2 for project in projects[:-1])
+
+
+def test_main(script, catalogue, monkeypatch, tmp_path):
+    (tmp_path / "projects").write_text("1\n2\n\n1\n")
+    script.PROJECTS_FILE = str(tmp_path / "projects")
+    script.JOURNAL_FILE = str(tmp_path / "projects.journal")
+    monkeypatch.setattr("builtins.input", lambda prompt: USERNAME)
+    monkeypatch.setattr(script.getpass, "getpass", lambda: PASSWORD)
+
+    errors = script.main(output_format="json")
+
+    assert errors == {}
+    assert catalogue.projects_by_id[1]["versions"] == ["1.2.0", "1.1.0"]
+    assert catalogue.projects_by_id[2]["versions"] == ["2.2.0", "2.1.0"]
+    assert not (tmp_path / "projects.journal").exists()
+
+
+def test_main_after_failure(script, catalogue, monkeypatch, tmp_path, capsys):
+    catalogue.projects_by_id[2]["versions"] = []
+    (tmp_path / "projects").write_text("1\n2\n")
+    script.PROJECTS_FILE = str(tmp_path / "projects")
+    script.JOURNAL_FILE = str(tmp_path / "projects.journal")
+    monkeypatch.setattr("builtins.input", lambda prompt: USERNAME)
+    monkeypatch.setattr(script.getpass, "getpass", lambda: PASSWORD)
+
+    assert list(script.main(output_format="json")) == ["2"]
+    assert (tmp_path / "projects.journal").exists()
+
+    # Retry of the failed project skips the done ones only when asked to
+    script.RESUME = True
+    assert list(script.main(output_format="json")) == ["2"]
+    assert catalogue.projects_by_id[1]["versions"] == ["1.2.0", "1.1.0"]
+
+    # Deliberate run on the same projects starts again
+    script.RESUME = False
+    assert list(script.main(output_format="json")) == ["2"]
+    assert catalogue.projects_by_id[1]["versions"] == ["1.1.0"]
+
+    # Other projects don't use the journal
+    script.RESUME = True
+    (tmp_path / "projects").write_text("1\n")
+    assert script.main(output_format="json") == {}
+    assert catalogue.projects_by_id[1]["versions"] == []
+    assert not (tmp_path / "projects.journal").exists()
@@ -0,0 +1,54 @@
+"""
+Tests of anitya_common.journal.
+"""
+from anitya_common.journal import Journal, input_digest
+
+
+def test_resume(tmp_path):
+    path = str(tmp_path / "journal")
+    with Journal(path, {"server": "a"}) as journal:
+        journal.record("1", "1.0.0")
+
+    with Journal(path, {"server": "a"}) as journal:
+        assert journal.pending(["1", "2"]) == ["2"]
+        assert journal.resumed == {"1": "1.0.0"}
+
+
+def test_other_params_start_again(tmp_path, capsys):
+    path = str(tmp_path / "journal")
+    with Journal(path, {"input": input_digest(["1", "2"])}) as journal:
+        journal.record("1")
+
+    with Journal(path, {"input": input_digest(["1", "3"])}) as journal:
+        assert journal.pending(["1", "3"]) == ["1", "3"]
+
+    assert "written with other parameters" in capsys.readouterr().out
+
+
+def test_without_resume_start_again(tmp_path, capsys):
+    path = str(tmp_path / "journal")
+    with Journal(path) as journal:
+        journal.record("1")
+
+    with Journal(path, resume=False) as journal:
+        assert journal.pending(["1"]) == ["1"]
+        journal.record("2")
+
+    # Old records are gone, the journal was started again
+    with Journal(path) as journal:
+        assert journal.done == {"2": None}
+    assert "starting again" in capsys.readouterr().out
+
+
+def test_complete_removes_journal(tmp_path):
+    path = tmp_path / "journal"
+    with Journal(str(path)) as journal:
+        journal.record("1")
+        journal.complete()
+
+    assert not path.exists()
+
+
+def test_input_digest():
+    assert input_digest(["1", "2", "1"]) == input_digest(["2", "1"])
+    assert input_digest(["1", "2"]) != input_digest(["1", "3"])
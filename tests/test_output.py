@@ -0,0 +1,29 @@
+"""
+Tests of anitya_common.output.
+"""
+import io
+import json
+
+from anitya_common.output import CsvWriter, JsonLinesWriter
+
+FIELDS = (("project_id", int), ("name", str))
+
+
+def test_json_lines_follow_fields():
+    file = io.StringIO()
+    with JsonLinesWriter(file, FIELDS) as writer:
+        writer.write({"name": "a", "project_id": 1})
+        writer.write({"name": "b", "other": "ignored"})
+
+    lines = file.getvalue().splitlines()
+    assert [list(json.loads(line)) for line in lines] == [["project_id", "name"]] * 2
+    assert json.loads(lines[1]) == {"project_id": None, "name": "b"}
+
+
+def test_csv_follows_fields():
+    file = io.StringIO()
+    with CsvWriter(file, FIELDS) as writer:
+        writer.write({"name": "a", "project_id": 1})
+        writer.write({"name": "b"})
+
+    assert file.getvalue().splitlines() == ["project_id,name", "1,a", ",b"]
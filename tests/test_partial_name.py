@@ -0,0 +1,77 @@
+"""
+Tests of anitya_get_packages_by_partial_name against the fake Anitya.
+"""
+import pytest
+
+from fake_server import FakeServer
+
+ITEMS_PER_PAGE = 10
+
+
+@pytest.fixture
+def server(catalogue):
+    # Pages requested concurrently don't come back in order
+    with FakeServer(catalogue, latency=0.005, jitter=0.02, record=True) as fake:
+        yield fake
+
+
+@pytest.fixture
+def script(load_script, server):
+    script = load_script("partial-name")
+    script.SERVER_URL = server.url
+    script.ITEMS_PER_PAGE = ITEMS_PER_PAGE
+    return script
+
+
+def package_pages(server):
+    return [path for method, path in server.requests if path.startswith("/api/v2/packages")]
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_pages_are_yielded_in_order(script, catalogue, server, max_workers):
+    pages = list(script._iter_packages_pages_concurrent(max_workers=max_workers))
+
+    assert len(pages) == len(catalogue.packages) // ITEMS_PER_PAGE
+    assert [package["name"] for page in pages for package in page] == [
+        package["name"] for package in catalogue.packages
+    ]
+
+
+def test_workers_bound_requests_in_flight(script, server):
+    list(script._iter_packages_pages_concurrent(max_workers=4))
+
+    assert 1 < server.stats["max_in_flight"] <= 4
+
+
+def test_first_page_supplies_total(script, catalogue, server, capsys):
+    list(script._iter_packages_pages_concurrent(max_workers=4))
+
+    pages = len(catalogue.packages) // ITEMS_PER_PAGE
+    requested = package_pages(server)
+    # Only the first page is requested before the total is known,
+    # every page is requested once
+    assert requested[0] == "/api/v2/packages?items_per_page=10&page=1"
+    assert sorted(requested) == sorted(
+        "/api/v2/packages?items_per_page=10&page={}".format(page) for page in range(1, pages + 1)
+    )
+    assert "Number of pages '{}' = '{}'/'10'".format(pages, len(catalogue.packages)) in capsys.readouterr().out
+
+
+def test_consumer_bounds_pages_ahead(script, server):
+    pages = script._iter_packages_pages_concurrent(max_workers=2)
+    next(pages)
+    next(pages)
+    pages.close()
+
+    # First page and at most two pages requested ahead of the consumer
+    assert len(package_pages(server)) <= 4
+
+
+def test_filter_streamed_pages(script, catalogue):
+    matcher = script.compile_matcher(["-delete"])
+
+    packages = list(script.iter_filter_packages(script.iter_packages(), matcher))
+
+    assert [package["name"] for package in packages] == [
+        package["name"] for package in catalogue.packages if "-delete" in package["name"]
+    ]
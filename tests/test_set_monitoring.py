@@ -0,0 +1,65 @@
+"""
+Tests of set_monitoring_on_distgit against the fake dist-git.
+"""
+import pytest
+
+
+@pytest.fixture
+def script(load_script, server):
+    script = load_script("set-monitoring")
+    script.DISTGIT_URL = server.url
+    script.MONITORING_OPTION = "monitoring"
+    return script
+
+
+def test_summary_buckets(script, catalogue, capsys):
+    packages = catalogue.fedora_packages()
+    already_set = [package for package in packages if catalogue.monitoring[package] == "monitoring"]
+    to_set = [package for package in packages if catalogue.monitoring[package] != "monitoring"]
+
+    results = script.set_monitoring_on_packages(packages + ["no-such-package"], max_workers=4)
+
+    assert [package for package, result in results.items() if result == script.UNCHANGED] == already_set
+    assert [package for package, result in results.items() if result == script.SUCCEEDED] == to_set
+    assert [package for package, result in results.items() if result == script.FAILED] == ["no-such-package"]
+    assert set(catalogue.monitoring.values()) == {"monitoring"}
+
+    script.print_summary(results)
+    out = capsys.readouterr().out
+    assert "Succeeded: {}\n".format(len(to_set)) in out
+    assert "Failed: 1\n    no-such-package\n" in out
+    assert "Unchanged: {}\n".format(len(already_set)) in out
+    assert "Writes avoided: {}\n".format(len(already_set)) in out
+
+
+def test_without_skip_unchanged(script, catalogue, server):
+    script.SKIP_UNCHANGED = False
+    packages = catalogue.fedora_packages()
+
+    results = script.set_monitoring_on_packages(packages, max_workers=4)
+
+    assert set(results.values()) == {script.SUCCEEDED}
+    # Only the updates, no reads of the current status
+    assert server.stats["requests"] == len(packages)
+
+
+def test_duplicates_and_blank_lines(script, catalogue, server):
+    package = [package for package in catalogue.fedora_packages() if catalogue.monitoring[package] != "monitoring"][0]
+
+    results = script.set_monitoring_on_packages([package + "\n", "\n", package + "\n"])
+
+    assert results == {package: script.SUCCEEDED}
+    assert server.stats["requests"] == 2
+
+
+def test_main_removes_journal(script, catalogue, tmp_path):
+    packages_file = tmp_path / "packages"
+    packages_file.write_text("\n".join(catalogue.fedora_packages()) + "\n")
+    script.PACKAGES_FILE = str(packages_file)
+    script.JOURNAL_FILE = str(tmp_path / "packages.monitoring.journal")
+
+    results = script.main(output_format="json")
+
+    assert len(results) == len(catalogue.fedora_packages())
+    assert script.FAILED not in results.values()
+    assert not (tmp_path / "packages.monitoring.journal").exists()
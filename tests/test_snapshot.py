@@ -0,0 +1,100 @@
+"""
+Tests of refreshing anitya_common.snapshot against the fake Anitya.
+"""
+import pytest
+
+from anitya_common import snapshot as snapshot_module
+from anitya_common.snapshot import Snapshot
+
+ITEMS_PER_PAGE = 50
+
+
+@pytest.fixture
+def snapshot(server, monkeypatch, tmp_path):
+    monkeypatch.setattr(snapshot_module, "ITEMS_PER_PAGE", ITEMS_PER_PAGE)
+    with Snapshot(server.url, path=str(tmp_path / "snapshot.sqlite")) as snapshot:
+        snapshot.refresh("projects")
+        yield snapshot
+
+
+def new_project(catalogue, project_id):
+    project = dict(catalogue.projects[0], id=project_id, name="new-{}".format(project_id))
+    catalogue.projects_by_id[project_id] = project
+    return project
+
+
+def stored_ids(snapshot):
+    return [project["id"] for project in snapshot.projects()]
+
+
+def catalogue_ids(catalogue):
+    return [project["id"] for project in catalogue.projects]
+
+
+def test_appended_items_are_downloaded(snapshot, catalogue, server, capsys):
+    catalogue.projects.extend(new_project(catalogue, 1000 + index) for index in range(60))
+    server.reset_stats()
+
+    snapshot.refresh("projects", force=True)
+
+    assert stored_ids(snapshot) == catalogue_ids(catalogue)
+    # First page, page with the last stored item and the two new pages
+    assert server.stats["requests"] == 4
+    assert "from page '4' of '6'" in capsys.readouterr().out
+
+
+def test_fresh_snapshot_is_not_refreshed(snapshot, server):
+    server.reset_stats()
+
+    snapshot.refresh("projects")
+
+    assert server.stats["requests"] == 0
+
+
+def test_delete_and_append_with_same_total(snapshot, catalogue):
+    del catalogue.projects[120]
+    catalogue.projects.append(new_project(catalogue, 1000))
+
+    snapshot.refresh("projects", force=True)
+
+    assert stored_ids(snapshot) == catalogue_ids(catalogue)
+
+
+def test_insert_in_middle_on_page_boundary(snapshot, catalogue):
+    # 200 stored items fill exactly 4 pages
+    catalogue.projects.insert(120, new_project(catalogue, 1000))
+
+    snapshot.refresh("projects", force=True)
+
+    assert stored_ids(snapshot) == catalogue_ids(catalogue)
+
+
+def test_delete_in_middle_and_append(snapshot, catalogue):
+    del catalogue.projects[120]
+    catalogue.projects.extend(new_project(catalogue, 1000 + index) for index in range(2))
+
+    snapshot.refresh("projects", force=True)
+
+    assert stored_ids(snapshot) == catalogue_ids(catalogue)
+
+
+def test_stored_item_moved_to_end(snapshot, catalogue):
+    # First and last stored pages stay the same, but the appended item
+    # was stored already
+    catalogue.projects.insert(60, new_project(catalogue, 1000))
+    catalogue.projects.append(catalogue.projects.pop(121))
+
+    snapshot.refresh("projects", force=True)
+
+    assert stored_ids(snapshot) == catalogue_ids(catalogue)
+
+
+def test_project_changed_in_place(snapshot, catalogue):
+    catalogue.projects[5]["version"] = "99.0.0"
+    catalogue.projects[5]["updated_on"] += 1
+    catalogue.projects.append(new_project(catalogue, 1000))
+
+    snapshot.refresh("projects", force=True)
+
+    assert list(snapshot.projects())[5]["version"] == "99.0.0"
+    assert stored_ids(snapshot) == catalogue_ids(catalogue)
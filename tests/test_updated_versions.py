@@ -0,0 +1,253 @@
+"""
+Tests of updated-versions.py against the fake datagrepper.
+"""
+import copy
+import json
+import time
+import types
+
+import pytest
+
+from fake_server import Catalogue, FakeServer
+
+# Enough messages for 10 pages of 100 rows
+MESSAGES = 1000
+
+
+class RecordingBar:
+    """
+    Stand-in for `click.progressbar` recording the updates.
+    """
+
+    def __init__(self, length=None, item_show_func=None):
+        self.length = length
+        self.item_show_func = item_show_func
+        self.pos = 0
+        self.items = []
+        self.labels = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def update(self, n_steps, current_item=None):
+        self.pos += n_steps
+        self.items.append(current_item)
+        self.labels.append(self.item_show_func(current_item))
+
+
+@pytest.fixture
+def catalogue():
+    return Catalogue(MESSAGES, versions=2)
+
+
+@pytest.fixture
+def server(catalogue):
+    # Pages requested concurrently don't come back in order
+    with FakeServer(catalogue, latency=0.01) as fake:
+        yield fake
+
+
+@pytest.fixture
+def script(load_script):
+    return load_script("updated-versions")
+
+
+@pytest.fixture
+def bars(script, monkeypatch):
+    bars = []
+
+    def progressbar(**kwargs):
+        bars.append(RecordingBar(**kwargs))
+        return bars[-1]
+
+    monkeypatch.setattr(script.click, "progressbar", progressbar)
+    return bars
+
+
+def get_pages(script, server, workers):
+    stats = script.FetchStats()
+    pages = list(script.get_all_pages(
+        server.url + "datagrepper/v2/search",
+        {"topic": script.TOPIC, "delta": 86400 * 7},
+        workers=workers,
+        stats=stats,
+    ))
+    return pages, stats
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_pages_are_yielded_in_order(script, catalogue, server, bars, workers):
+    pages, stats = get_pages(script, server, workers)
+
+    assert len(pages) == 10
+    assert [message["msg_id"] for page in pages for message in page] == [
+        message["msg_id"] for message in catalogue.messages
+    ]
+    assert stats.messages == MESSAGES
+    assert stats.bytes > 0
+    assert server.stats["requests"] == 10
+
+
+def test_progress(script, server, bars):
+    get_pages(script, server, workers=4)
+
+    bar, = bars
+    assert bar.length == 10
+    # First page is shown as the progress bar starts, every other one is
+    # added once it's yielded
+    assert bar.items == list(range(2, 11))
+    assert bar.labels == ["Page {}/10".format(page) for page in range(2, 11)]
+    assert bar.item_show_func(None) == "Page 1/10"
+
+
+def test_workers_stay_close_to_consumer(script, server, bars):
+    pages = script.get_all_pages(
+        server.url + "datagrepper/v2/search", {"topic": script.TOPIC, "delta": 86400 * 7}, workers=2
+    )
+    next(pages)
+    next(pages)
+    pages.close()
+
+    # First page, and at most two pages ahead of the second one
+    assert server.stats["requests"] <= 4
+
+
+def test_updates_of_apps(script, catalogue, server, bars):
+    stats = script.FetchStats()
+
+    updates = list(script.get_updates(server.url + "datagrepper/", 7, workers=4, stats=stats))
+
+    expected = app_messages(script, catalogue)
+    assert expected
+    assert stats.kept == len(expected)
+    assert len(updates) == len(expected)
+
+
+def app_messages(script, catalogue):
+    return [
+        message for message in catalogue.messages
+        if message["body"]["project"]["name"] in script.REGISTRY.names
+    ]
+
+
+def cached_ids(script, base_url, cache_file):
+    cache = script.MessageCache(cache_file, base_url, script.REGISTRY.names)
+    try:
+        return sorted(script.message_id(message) for message in cache.get(0))
+    finally:
+        cache.close()
+
+
+def new_message(catalogue, msg_id):
+    message = copy.deepcopy(catalogue.messages[0])
+    message["msg_id"] = msg_id
+    message["timestamp"] = time.time()
+    return message
+
+
+class Message:
+    """
+    Message as delivered by fedora-messaging.
+    """
+
+    def __init__(self, message):
+        self.id = message["msg_id"]
+        self.topic = message["topic"]
+        self.body = message["body"]
+        self._headers = message["headers"]
+
+
+@pytest.mark.parametrize("page", [True, False])
+def test_replay_stores_app_messages(script, catalogue, server, bars, tmp_path, page):
+    base_url = server.url + "datagrepper/"
+    cache_file = str(tmp_path / "cache.sqlite")
+    dump = tmp_path / "messages.json"
+    dump.write_text(json.dumps({"raw_messages": catalogue.messages} if page else catalogue.messages))
+
+    updates = script.replay_messages(base_url, [str(dump)], cache_file)
+
+    expected = app_messages(script, catalogue)
+    assert len(updates) == len(expected)
+    # Same key as the report with the server filter uses
+    assert cached_ids(script, base_url, cache_file) == sorted(message["msg_id"] for message in expected)
+    assert server.stats["requests"] == 0
+
+
+def test_offline_report_reads_replayed_messages(script, catalogue, server, bars, tmp_path):
+    base_url = server.url + "datagrepper/"
+    cache_file = str(tmp_path / "cache.sqlite")
+    dump = tmp_path / "messages.json"
+    dump.write_text(json.dumps(catalogue.messages))
+    replayed = script.replay_messages(base_url, [str(dump)], cache_file)
+    stats = script.FetchStats()
+
+    updates = list(script.get_updates(base_url, 7, cache_file=cache_file, stats=stats, offline=True))
+
+    assert sorted(update.version for update in updates) == sorted(update.version for update in replayed)
+    assert stats.messages == stats.kept == len(replayed)
+    assert server.stats["requests"] == 0
+
+
+def test_consumer_backfill_after_bind(script, catalogue, server, bars, tmp_path, monkeypatch):
+    base_url = server.url + "datagrepper/"
+    cache_file = str(tmp_path / "cache.sqlite")
+    # Published after the first fetch, before the queue was bound
+    missed = new_message(catalogue, "missed")
+    # Published after the queue was bound, delivered and fetched both
+    delivered = new_message(catalogue, "delivered")
+    later = new_message(catalogue, "later")
+
+    def consume(consumer, bindings, queues):
+        assert bindings[0]["routing_keys"] == [script.TOPIC]
+        assert cached_ids(script, base_url, cache_file) == sorted(
+            message["msg_id"] for message in app_messages(script, catalogue)
+        )
+        catalogue.publish(missed)
+        catalogue.publish(delivered)
+        server.reset_stats()
+        consumer(Message(delivered))
+        requests = server.stats["requests"]
+        assert requests > 0
+        catalogue.publish(later)
+        consumer(Message(later))
+        # Backfill runs only for the first message
+        assert server.stats["requests"] == requests
+
+    monkeypatch.setattr(script, "fedora_messaging", types.SimpleNamespace(consume=consume))
+
+    script.consume(base_url, 7, cache_file)
+
+    ids = cached_ids(script, base_url, cache_file)
+    assert {"missed", "delivered", "later"} <= set(ids)
+    # Messages fetched and delivered both are stored once
+    assert len(ids) == len(set(ids)) == len(app_messages(script, catalogue))
+
+
+def test_contains_matches_only_app_messages(script, catalogue, server, bars):
+    server.reset_stats()
+
+    messages = list(script.get_messages_from_datagrepper(
+        server.url + "datagrepper/", 7, names=script.REGISTRY.names
+    ))
+
+    # Plain app names match every message, "anitya" is the agent of all of them
+    assert [message["msg_id"] for message in messages] == [
+        message["msg_id"] for message in app_messages(script, catalogue)
+    ]
+    # Three probes and one page
+    assert server.stats["requests"] == 4
+
+
+def test_contains_not_used_when_matching_all(script, catalogue, server, bars, monkeypatch, capsys):
+    # Datagrepper serializing messages differently than expected
+    monkeypatch.setattr(script, "NAME_FIELD", '"name":"')
+
+    messages = list(script.get_messages_from_datagrepper(
+        server.url + "datagrepper/", 7, names=script.REGISTRY.names
+    ))
+
+    assert len(messages) == MESSAGES
+    assert "Filter by app names matches {0} of {0} messages".format(MESSAGES) in capsys.readouterr().err
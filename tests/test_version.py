@@ -0,0 +1,63 @@
+"""
+Tests of anitya_common.version.
+"""
+import pytest
+
+from anitya_common.version import (
+    MAJOR,
+    MINOR,
+    PATCH,
+    PRERELEASE,
+    UNKNOWN,
+    Version,
+    classify,
+    classify_batch,
+    parse_version,
+)
+
+
+@pytest.mark.parametrize("version, expected", [
+    ("1.2.3", Version((1, 2, 3))),
+    ("v1.2.3", Version((1, 2, 3))),
+    ("release-1_2-3", Version((1, 2, 3))),
+    ("1.0rc1", Version((1, 0), prerelease=True)),
+    ("v2.0.0-beta.2", Version((2, 0, 0), prerelease=True)),
+    ("1.0.0-build", Version((1, 0, 0))),
+    ("latest", Version(())),
+    ("", Version(())),
+    (None, Version(())),
+])
+def test_parse_version(version, expected):
+    assert parse_version(version) == expected
+
+
+@pytest.mark.parametrize("old_version, new_version, expected", [
+    # Examples of the module docstring
+    ("v1.9.2", "v2.0.0", MAJOR),
+    ("1.9", "1.10", MINOR),
+    ("1", "1.0.1", PATCH),
+    ("1.9.2", "2.0.0rc1", PRERELEASE),
+    # Single component versions are padded, not indexed past the end
+    ("1", "2", MAJOR),
+    ("1", "1.1", MINOR),
+    ("1.1", "1", MINOR),
+    # Final release of a prerelease
+    ("2.0.0rc1", "2.0.0", MAJOR),
+    ("2.1.0rc1", "2.1.0", MINOR),
+    ("2.1.3rc1", "2.1.3", PATCH),
+    ("v3.0-beta.1", "v3.0", MAJOR),
+    ("2.0.0rc1", "2.0.0rc2", PRERELEASE),
+    ("2.0.0rc1", "2.0.1", PATCH),
+    # Versions without numeric component
+    (None, "1.0.0", UNKNOWN),
+    ("1.0.0", None, UNKNOWN),
+    ("latest", "1.0.0", UNKNOWN),
+])
+def test_classify(old_version, new_version, expected):
+    assert classify(old_version, new_version) == expected
+
+
+def test_classify_batch():
+    pairs = [("1.0", "2.0"), ("1.0", "1.1"), ("1.0", "2.0"), (None, "1.0")]
+
+    assert classify_batch(pairs) == [MAJOR, MINOR, MAJOR, UNKNOWN]